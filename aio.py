@@ -0,0 +1,326 @@
+"""
+asyncio 接口
+
+QuantizedDeepSeekOCRModel 与 cli 中的转换函数都是阻塞调用。AsyncQuantizedModel 与
+AsyncConverter 把它们放到受管的线程池中执行，事件循环不会被阻塞：
+
+- 页面识别按设备使用独立的线程池（每个设备的线程数等于 max_inflight_per_device），
+  未指定设备的请求使用共享线程池，由副本调度器选择设备
+- max_concurrency 限制同时在途的请求数，超出的请求在事件循环中排队，不占用线程
+- 取消 asyncio 任务会通过 ExtractionContext.check_aborted / aborted 回调中断推理；
+  并发名额在工作线程真正退出后才释放
+- 工作线程在调用方任务的 contextvars 副本中执行，scheduler.job() 设置的优先级、
+  截止时间、文档与 token 预算会随请求一起传到调度器
+
+用法：
+    async with AsyncConverter(max_concurrency=2) as converter:
+        await asyncio.gather(
+            converter.convert_markdown("a.pdf", "a.md"),
+            converter.convert_markdown("b.pdf", "b.md"),
+        )
+"""
+
+import asyncio
+import contextvars
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Sequence, TypeVar
+
+if TYPE_CHECKING:
+    from doc_page_extractor.types import ExtractionContext
+    from pdf_craft import OCREvent, OCRTokensMetering, PDFHandler
+
+    from quantized_model import PageImage, QuantizedDeepSeekOCRModel
+
+
+T = TypeVar("T")
+
+AbortedCheck = Callable[[], bool]
+
+
+class _AsyncRunner:
+    """在线程池中执行可中断的阻塞调用，并限制在途数量"""
+
+    def __init__(self, max_concurrency: int) -> None:
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency must be positive")
+        self._max_concurrency = max_concurrency
+        self._semaphore: asyncio.Semaphore | None = None
+        self._executors: dict[object, ThreadPoolExecutor] = {}
+        self._executors_lock = threading.Lock()
+
+    def executor(self, key: object, max_workers: int) -> ThreadPoolExecutor:
+        with self._executors_lock:
+            executor = self._executors.get(key)
+            if executor is None:
+                executor = self._executors[key] = ThreadPoolExecutor(
+                    max_workers=max_workers,
+                    thread_name_prefix=f"pdf-craftq-{key}",
+                )
+            return executor
+
+    async def run(self, executor: Executor, call: Callable[[AbortedCheck], T]) -> T:
+        if self._semaphore is None:
+            # 信号量绑定到首次使用它的事件循环
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        cancelled = threading.Event()
+        # run_in_executor 不复制 contextvars，显式带上调用方任务的上下文（作业信息等）
+        call_context = contextvars.copy_context()
+        async with self._semaphore:
+            future = asyncio.get_running_loop().run_in_executor(executor, call_context.run, call, cancelled.is_set)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                cancelled.set()
+                # 等工作线程在下一个中断检查点退出，再释放并发名额
+                try:
+                    await future
+                except Exception:
+                    pass
+                raise
+
+    def shutdown(self) -> None:
+        with self._executors_lock:
+            executors = list(self._executors.values())
+            self._executors.clear()
+        for executor in executors:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+class AsyncQuantizedModel:
+    """
+    QuantizedDeepSeekOCRModel 的 asyncio 外观
+
+    Args:
+        model: 被包装的模型
+        max_concurrency: 同时在途的 generate 请求数上限
+    """
+
+    def __init__(self, model: "QuantizedDeepSeekOCRModel", max_concurrency: int = 8) -> None:
+        self._model = model
+        self._max_concurrency = max_concurrency
+        self._runner = _AsyncRunner(max_concurrency)
+
+    @property
+    def model(self) -> "QuantizedDeepSeekOCRModel":
+        return self._model
+
+    async def generate(
+        self,
+        prompt: str,
+        image: "PageImage",
+        output_path: Path | None = None,
+        size: str = "base",
+        context: "ExtractionContext | None" = None,
+        device_number: int | None = None,
+    ) -> str:
+        """参数顺序与 QuantizedDeepSeekOCRModel.generate 相同"""
+        results = await self.generate_batch([(prompt, image, size)], output_path, context, device_number)
+        return results[0]
+
+    async def generate_batch(
+        self,
+        items: Sequence[tuple[str, "PageImage", str]],
+        output_path: Path | None = None,
+        context: "ExtractionContext | None" = None,
+        device_number: int | None = None,
+        batch_size: int | None = None,
+    ) -> list[str]:
+        """
+        批量识别页面；取消任务时未开始的页面不再推理，推理中的页面在下一个 token 处中断
+
+        Raises:
+            asyncio.CancelledError: 任务被取消
+        """
+        from doc_page_extractor.types import ExtractionContext
+
+        call_context = ExtractionContext(check_aborted=lambda: False)
+        if context is not None:
+            call_context.output_dir_path = context.output_dir_path
+            call_context.max_tokens = context.max_tokens
+            call_context.max_output_tokens = context.max_output_tokens
+            call_context.input_tokens = context.input_tokens
+            call_context.output_tokens = context.output_tokens
+        start_input_tokens = call_context.input_tokens
+        start_output_tokens = call_context.output_tokens
+
+        def call(cancelled: AbortedCheck) -> list[str]:
+            user_check = context.check_aborted if context is not None else None
+            call_context.check_aborted = lambda: cancelled() or (user_check is not None and user_check())
+            return self._model.generate_batch(
+                items,
+                output_path=output_path,
+                context=call_context,
+                device_number=device_number,
+                batch_size=batch_size,
+            )
+
+        if device_number is None:
+            # 由副本调度器选择设备，线程数即总并发上限
+            executor = self._runner.executor("auto", self._max_concurrency)
+        else:
+            executor = self._runner.executor(f"cuda{device_number}", self._model.max_inflight_per_device)
+        try:
+            return await self._runner.run(executor, call)
+        finally:
+            if context is not None:
+                # 每次调用使用独立的 context，结束后把 token 增量累加回调用方的 context
+                context.input_tokens += call_context.input_tokens - start_input_tokens
+                context.output_tokens += call_context.output_tokens - start_output_tokens
+
+    async def download(self, revision: str | None = None) -> None:
+        await self._runner.run(self._runner.executor("io", 1), lambda _: self._model.download(revision))
+
+    async def load(self) -> None:
+        await self._runner.run(self._runner.executor("io", 1), lambda _: self._model.load())
+
+    async def unload(self) -> None:
+        await self._runner.run(self._runner.executor("io", 1), lambda _: self._model.unload())
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self._runner.shutdown)
+
+    async def __aenter__(self) -> "AsyncQuantizedModel":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+
+class AsyncConverter:
+    """
+    PDF 转 Markdown / EPUB 的 asyncio 接口，所有文档共享一个已加载的模型
+
+    Args:
+        local_only: 只使用本地缓存的模型
+        max_concurrency: 同时转换的文档数；多卡时取设备数可让每个副本都保持忙碌
+        pdf_handler: 传给 pdf_craft 的 PDFHandler，例如 PrefetchPDFHandler
+    """
+
+    def __init__(
+        self,
+        local_only: bool = False,
+        max_concurrency: int = 1,
+        pdf_handler: "PDFHandler | None" = None,
+    ) -> None:
+        self._local_only = local_only
+        self._max_concurrency = max_concurrency
+        self._pdf_handler = pdf_handler
+        self._runner = _AsyncRunner(max_concurrency)
+        self._transform = None
+        self._transform_lock = threading.Lock()
+
+    async def convert_markdown(
+        self,
+        pdf_path: str | Path,
+        output_path: str | Path,
+        assets_path: str | Path | None = None,
+        ocr_size: str = "base",
+        includes_footnotes: bool = False,
+        ignore_pdf_errors: bool = False,
+        on_ocr_event: "Callable[[OCREvent], None] | None" = None,
+        checkpoint: bool = False,
+        resume: bool = False,
+        priority: str | None = None,
+        max_document_tokens: int | None = None,
+    ) -> "OCRTokensMetering":
+        """
+        转换为 Markdown；on_ocr_event 在事件循环线程中调用
+
+        priority 与 max_document_tokens 的含义同 cli.convert_to_markdown；未指定的字段
+        继承调用方任务中 scheduler.job() 设置的作业
+        """
+        import cli
+
+        on_event = self._loop_callback(on_ocr_event)
+        return await self._runner.run(
+            self._runner.executor("documents", self._max_concurrency),
+            lambda aborted: cli.convert_to_markdown(
+                pdf_path=Path(pdf_path),
+                output_path=Path(output_path),
+                assets_path=Path(assets_path) if assets_path is not None else None,
+                ocr_size=ocr_size,
+                local_only=self._local_only,
+                includes_footnotes=includes_footnotes,
+                ignore_pdf_errors=ignore_pdf_errors,
+                verbose=False,
+                transform=self._ensure_transform(),
+                on_ocr_event=on_event,
+                aborted=aborted,
+                checkpoint=checkpoint,
+                resume=resume,
+                priority=priority,
+                max_document_tokens=max_document_tokens,
+            ),
+        )
+
+    async def convert_epub(
+        self,
+        pdf_path: str | Path,
+        output_path: str | Path,
+        ocr_size: str = "base",
+        includes_cover: bool = True,
+        includes_footnotes: bool = False,
+        ignore_pdf_errors: bool = False,
+        language: str = "zh",
+        on_ocr_event: "Callable[[OCREvent], None] | None" = None,
+        checkpoint: bool = False,
+        resume: bool = False,
+        priority: str | None = None,
+        max_document_tokens: int | None = None,
+    ) -> "OCRTokensMetering":
+        """转换为 EPUB；参数同 convert_markdown"""
+        import cli
+
+        on_event = self._loop_callback(on_ocr_event)
+        return await self._runner.run(
+            self._runner.executor("documents", self._max_concurrency),
+            lambda aborted: cli.convert_to_epub(
+                pdf_path=Path(pdf_path),
+                output_path=Path(output_path),
+                ocr_size=ocr_size,
+                local_only=self._local_only,
+                includes_cover=includes_cover,
+                includes_footnotes=includes_footnotes,
+                ignore_pdf_errors=ignore_pdf_errors,
+                language=language,
+                verbose=False,
+                transform=self._ensure_transform(),
+                on_ocr_event=on_event,
+                aborted=aborted,
+                checkpoint=checkpoint,
+                resume=resume,
+                priority=priority,
+                max_document_tokens=max_document_tokens,
+            ),
+        )
+
+    async def download(self, revision: str | None = None) -> None:
+        await self._runner.run(
+            self._runner.executor("io", 1),
+            lambda _: self._ensure_transform().predownload(revision),
+        )
+
+    async def aclose(self) -> None:
+        await asyncio.to_thread(self._runner.shutdown)
+
+    async def __aenter__(self) -> "AsyncConverter":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    def _ensure_transform(self):
+        with self._transform_lock:
+            if self._transform is None:
+                import cli
+                self._transform = cli.create_transform(self._local_only, self._pdf_handler)
+            return self._transform
+
+    @staticmethod
+    def _loop_callback(callback: "Callable[[OCREvent], None] | None") -> "Callable[[OCREvent], None] | None":
+        if callback is None:
+            return None
+        loop = asyncio.get_running_loop()
+        return lambda event: loop.call_soon_threadsafe(callback, event)
@@ -0,0 +1,146 @@
+"""
+按页自动选择 OCR 尺寸
+
+`--ocr-size auto` 时，根据渲染后页面图像的墨迹占比、文本行数、分栏和长宽比，
+为每页选择 _SIZE_CONFIGS 中视觉 token 最少、且大概率能识别完整的尺寸。
+识别结果疑似退化（空输出、重复循环、行数远少于页面文本行）时升级到下一档重试。
+
+分类只在缩小到固定高度的灰度图上做几次 numpy 投影，单页耗时为毫秒级。
+"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image
+
+
+AUTO_SIZE = "auto"
+
+# 按视觉 token 数从少到多排列：tiny 64、small 100、base 256、large 400、gundam 256 + n×100
+SIZE_LADDER = ("tiny", "small", "base", "large", "gundam")
+
+_GROUNDING_PATTERN = re.compile(r"<\|ref\|>.*?<\|/ref\|>|<\|det\|>.*?<\|/det\|>", re.DOTALL)
+
+# 分类时统一缩放到的高度，行数估计与页面原始分辨率无关
+_ANALYSIS_HEIGHT = 1000
+# 低于背景亮度该比例的像素视为墨迹
+_INK_THRESHOLD = 0.6
+# 一行中墨迹像素超过该比例才算文本行
+_ROW_INK_RATIO = 0.01
+# 栏间空白的最小宽度（相对页宽）
+_MIN_GUTTER_RATIO = 0.02
+
+
+@dataclass(frozen=True)
+class PageFeatures:
+    width: int
+    height: int
+    ink_ratio: float
+    text_lines: int
+    columns: int
+
+    @property
+    def aspect_ratio(self) -> float:
+        return max(self.width, self.height) / max(1, min(self.width, self.height))
+
+
+def analyse_page(image: Image.Image) -> PageFeatures:
+    """提取页面的文本密度、分辨率与版面特征"""
+    width, height = image.size
+    gray = image.convert("L")
+    scale = _ANALYSIS_HEIGHT / height
+    gray = gray.resize((max(1, round(width * scale)), _ANALYSIS_HEIGHT), Image.Resampling.BILINEAR)
+    pixels = np.asarray(gray, dtype=np.float32)
+
+    background = float(np.percentile(pixels, 90)) or 255.0
+    ink = pixels < background * _INK_THRESHOLD
+    ink_ratio = float(ink.mean())
+
+    row_has_ink = ink.mean(axis=1) > _ROW_INK_RATIO
+    # 文本行即连续的有墨迹行段，上升沿计数
+    text_lines = int(np.count_nonzero(row_has_ink[1:] & ~row_has_ink[:-1]) + row_has_ink[0])
+
+    return PageFeatures(
+        width=width,
+        height=height,
+        ink_ratio=ink_ratio,
+        text_lines=text_lines,
+        columns=_count_columns(ink),
+    )
+
+
+def _count_columns(ink: np.ndarray) -> int:
+    # 页面中部出现贯穿正文、两侧都有墨迹的空白竖带，视为双栏
+    body = ink[ink.any(axis=1)]
+    if body.shape[0] == 0:
+        return 1
+    column_ink = body.mean(axis=0)
+    width = column_ink.shape[0]
+    blank = column_ink < 0.002
+    # 字间空隙很窄，栏间空白至少占页宽的 _MIN_GUTTER_RATIO
+    min_gutter = max(2, int(width * _MIN_GUTTER_RATIO))
+    run_start: int | None = None
+    for x in range(width // 4, width * 3 // 4 + 1):
+        if x < width * 3 // 4 and blank[x]:
+            if run_start is None:
+                run_start = x
+            continue
+        if run_start is not None and x - run_start >= min_gutter:
+            if column_ink[:run_start].max() > 0.01 and column_ink[x:].max() > 0.01:
+                return 2
+        run_start = None
+    return 1
+
+
+def choose_size(features: PageFeatures) -> str:
+    """为页面选择能识别完整的最小尺寸"""
+    if features.ink_ratio < 0.002:
+        level = 0  # 空白页或只有页码
+    elif features.text_lines <= 12 and features.ink_ratio < 0.03:
+        level = 1  # 标题页、插图页、稀疏的幻灯片
+    elif features.text_lines <= 40:
+        level = 2  # 普通书页
+    elif features.text_lines <= 60:
+        level = 3
+    else:
+        level = 4  # 报纸、密排参考文献
+
+    if features.columns > 1:
+        level += 1
+    if features.aspect_ratio > 1.8:
+        # 长图、跨页扫描：单一视图会把文字压得过小，需要切片
+        level = len(SIZE_LADDER) - 1
+    return SIZE_LADDER[min(level, len(SIZE_LADDER) - 1)]
+
+
+def escalate(size: str) -> str | None:
+    """下一档尺寸；已是最大一档时返回 None"""
+    index = SIZE_LADDER.index(size)
+    if index + 1 >= len(SIZE_LADDER):
+        return None
+    return SIZE_LADDER[index + 1]
+
+
+def strip_grounding(text: str) -> str:
+    """去掉识别结果中的 <|ref|>/<|det|> 定位标记，只保留文字"""
+    return _GROUNDING_PATTERN.sub("", text)
+
+
+def looks_degenerate(text: str, features: PageFeatures) -> bool:
+    """
+    识别结果是否疑似退化：有内容的页面输出为空、陷入重复循环，或文字量远少于页面文本行数
+    """
+    plain = strip_grounding(text)
+    lines = [line.strip() for line in plain.splitlines() if line.strip()]
+    if not lines:
+        return features.ink_ratio >= 0.002
+
+    _, repeats = Counter(lines).most_common(1)[0]
+    if repeats >= 5 and repeats > len(lines) // 2:
+        return True
+
+    # 正常文本行至少有十几个字符，识别出的字符数不足每行 5 个说明大部分内容丢失
+    characters = sum(len(line) for line in lines)
+    return features.text_lines >= 10 and characters < features.text_lines * 5
@@ -0,0 +1,559 @@
+"""
+PDF-CraftQ benchmark suite - runs on CPU hosts with a deterministic fake model
+
+Usage:
+    pdf-craftq bench -o bench.json
+    pdf-craftq bench --pages 64 --latency-ms 20 --replicas 1,2,4 -o bench.json
+    pdf-craftq bench --scenario generate --batch-size 8
+    pdf-craftq bench -o new.json --compare old.json
+    pdf-craftq bench --scenario cpu --cpu-workers 1,4,16 --output-tokens 400
+
+The fake backend stands in for the quantized DeepSeek-OCR weights: each page
+takes a fixed latency plus a per-token cost and returns a page of a fixed
+length, so the numbers measure this package's own overhead (scheduling,
+batching, caching, pdf_craft assembly) and track regressions across commits.
+
+Scenarios:
+    startup      wall time of ``pdf-craftq --version`` and of importing cli
+    generate     generate_batch pages/sec and per-page overhead for each replica count,
+                 one page per chunk and, with --batch-size N > 1, N pages per chunk
+                 running concurrently on their replica (max_inflight_per_device=N)
+    cache        cold vs. warm OCR cache pages/sec
+    end_to_end   PDF -> Markdown pages/sec and per-stage timings
+    cpu          CPU backend pages/sec for each --cpu-workers count; here the fake
+                 model does real matrix work per token instead of sleeping, so the
+                 numbers show how pages and intra-op threads share the host's cores
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+SCENARIOS = ('startup', 'generate', 'cache', 'end_to_end', 'cpu')
+
+# Metrics where larger is better; everything else in a result is a duration
+_THROUGHPUT_SUFFIXES = ('pages_per_second', 'efficiency')
+
+_FAKE_WORD = "lorem"
+
+# Side of the square matrix multiplied once per output token in the cpu scenario
+_CPU_MATMUL_SIZE = 256
+
+# Commit of the snapshot the fake backend leaves in its Hugging Face cache; the OCR
+# cache only keys results once the model revision is known
+_FAKE_REVISION = "0" * 40
+
+
+@dataclass(frozen=True)
+class FakeBackendConfig:
+    # Fixed cost of one page, standing in for vision encoding and prefill
+    latency_ms: float = 10.0
+    # Words in each returned page; each word costs per_token_ms
+    output_tokens: int = 200
+    per_token_ms: float = 0.0
+
+
+class FakeOCRModel:
+    """Deterministic stand-in for the remote-code DeepSeek-OCR model."""
+
+    def __init__(self, config: FakeBackendConfig, cpu_bound: bool = False) -> None:
+        self._config = config
+        self._cpu_bound = cpu_bound
+        self.pages = 0
+        self._lock = threading.Lock()
+
+    def infer(self, tokenizer, prompt: str = "", image_file: str = "", **kwargs) -> str:
+        # Like the real model, infer decodes through generate, which preprocess_model wraps
+        return self.generate(image_file=image_file)
+
+    def generate(self, image_file: str = "", **kwargs) -> str:
+        config = self._config
+        if self._cpu_bound:
+            _multiply(config.output_tokens)
+        else:
+            time.sleep((config.latency_ms + config.per_token_ms * config.output_tokens) / 1000)
+        with self._lock:
+            self.pages += 1
+        words = " ".join([_FAKE_WORD] * config.output_tokens)
+        return f"<|ref|>text<|/ref|><|det|>[[100, 100, 900, 900]]<|/det|>\n{Path(image_file).stem} {words}"
+
+
+def _multiply(steps: int) -> None:
+    import torch
+
+    generator = torch.Generator().manual_seed(0)
+    matrix = torch.rand(_CPU_MATMUL_SIZE, _CPU_MATMUL_SIZE, generator=generator)
+    for _ in range(steps):
+        matrix = torch.mm(matrix, matrix).clamp_(0, 1)
+
+
+@contextmanager
+def fake_backend(config: FakeBackendConfig, replicas: int = 1, cpu: bool = False) -> Iterator[list[FakeOCRModel]]:
+    """Replace model loading and page rendering so no GPU, weights or poppler are needed.
+
+    With ``cpu`` no GPU is reported and the fake model burns CPU instead of sleeping.
+    Yields the list of fake replicas loaded so far.
+    """
+    import torch
+    import quantized_model
+    from huggingface_hub import constants
+    from pdf_craft.pdf.handler import DefaultPDFDocument
+
+    models: list[FakeOCRModel] = []
+    hub_dir = tempfile.TemporaryDirectory(prefix="pdf-craftq-bench-hub-")
+
+    def load_tokenizer(*args, **kwargs) -> object:
+        # Loading from the Hub leaves a snapshot in the cache, as a real download does
+        model_dir = Path(kwargs.get('cache_dir') or hub_dir.name)
+        model_dir /= f"models--{kwargs['pretrained_model_name_or_path'].replace('/', '--')}"
+        (model_dir / "snapshots" / _FAKE_REVISION).mkdir(parents=True, exist_ok=True)
+        (model_dir / "refs").mkdir(exist_ok=True)
+        (model_dir / "refs" / "main").write_text(_FAKE_REVISION)
+        return object()
+
+    def load_model(*args, **kwargs) -> FakeOCRModel:
+        model = FakeOCRModel(config, cpu_bound=cpu)
+        models.append(model)
+        return model
+
+    patches: list[tuple[Any, str, Any]] = [
+        (constants, 'HF_HUB_CACHE', hub_dir.name),
+        (torch.cuda, 'is_available', lambda: not cpu),
+        (torch.cuda, 'device_count', lambda: 0 if cpu else replicas),
+        # the CPU backend redirects Tensor.cuda while loaded; put it back afterwards
+        (torch.Tensor, 'cuda', torch.Tensor.cuda),
+        (torch.cuda, 'memory_allocated', lambda device=None: 0),
+        (torch.cuda, 'max_memory_allocated', lambda device=None: 0),
+        (torch.cuda, 'empty_cache', lambda: None),
+        (quantized_model.AutoTokenizer, 'from_pretrained', load_tokenizer),
+        (quantized_model.AutoModel, 'from_pretrained', load_model),
+        (DefaultPDFDocument, 'render_page', _render_fake_page),
+    ]
+    originals = [(target, name, target.__dict__.get(name, getattr(target, name))) for target, name, _ in patches]
+    num_threads = torch.get_num_threads()
+    for target, name, replacement in patches:
+        setattr(target, name, replacement)
+    try:
+        yield models
+    finally:
+        for target, name, original in originals:
+            setattr(target, name, original)
+        torch.set_num_threads(num_threads)
+        hub_dir.cleanup()
+
+
+def _render_fake_page(self, page_index: int, dpi: int):
+    from PIL import Image, ImageDraw
+
+    image = Image.new("RGB", (1240, 1754), "white")
+    draw = ImageDraw.Draw(image)
+    for line in range(40):
+        draw.text((100, 100 + line * 38), f"Page {page_index} line {line}", fill="black")
+    return image
+
+
+def write_blank_pdf(path: Path, pages: int) -> Path:
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=595, height=842)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def _create_model(replicas: int, **options):
+    from quantized_model import QuantizedDeepSeekOCRModel
+
+    return QuantizedDeepSeekOCRModel(
+        model_path=None,
+        local_only=False,
+        enable_devices_numbers=list(range(replicas)) if options.get('device') != 'cpu' else None,
+        **options,
+    )
+
+
+def _page_items(work_dir: Path, pages: int, prefix: str = "page") -> list[tuple[str, Path, str]]:
+    # The fake model never opens the image; distinct names keep cache keys distinct
+    items = []
+    for i in range(pages):
+        image_path = work_dir / f"{prefix}-{i:05d}.png"
+        image_path.write_bytes(f"{prefix}-{i}".encode())
+        items.append(("<image>\n<|grounding|>Convert the document to markdown.", image_path, "tiny"))
+    return items
+
+
+def bench_startup(runs: int = 3) -> dict[str, float]:
+    """Median wall time of a cold ``--version`` and of ``import cli`` in a fresh interpreter."""
+    root = Path(__file__).resolve().parent
+
+    def median_seconds(code: str) -> float:
+        samples = []
+        for _ in range(runs):
+            started_at = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], cwd=root, check=True, capture_output=True)
+            samples.append(time.perf_counter() - started_at)
+        return round(statistics.median(samples), 4)
+
+    return {
+        'version_seconds': median_seconds(
+            "import sys, cli\ntry:\n    cli.main(['--version'])\nexcept SystemExit:\n    pass",
+        ),
+        'import_cli_seconds': median_seconds("import cli"),
+        'python_seconds': median_seconds("pass"),
+    }
+
+
+def bench_generate(
+    config: FakeBackendConfig,
+    pages: int,
+    replicas: list[int],
+    work_dir: Path,
+    batch_size: int = 1,
+) -> dict[str, Any]:
+    """generate_batch throughput for each replica count and chunk size, relative to perfect scaling."""
+    per_page_seconds = (config.latency_ms + config.per_token_ms * config.output_tokens) / 1000
+    results: dict[str, Any] = {}
+    baseline: float | None = None
+    items = _page_items(work_dir, pages)
+    chunk_sizes = [1] if batch_size == 1 else [1, batch_size]
+    for count in replicas:
+        for chunk_size in chunk_sizes:
+            with fake_backend(config, replicas=count), redirect_stdout(io.StringIO()):
+                # Pages of one chunk share its replica, up to max_inflight_per_device at a time
+                model = _create_model(count, batch_size=chunk_size, max_inflight_per_device=chunk_size)
+                model.load()
+                started_at = time.perf_counter()
+                model.generate_batch(items, output_path=work_dir)
+                elapsed = time.perf_counter() - started_at
+            concurrency = min(count * chunk_size, pages)
+            pages_per_second = pages / elapsed
+            if baseline is None:
+                baseline = pages_per_second / concurrency
+            name = f'replicas_{count}' if chunk_size == 1 else f'replicas_{count}_batch_{chunk_size}'
+            results[name] = {
+                'pages_per_second': round(pages_per_second, 2),
+                # Time each concurrent page slot spends per page beyond the fake model's own latency
+                'overhead_ms_per_page': round((elapsed * concurrency / pages - per_page_seconds) * 1000, 3),
+                'scaling_efficiency': round(pages_per_second / (baseline * concurrency), 3),
+            }
+    return results
+
+
+def bench_cache(config: FakeBackendConfig, pages: int, work_dir: Path) -> dict[str, Any]:
+    """Pages/sec of a cold run that fills the OCR cache and of a warm rerun that hits it."""
+    from ocr_cache import OCRCache
+
+    cache = OCRCache(work_dir / "ocr-cache")
+    items = _page_items(work_dir, pages, prefix="cached")
+    with fake_backend(config) as models, redirect_stdout(io.StringIO()):
+        model = _create_model(1, ocr_cache=cache)
+        model.load()
+        timings = []
+        for _ in range(2):
+            started_at = time.perf_counter()
+            model.generate_batch(items, output_path=work_dir)
+            timings.append(time.perf_counter() - started_at)
+        inferred = sum(m.pages for m in models)
+    stats = cache.stats()
+    return {
+        'cold_pages_per_second': round(pages / timings[0], 2),
+        'warm_pages_per_second': round(pages / timings[1], 2),
+        'warm_ms_per_page': round(timings[1] / pages * 1000, 3),
+        'hits': stats.hits,
+        'pages_inferred': inferred,
+    }
+
+
+def bench_end_to_end(config: FakeBackendConfig, pages: int, work_dir: Path) -> dict[str, Any]:
+    """One PDF through pdf_craft to Markdown, with the per-stage breakdown of MetricsCollector."""
+    import cli
+    from metrics import MetricsCollector
+    from quantized_model import apply_quantized_model_patch
+
+    pdf_path = write_blank_pdf(work_dir / "bench.pdf", pages)
+    metrics = MetricsCollector()
+    with fake_backend(config), redirect_stdout(io.StringIO()):
+        apply_quantized_model_patch(quiet=True, metrics=metrics)
+        try:
+            started_at = time.perf_counter()
+            transform = cli.create_transform(local_only=False)
+            transform.load_models()
+            loaded_at = time.perf_counter()
+            cli.convert_to_markdown(
+                pdf_path=pdf_path,
+                output_path=work_dir / "bench.md",
+                assets_path=None,
+                ocr_size="tiny",
+                local_only=False,
+                includes_footnotes=False,
+                ignore_pdf_errors=False,
+                verbose=False,
+                transform=transform,
+                metrics=metrics,
+            )
+            finished_at = time.perf_counter()
+        finally:
+            apply_quantized_model_patch(quiet=True)
+    report = metrics.report()
+    return {
+        'pages_per_second': round(pages / (finished_at - loaded_at), 2),
+        'model_load_seconds': round(loaded_at - started_at, 4),
+        'stages_seconds': report['stages'],
+        'latency_ms': report['pages']['latency_ms'],
+    }
+
+
+def bench_cpu(config: FakeBackendConfig, pages: int, workers: list[int], work_dir: Path) -> dict[str, Any]:
+    """CPU backend pages/sec for each number of concurrent pages, threads split evenly over the cores."""
+    results: dict[str, Any] = {}
+    items = _page_items(work_dir, pages, prefix="cpu")
+    for count in workers:
+        with fake_backend(config, cpu=True), redirect_stdout(io.StringIO()):
+            model = _create_model(1, device='cpu', cpu_workers=count)
+            model.load()
+            started_at = time.perf_counter()
+            model.generate_batch(items, output_path=work_dir)
+            elapsed = time.perf_counter() - started_at
+        plan = model.cpu_plan
+        assert plan is not None
+        results['cores'] = plan.cores
+        results[f'workers_{count}'] = {
+            'pages_per_second': round(pages / elapsed, 2),
+            'threads_per_worker': plan.threads_per_worker,
+        }
+    return results
+
+
+def run_benchmarks(
+    config: FakeBackendConfig,
+    pages: int = 32,
+    replicas: list[int] | None = None,
+    scenarios: tuple[str, ...] = SCENARIOS,
+    on_progress: Callable[[str], None] | None = None,
+    cpu_workers: list[int] | None = None,
+    batch_size: int = 1,
+) -> dict[str, Any]:
+    """Run the selected scenarios and return a JSON-serialisable result document."""
+    replicas = replicas or [1, 2, 4]
+    cpu_workers = cpu_workers or [1, 2, 4]
+    results: dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(prefix="pdf-craftq-bench-") as temp_dir:
+        work_dir = Path(temp_dir)
+        for scenario in scenarios:
+            if on_progress is not None:
+                on_progress(scenario)
+            if scenario == 'startup':
+                results[scenario] = bench_startup()
+            elif scenario == 'generate':
+                results[scenario] = bench_generate(config, pages, replicas, work_dir, batch_size)
+            elif scenario == 'cache':
+                results[scenario] = bench_cache(config, pages, work_dir)
+            elif scenario == 'end_to_end':
+                results[scenario] = bench_end_to_end(config, pages, work_dir)
+            elif scenario == 'cpu':
+                results[scenario] = bench_cpu(config, pages, cpu_workers, work_dir)
+            else:
+                raise ValueError(f"Unknown scenario: {scenario}")
+    return {
+        'meta': {
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pages': pages,
+            'batch_size': batch_size,
+            'cpu_count': os.cpu_count(),
+            'backend': asdict(config),
+        },
+        'results': results,
+    }
+
+
+def flatten(results: dict[str, Any], prefix: str = "") -> dict[str, float]:
+    """``{'generate': {'replicas_1': {'pages_per_second': 9.5}}}`` -> ``{'generate.replicas_1.pages_per_second': 9.5}``"""
+    flat: dict[str, float] = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = float(value)
+    return flat
+
+
+def compare(old: dict[str, Any], new: dict[str, Any], max_regression: float) -> list[tuple[str, float, float, bool]]:
+    """Compare throughput and timing metrics present in both result documents.
+
+    Returns ``(metric, old, new, regressed)`` rows; a throughput drop or a duration
+    increase larger than ``max_regression`` (a fraction) counts as a regression.
+    Counters and per-stage sums are listed but never flagged.
+    """
+    old_flat, new_flat = flatten(old['results']), flatten(new['results'])
+    rows = []
+    for name in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[name], new_flat[name]
+        regressed = False
+        if before > 0:
+            if name.endswith(_THROUGHPUT_SUFFIXES):
+                regressed = after < before * (1 - max_regression)
+            elif name.endswith('_seconds') and not name.startswith('end_to_end.stages_seconds'):
+                regressed = after > before * (1 + max_regression)
+        rows.append((name, before, after, regressed))
+    return rows
+
+
+def _git_commit() -> str | None:
+    try:
+        completed = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return completed.stdout.strip() or None
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='pdf-craftq bench',
+        description='Measure throughput and overhead against a deterministic fake model (no GPU needed)',
+    )
+    parser.add_argument(
+        '-o', '--output',
+        type=Path,
+        help='Write the results as JSON to this file',
+    )
+    parser.add_argument(
+        '--pages',
+        type=int,
+        default=32,
+        help='Pages per scenario (default: 32)',
+    )
+    parser.add_argument(
+        '--latency-ms',
+        type=float,
+        default=10.0,
+        help='Fake model latency per page in milliseconds (default: 10)',
+    )
+    parser.add_argument(
+        '--output-tokens',
+        type=int,
+        default=200,
+        help='Tokens (words) the fake model returns per page (default: 200)',
+    )
+    parser.add_argument(
+        '--per-token-ms',
+        type=float,
+        default=0.0,
+        help='Extra fake latency per output token in milliseconds (default: 0)',
+    )
+    parser.add_argument(
+        '--replicas',
+        default='1,2,4',
+        help='Comma-separated replica counts for the scaling scenario (default: 1,2,4)',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=4,
+        help='Pages per generate_batch chunk, run concurrently on one replica, '
+             'measured next to one page per chunk; 1 skips it (default: 4)',
+    )
+    parser.add_argument(
+        '--cpu-workers',
+        default='1,2,4',
+        help='Comma-separated concurrent page counts for the cpu scenario (default: 1,2,4)',
+    )
+    parser.add_argument(
+        '--scenario',
+        dest='scenarios',
+        action='append',
+        choices=SCENARIOS,
+        help='Run only this scenario; repeat to select several (default: all)',
+    )
+    parser.add_argument(
+        '--compare',
+        type=Path,
+        metavar='FILE',
+        help='Compare against an earlier result file and exit 1 on regressions',
+    )
+    parser.add_argument(
+        '--max-regression',
+        type=float,
+        default=0.2,
+        metavar='FRACTION',
+        help='Allowed slowdown before --compare reports a regression (default: 0.2)',
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        replicas = [int(count) for count in args.replicas.split(',')]
+        cpu_workers = [int(count) for count in args.cpu_workers.split(',')]
+    except ValueError:
+        parser.error('--replicas and --cpu-workers must be comma-separated integers')
+    if args.pages <= 0 or args.batch_size <= 0 or any(count <= 0 for count in replicas + cpu_workers):
+        parser.error('--pages, --batch-size, --replicas and --cpu-workers must be positive')
+
+    baseline = None
+    if args.compare is not None:
+        try:
+            baseline = json.loads(args.compare.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            print(f"Error: Cannot read {args.compare}: {e}", file=sys.stderr)
+            return 1
+
+    config = FakeBackendConfig(
+        latency_ms=args.latency_ms,
+        output_tokens=args.output_tokens,
+        per_token_ms=args.per_token_ms,
+    )
+    result = run_benchmarks(
+        config,
+        pages=args.pages,
+        replicas=replicas,
+        scenarios=tuple(args.scenarios or SCENARIOS),
+        on_progress=lambda scenario: print(f"Running {scenario}...", file=sys.stderr),
+        cpu_workers=cpu_workers,
+        batch_size=args.batch_size,
+    )
+
+    if args.output is not None:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(result, indent=2) + "\n", encoding='utf-8')
+    for name, value in flatten(result['results']).items():
+        print(f"{name:60} {value:g}")
+    if args.output is not None:
+        print(f"Results -> {args.output}")
+
+    if baseline is None:
+        return 0
+    rows = compare(baseline, result, args.max_regression)
+    regressions = [row for row in rows if row[3]]
+    print(f"\nCompared with {args.compare} ({baseline.get('meta', {}).get('commit') or 'unknown commit'}):")
+    for name, before, after, regressed in rows:
+        change = (after - before) / before * 100 if before else 0.0
+        print(f"  {name:58} {before:>10g} -> {after:<10g} {change:+6.1f}%{'  REGRESSION' if regressed else ''}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.max_regression:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+文档转换断点续传
+
+每次转换在输出文件旁建立 `<输出文件名>.craftq/` 目录：
+- analysing/：交给 pdf_craft 的分析目录，已识别页面的 page_N.xml 保存在 analysing/ocr/ 下
+- journal.jsonl：首行为文档头（PDF 哈希与影响识别结果的选项），其后每完成一页追加一行
+
+日志以 O_APPEND 单次写入整行并 fsync，进程被 kill -9 时最多留下最后一行残片，
+读取时截掉即可。日志是已完成页面的唯一依据：没有日志记录的 page_N.xml 会被删除重做。
+因文档 token 预算被截断的页面记为 truncated，续传时同样删除重做，以新的预算识别完整。
+转换成功后整个目录被删除。
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable
+
+from ocr_cache import OCRCache
+
+if TYPE_CHECKING:
+    from pdf_craft import OCREvent, OCRTokensMetering
+
+
+_JOURNAL_VERSION = 1
+_CHECKPOINT_SUFFIX = ".craftq"
+
+
+class CheckpointMismatchError(Exception):
+    """已有断点与当前 PDF 或识别选项不一致"""
+
+
+class Checkpoint:
+    """
+    单个文档的断点目录与页面日志
+
+    Args:
+        output_path: 转换输出文件，断点目录建在它旁边
+        pdf_path: 输入 PDF
+        options: 影响页面识别结果的选项（ocr_size 等），续传时必须一致
+        truncated: 页面完成时调用，返回 True 表示该页因预算被截断，续传时需要重做
+    """
+
+    def __init__(
+        self,
+        output_path: Path,
+        pdf_path: Path,
+        options: dict[str, Any],
+        truncated: Callable[[], bool] | None = None,
+    ) -> None:
+        self._path = output_path.with_name(output_path.name + _CHECKPOINT_SUFFIX)
+        self._pdf_path = pdf_path
+        self._options = options
+        self._truncated = truncated
+        self._pages: dict[int, dict[str, Any]] = {}
+        self._fd: int | None = None
+
+    @property
+    def path(self) -> Path:
+        return self._path
+
+    @property
+    def analysing_path(self) -> Path:
+        return self._path / "analysing"
+
+    @property
+    def journal_path(self) -> Path:
+        return self._path / "journal.jsonl"
+
+    @property
+    def completed_pages(self) -> set[int]:
+        return set(self._pages)
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(page["input_tokens"] for page in self._pages.values())
+
+    @property
+    def output_tokens(self) -> int:
+        return sum(page["output_tokens"] for page in self._pages.values())
+
+    def metering(self) -> "OCRTokensMetering":
+        """日志中所有页面（含此前运行完成的页面）的 token 合计"""
+        from pdf_craft import OCRTokensMetering
+
+        return OCRTokensMetering(input_tokens=self.input_tokens, output_tokens=self.output_tokens)
+
+    def open(self, resume: bool) -> int:
+        """
+        打开日志准备追加，返回已完成的页数
+
+        Args:
+            resume: 为 True 时沿用已有断点；否则丢弃旧断点重新开始
+
+        Raises:
+            CheckpointMismatchError: 续传时 PDF 内容或识别选项已改变
+        """
+        header = {
+            "version": _JOURNAL_VERSION,
+            "pdf_sha256": OCRCache.file_digest(self._pdf_path),
+            "options": self._options,
+        }
+        if resume and self.journal_path.exists():
+            records = self._read_journal()
+            if not records or records[0].get("type") != "header":
+                raise CheckpointMismatchError(f"Checkpoint journal has no header: {self.journal_path}")
+            found = {key: records[0].get(key) for key in header}
+            if found != header:
+                raise CheckpointMismatchError(
+                    f"Checkpoint {self._path} was created for a different PDF or different options; "
+                    f"remove it or run without --resume"
+                )
+            for record in records[1:]:
+                if not record.get("truncated"):
+                    self._pages[record["page_index"]] = record
+            self._discard_unjournaled_pages()
+        else:
+            self.remove()
+            self._path.mkdir(parents=True)
+            self._write_header({"type": "header", **header})
+
+        self._fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND)
+        return len(self._pages)
+
+    def on_ocr_event(self, event: "OCREvent") -> None:
+        from pdf_craft import OCREventKind
+
+        # COMPLETE/FAILED 在 page_N.xml 落盘之后才产生，此时记录日志
+        if event.kind not in (OCREventKind.COMPLETE, OCREventKind.FAILED):
+            return
+        record = {
+            "type": "page",
+            "page_index": event.page_index,
+            "failed": event.kind == OCREventKind.FAILED,
+            "input_tokens": event.input_tokens,
+            "output_tokens": event.output_tokens,
+        }
+        if event.kind == OCREventKind.COMPLETE and self._truncated is not None and self._truncated():
+            record["truncated"] = True
+        self._append(record)
+        self._pages[event.page_index] = record
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    def remove(self) -> None:
+        self.close()
+        if self._path.exists():
+            shutil.rmtree(self._path)
+
+    def _append(self, record: dict[str, Any]) -> None:
+        if self._fd is None:
+            raise RuntimeError("Checkpoint is not open")
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        # 单次 write 追加整行，不会与其他记录交错
+        os.write(self._fd, line)
+        os.fsync(self._fd)
+
+    def _write_header(self, header: dict[str, Any]) -> None:
+        temp_path = self.journal_path.with_suffix(".tmp")
+        with open(temp_path, "wb") as f:
+            f.write((json.dumps(header, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+        temp_path.replace(self.journal_path)
+
+    def _read_journal(self) -> list[dict[str, Any]]:
+        data = self.journal_path.read_bytes()
+        complete_length = data.rfind(b"\n") + 1
+        if complete_length < len(data):
+            # 截掉被中断写入的最后一行残片
+            with open(self.journal_path, "r+b") as f:
+                f.truncate(complete_length)
+                os.fsync(f.fileno())
+        return [json.loads(line) for line in data[:complete_length].splitlines() if line.strip()]
+
+    def _discard_unjournaled_pages(self) -> None:
+        ocr_path = self.analysing_path / "ocr"
+        if not ocr_path.exists():
+            return
+        # done 标记会让 pdf_craft 跳过整个识别阶段，只在日志确认后才可信
+        (ocr_path / "done").unlink(missing_ok=True)
+        for page_file in ocr_path.glob("page_*.xml"):
+            try:
+                page_index = int(page_file.stem.removeprefix("page_"))
+            except ValueError:
+                continue
+            if page_index not in self._pages:
+                page_file.unlink()
@@ -5,15 +5,60 @@ PDF-CraftQ CLI - PDF to Markdown/EPUB converter using quantized DeepSeek OCR mod
 Usage similar to pandoc:
     pdf-craftq input.pdf -o output.md
     pdf-craftq input.pdf -o output.epub
+    pdf-craftq input.pdf -o output.md --resume   # continue after a failure
+    pdf-craftq input.pdf -o - | less             # stream Markdown page by page
+
+Batch mode (one warm model shared across all files):
+    pdf-craftq books/ -o out/
+    pdf-craftq "scans/**/*.pdf" -o out/ -t epub
+    pdf-craftq @manifest.txt -o out/
+
+Shards (fan one large PDF out over several machines, then merge):
+    pdf-craftq big.pdf --shard 1/4 -o parts/1
+    pdf-craftq merge parts/1 parts/2 parts/3 parts/4 -o big.md
+
+Server mode (model stays loaded between invocations):
+    pdf-craftq serve --port 8765
+    pdf-craftq input.pdf -o output.md --server http://127.0.0.1:8765
+
+Benchmarks (deterministic fake model, no GPU needed):
+    pdf-craftq bench -o bench.json --compare previous.json
 """
 
 import argparse
+import glob
 import sys
+import threading
+import time
+from concurrent.futures import Executor, Future, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager, nullcontext, redirect_stdout
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Iterator
+
+# quantized_model pulls in transformers, huggingface_hub and doc_page_extractor,
+# which takes seconds. It is imported by install_model_patch() right before the
+# first conversion so that --help, --version and argument errors return at once.
 
-# Apply quantized model patch before importing pdf_craft
-from quantized_model import apply_quantized_model_patch
-apply_quantized_model_patch(quiet=True)
+if TYPE_CHECKING:
+    from pdf_craft import OCREvent, OCRTokensMetering, PDFHandler, Transform
+    from checkpoint import Checkpoint
+    from metrics import MetricsCollector
+    from ocr_cache import OCRCache
+    from prefetch import PrefetchPDFHandler
+
+_GLOB_CHARS = ('*', '?', '[')
+
+_patch_lock = threading.Lock()
+_patch_options: dict[str, Any] = {}
+_patch_installed = False
+# Longest page side after --prefetch downscaling; it changes what the model sees
+_prefetch_max_side: int | None = None
+
+# Model options that change page results; a resumed conversion must use the same ones
+_RESULT_OPTIONS = (
+    'revision', 'device', 'cpu_dtype', 'max_new_tokens', 'repetition_stop',
+    'draft_size', 'min_confidence', 'max_auto_escalations',
+)
 
 
 def get_output_format(output_path: Path, explicit_format: str | None) -> str:
@@ -30,6 +75,317 @@ def get_output_format(output_path: Path, explicit_format: str | None) -> str:
         return 'markdown'  # default
 
 
+def add_model_arguments(parser: argparse.ArgumentParser) -> None:
+    """Model options shared by the convert and serve commands."""
+    parser.add_argument(
+        '--cache-dir',
+        type=Path,
+        help='Cache page OCR results in this directory and reuse them on later runs',
+    )
+    parser.add_argument(
+        '--cache-size',
+        type=int,
+        default=1024,
+        metavar='MB',
+        help='Maximum OCR cache size in MB, least recently used entries are evicted (default: 1024)',
+    )
+    parser.add_argument(
+        '--max-page-tokens',
+        type=int,
+        metavar='N',
+        help='Stop decoding a page after N output tokens (default: the model limit of 8192)',
+    )
+    parser.add_argument(
+        '--repetition-stop',
+        type=int,
+        metavar='N',
+        help='Stop decoding a page once its output ends in the same passage repeated N times, '
+             'keeping one copy (default: off)',
+    )
+    parser.add_argument(
+        '--dedup-pages',
+        action='store_true',
+        help='Skip blank pages and reuse the result of near-identical pages within a document '
+             'instead of running the model on them',
+    )
+    parser.add_argument(
+        '--dedup-threshold',
+        type=float,
+        default=0.15,
+        metavar='D',
+        help='Largest thumbnail difference (0-1) at which two pages count as duplicates; '
+             '0 only skips blank pages (default: 0.15)',
+    )
+    parser.add_argument(
+        '--draft-size',
+        choices=['tiny', 'small', 'base'],
+        help='Recognize each page at this size first and re-run only low-confidence pages at '
+             'the requested --ocr-size (default: off)',
+    )
+    parser.add_argument(
+        '--min-confidence',
+        type=float,
+        default=0.85,
+        metavar='C',
+        help='Lowest confidence (0-1) at which a --draft-size result is kept (default: 0.85)',
+    )
+    parser.add_argument(
+        '--debug-artifacts',
+        type=Path,
+        metavar='DIR',
+        help='Keep the per-page OCR artifacts (result.mmd, annotated images) in this directory',
+    )
+    parser.add_argument(
+        '--model-revision',
+        metavar='REV',
+        help='Pin the model to this commit hash, tag or branch; a pinned commit that is '
+             'already cached loads without contacting the Hub',
+    )
+    parser.add_argument(
+        '--materialized-model',
+        type=Path,
+        metavar='DIR',
+        help='Keep a load-ready copy of the model (weights merged into one file) in this local '
+             'directory and load from it; refreshed when the cached snapshot changes',
+    )
+    parser.add_argument(
+        '--device',
+        choices=['cuda', 'cpu', 'auto'],
+        default='cuda',
+        help='Run the model on the GPU (4-bit weights) or on the CPU (full-precision weights); '
+             '"auto" uses the CPU only when no GPU is available (default: cuda)',
+    )
+    parser.add_argument(
+        '--cpu-dtype',
+        choices=['bfloat16', 'float32', 'int8'],
+        default='bfloat16',
+        help='CPU compute precision; int8 applies dynamic quantization to the linear layers '
+             '(default: bfloat16)',
+    )
+    parser.add_argument(
+        '--cpu-workers',
+        type=int,
+        metavar='N',
+        help='Pages recognized concurrently on the CPU (default: one per 4 cores)',
+    )
+    parser.add_argument(
+        '--cpu-threads',
+        type=int,
+        metavar='N',
+        help='Intra-op threads per page on the CPU (default: cores / --cpu-workers)',
+    )
+
+
+def configure_model_patch(
+    args: argparse.Namespace,
+    metrics: "MetricsCollector | None" = None,
+    **extra_options: Any,
+) -> "OCRCache | None":
+    """Select the model options; the patch is installed before the first conversion."""
+    model_options = dict(extra_options)
+    if metrics is not None:
+        model_options['metrics'] = metrics
+    ocr_cache = None
+    if args.cache_dir is not None:
+        from ocr_cache import OCRCache
+        ocr_cache = OCRCache(args.cache_dir, max_size_bytes=args.cache_size * 1024**2)
+        model_options['ocr_cache'] = ocr_cache
+    if args.max_page_tokens is not None:
+        model_options['max_new_tokens'] = args.max_page_tokens
+    if args.repetition_stop is not None:
+        model_options['repetition_stop'] = args.repetition_stop
+    if args.dedup_pages:
+        from page_dedup import PageDeduplicator
+        model_options['page_dedup'] = PageDeduplicator(max_difference=args.dedup_threshold)
+    if args.draft_size is not None:
+        model_options['draft_size'] = args.draft_size
+        model_options['min_confidence'] = args.min_confidence
+    if args.debug_artifacts is not None:
+        model_options['debug_output_path'] = args.debug_artifacts
+    if args.model_revision is not None:
+        model_options['revision'] = args.model_revision
+    if args.materialized_model is not None:
+        model_options['materialized_path'] = args.materialized_model
+    if args.device != 'cuda':
+        model_options['device'] = args.device
+        model_options['cpu_dtype'] = args.cpu_dtype
+        model_options['cpu_workers'] = args.cpu_workers
+        model_options['cpu_threads'] = args.cpu_threads
+
+    global _patch_options, _patch_installed
+    with _patch_lock:
+        _patch_options = model_options
+        _patch_installed = False
+    return ocr_cache
+
+
+def result_options() -> dict[str, Any]:
+    """The configured model options that change page results, for the resume header and shard manifests."""
+    with _patch_lock:
+        options = {name: _patch_options[name] for name in _RESULT_OPTIONS if name in _patch_options}
+        page_dedup = _patch_options.get('page_dedup')
+        prefetch_max_side = _prefetch_max_side
+    if page_dedup is not None:
+        options['page_dedup'] = {
+            'blank_ink_blocks': page_dedup.blank_ink_blocks,
+            'max_difference': page_dedup.max_difference,
+        }
+    if prefetch_max_side is not None:
+        options['prefetch_max_side'] = prefetch_max_side
+    return options
+
+
+def install_model_patch() -> None:
+    """Apply the quantized model patch with the configured options, once."""
+    global _patch_installed
+    with _patch_lock:
+        if _patch_installed:
+            return
+        from quantized_model import apply_quantized_model_patch
+        apply_quantized_model_patch(quiet=True, **_patch_options)
+        _patch_installed = True
+
+
+def print_cache_stats(ocr_cache: "OCRCache") -> None:
+    stats = ocr_cache.stats()
+    print(
+        f"OCR cache: {stats.hits} hits, {stats.misses} misses, "
+        f"{stats.evictions} evicted, {stats.entries} entries ({stats.size_bytes / 1024**2:.1f} MB)"
+    )
+
+
+def describe_error(error: BaseException) -> str:
+    """Message for a failed conversion; a spent token budget is named as such."""
+    cause: BaseException | None = error
+    while cause is not None:
+        # pdf_craft wraps errors raised while extracting a page in an OCRError
+        if type(cause).__name__ == 'TokenLimitError':
+            return 'Output token budget exhausted; the finished pages are kept, --resume continues'
+        cause = cause.__cause__
+    return str(error)
+
+
+def write_metrics(metrics: "MetricsCollector", path: Path) -> None:
+    metrics.write_json(path)
+    report = metrics.report()
+    pages = report['pages']
+    details = ''
+    if pages['blank'] or pages['reused']:
+        details += f", {pages['blank']} blank skipped, {pages['reused']} duplicates reused"
+    if pages['truncated']:
+        details += f", {pages['truncated']} truncated"
+    if pages['drafted']:
+        details += f", {pages['escalated']}/{pages['drafted']} drafts escalated"
+    print(
+        f"Metrics: {pages['recognized']} pages in {report['wall_seconds']:.1f}s "
+        f"({pages['per_second']:.2f} pages/s, p90 {pages['latency_ms']['p90']:.0f} ms{details}) -> {path}"
+    )
+
+
+def create_transform(local_only: bool, pdf_handler: "PDFHandler | None" = None) -> "Transform":
+    """Create a pdf_craft Transform; its OCR model is loaded once and reused."""
+    install_model_patch()
+    from pdf_craft import Transform
+
+    return Transform(pdf_handler=pdf_handler, local_only=local_only)
+
+
+def create_pdf_handler(args: argparse.Namespace) -> "PrefetchPDFHandler | None":
+    """Page prefetching handler for ``--prefetch``; the caller closes it."""
+    global _prefetch_max_side
+    if args.prefetch <= 0:
+        with _patch_lock:
+            _prefetch_max_side = None
+        return None
+    from prefetch import PrefetchPDFHandler, prefetch_max_side
+
+    max_side = prefetch_max_side(args.ocr_size)
+    with _patch_lock:
+        # downscaled pages are recognized differently; --resume and merge must not mix them
+        _prefetch_max_side = max_side
+    return PrefetchPDFHandler(prefetch=args.prefetch, max_side=max_side)
+
+
+@contextmanager
+def _document_metrics(
+    metrics: "MetricsCollector | None",
+    on_ocr_event: "Callable[[OCREvent], None] | None",
+) -> "Iterator[Callable[[OCREvent], None]]":
+    """Time one conversion and yield an OCR event handler feeding ``metrics``."""
+    forward = on_ocr_event or (lambda _: None)
+    if metrics is None:
+        yield forward
+        return
+
+    from scheduler import current_job
+
+    # keyed like the model's truncation reports: by the document of the enclosing job
+    with metrics.document(current_job().document) as document:
+        def handle(event: "OCREvent") -> None:
+            document.on_ocr_event(event)
+            forward(event)
+        yield handle
+
+
+def _chain_ocr_events(
+    *handlers: "Callable[[OCREvent], None] | None",
+) -> "Callable[[OCREvent], None] | None":
+    active = [handler for handler in handlers if handler is not None]
+    if len(active) <= 1:
+        return active[0] if active else None
+
+    def handle(event: "OCREvent") -> None:
+        for handler in active:
+            handler(event)
+    return handle
+
+
+@contextmanager
+def _document_checkpoint(
+    pdf_path: Path,
+    output_path: Path,
+    ocr_size: str,
+    includes_footnotes: bool,
+    enabled: bool,
+    resume: bool,
+    verbose: bool,
+) -> "Iterator[Checkpoint | None]":
+    """Open the page journal for one conversion; removed on success, kept on failure."""
+    if not enabled and not resume:
+        yield None
+        return
+
+    from checkpoint import Checkpoint
+    from scheduler import current_job
+
+    budget = current_job().budget
+    journal = Checkpoint(
+        output_path=output_path,
+        pdf_path=pdf_path,
+        options={'ocr_size': ocr_size, 'includes_footnotes': includes_footnotes, **result_options()},
+        # pages cut short by the document budget are redone on --resume
+        truncated=budget.take_truncated if budget is not None else None,
+    )
+    finished_pages = journal.open(resume)
+    if verbose and finished_pages:
+        print(f"Resuming from {journal.path}: {finished_pages} page(s) already done")
+    try:
+        yield journal
+    except BaseException:
+        journal.close()
+        raise
+    journal.remove()
+
+
+@contextmanager
+def _document_job(pdf_path: Path, priority: str | None, max_output_tokens: int | None = None) -> Iterator[None]:
+    """Queue this document's pages as one fair-share unit on the shared model."""
+    from scheduler import job
+
+    with job(document=str(pdf_path.resolve()), priority=priority, max_output_tokens=max_output_tokens):
+        yield
+
+
 def convert_to_markdown(
     pdf_path: Path,
     output_path: Path,
@@ -39,30 +395,68 @@ def convert_to_markdown(
     includes_footnotes: bool,
     ignore_pdf_errors: bool,
     verbose: bool,
-) -> None:
-    """Convert PDF to Markdown."""
-    from pdf_craft import transform_markdown
+    transform: "Transform | None" = None,
+    on_ocr_event: "Callable[[OCREvent], None] | None" = None,
+    aborted: Callable[[], bool] | None = None,
+    metrics: "MetricsCollector | None" = None,
+    checkpoint: bool = False,
+    resume: bool = False,
+    priority: str | None = None,
+    max_document_tokens: int | None = None,
+    assembler: "Executor | None" = None,
+) -> "OCRTokensMetering | Future[OCRTokensMetering]":
+    """Convert PDF to Markdown.
+
+    Pass a shared ``transform`` to reuse an already loaded model across calls
+    and a ``metrics`` collector to record per-stage timings. With ``checkpoint``
+    finished pages are journaled next to the output; ``resume`` continues from
+    an existing journal instead of starting over. ``priority`` (interactive,
+    normal or bulk) orders this document's pages against other documents
+    sharing the model; unset, it inherits the caller's ``scheduler.job``.
+    ``max_document_tokens`` caps the output tokens of all pages together: the
+    page reaching it is truncated and the conversion stops with a token limit
+    error, its finished pages kept in the checkpoint.
+
+    With an ``assembler`` (requires ``checkpoint``) only the pages are
+    recognized here; chapter analysis and rendering are queued on the
+    assembler and a future of the result is returned, so the caller can start
+    recognizing the next document meanwhile.
+    """
+    if transform is None:
+        transform = create_transform(local_only)
 
     if verbose:
         print(f"Converting {pdf_path} to Markdown...")
 
-    result = transform_markdown(
-        pdf_path=str(pdf_path),
-        markdown_path=str(output_path),
-        markdown_assets_path=str(assets_path) if assets_path else None,
-        ocr_size=ocr_size,
-        local_only=local_only,
-        includes_footnotes=includes_footnotes,
-        ignore_pdf_errors=ignore_pdf_errors,
-    )
+    def assemble(journal: "Checkpoint | None", on_ocr_event: "Callable[[OCREvent], None]") -> "OCRTokensMetering":
+        result = transform.transform_markdown(
+            pdf_path=str(pdf_path),
+            markdown_path=str(output_path),
+            markdown_assets_path=str(assets_path) if assets_path else None,
+            analysing_path=str(journal.analysing_path) if journal else None,
+            ocr_size=ocr_size,
+            includes_footnotes=includes_footnotes,
+            ignore_pdf_errors=ignore_pdf_errors,
+            on_ocr_event=on_ocr_event,
+            aborted=aborted or (lambda: False),
+        )
+        if journal is not None:
+            # pdf_craft only meters pages recognized in this run; the journal has them all
+            result = journal.metering()
+        if verbose:
+            print(f"Conversion complete!")
+            print(f"  Input tokens: {result.input_tokens}")
+            print(f"  Output tokens: {result.output_tokens}")
+            print(f"  Output: {output_path}")
+            if assets_path and assets_path.exists():
+                print(f"  Assets: {assets_path}")
+        return result
 
-    if verbose:
-        print(f"Conversion complete!")
-        print(f"  Input tokens: {result.input_tokens}")
-        print(f"  Output tokens: {result.output_tokens}")
-        print(f"  Output: {output_path}")
-        if assets_path and assets_path.exists():
-            print(f"  Assets: {assets_path}")
+    return _convert_document(
+        transform, pdf_path, output_path, ocr_size, includes_footnotes, False, ignore_pdf_errors,
+        verbose, on_ocr_event, aborted, metrics, checkpoint, resume, priority, max_document_tokens,
+        assembler, assemble,
+    )
 
 
 def convert_to_epub(
@@ -75,32 +469,628 @@ def convert_to_epub(
     ignore_pdf_errors: bool,
     language: str,
     verbose: bool,
-) -> None:
-    """Convert PDF to EPUB."""
-    from pdf_craft import transform_epub
+    transform: "Transform | None" = None,
+    on_ocr_event: "Callable[[OCREvent], None] | None" = None,
+    aborted: Callable[[], bool] | None = None,
+    metrics: "MetricsCollector | None" = None,
+    checkpoint: bool = False,
+    resume: bool = False,
+    priority: str | None = None,
+    max_document_tokens: int | None = None,
+    assembler: "Executor | None" = None,
+) -> "OCRTokensMetering | Future[OCRTokensMetering]":
+    """Convert PDF to EPUB.
+
+    Pass a shared ``transform`` to reuse an already loaded model across calls
+    and a ``metrics`` collector to record per-stage timings. With ``checkpoint``
+    finished pages are journaled next to the output; ``resume`` continues from
+    an existing journal instead of starting over. ``priority`` (interactive,
+    normal or bulk) orders this document's pages against other documents
+    sharing the model; unset, it inherits the caller's ``scheduler.job``.
+    ``max_document_tokens`` caps the output tokens of all pages together: the
+    page reaching it is truncated and the conversion stops with a token limit
+    error, its finished pages kept in the checkpoint.
+
+    With an ``assembler`` (requires ``checkpoint``) only the pages are
+    recognized here; chapter analysis, the table of contents and packaging
+    are queued on the assembler and a future of the result is returned.
+    """
+    if transform is None:
+        transform = create_transform(local_only)
 
     if verbose:
         print(f"Converting {pdf_path} to EPUB...")
 
-    result = transform_epub(
-        pdf_path=str(pdf_path),
-        epub_path=str(output_path),
+    def assemble(journal: "Checkpoint | None", on_ocr_event: "Callable[[OCREvent], None]") -> "OCRTokensMetering":
+        result = transform.transform_epub(
+            pdf_path=str(pdf_path),
+            epub_path=str(output_path),
+            analysing_path=str(journal.analysing_path) if journal else None,
+            ocr_size=ocr_size,
+            includes_cover=includes_cover,
+            includes_footnotes=includes_footnotes,
+            ignore_pdf_errors=ignore_pdf_errors,
+            lan=language,
+            on_ocr_event=on_ocr_event,
+            aborted=aborted or (lambda: False),
+        )
+        if journal is not None:
+            # pdf_craft only meters pages recognized in this run; the journal has them all
+            result = journal.metering()
+        if verbose:
+            print(f"Conversion complete!")
+            print(f"  Input tokens: {result.input_tokens}")
+            print(f"  Output tokens: {result.output_tokens}")
+            print(f"  Output: {output_path}")
+        return result
+
+    return _convert_document(
+        transform, pdf_path, output_path, ocr_size, includes_footnotes, includes_cover, ignore_pdf_errors,
+        verbose, on_ocr_event, aborted, metrics, checkpoint, resume, priority, max_document_tokens,
+        assembler, assemble,
+    )
+
+
+def _convert_document(
+    transform: "Transform",
+    pdf_path: Path,
+    output_path: Path,
+    ocr_size: str,
+    includes_footnotes: bool,
+    includes_cover: bool,
+    ignore_pdf_errors: bool,
+    verbose: bool,
+    on_ocr_event: "Callable[[OCREvent], None] | None",
+    aborted: Callable[[], bool] | None,
+    metrics: "MetricsCollector | None",
+    checkpoint: bool,
+    resume: bool,
+    priority: str | None,
+    max_document_tokens: int | None,
+    assembler: "Executor | None",
+    assemble: "Callable[[Checkpoint | None, Callable[[OCREvent], None]], OCRTokensMetering]",
+) -> "OCRTokensMetering | Future[OCRTokensMetering]":
+    """Run one conversion in its checkpoint and metrics scope, optionally handing assembly off."""
+    if assembler is not None and not checkpoint:
+        raise ValueError("Overlapped assembly needs the page checkpoint")
+
+    # The job scope is a context variable; it only matters while pages are queued for the model
+    with _document_job(pdf_path, priority, max_document_tokens), ExitStack() as scope:
+        journal = scope.enter_context(_document_checkpoint(
+            pdf_path, output_path, ocr_size, includes_footnotes, checkpoint, resume, verbose,
+        ))
+        on_ocr_event = scope.enter_context(_document_metrics(
+            metrics, _chain_ocr_events(journal.on_ocr_event if journal else None, on_ocr_event),
+        ))
+        if assembler is None:
+            return assemble(journal, on_ocr_event)
+
+        assert journal is not None
+        recognize_pages(
+            transform=transform,
+            pdf_path=pdf_path,
+            analysing_path=journal.analysing_path,
+            ocr_size=ocr_size,
+            includes_footnotes=includes_footnotes,
+            includes_cover=includes_cover,
+            ignore_pdf_errors=ignore_pdf_errors,
+            aborted=aborted or (lambda: False),
+            on_ocr_event=on_ocr_event,
+        )
+        # The checkpoint and the metrics scope now close when assembly finishes
+        pending = scope.pop_all()
+
+    def finish() -> "OCRTokensMetering":
+        with pending:
+            return assemble(journal, on_ocr_event)
+
+    return assembler.submit(finish)
+
+
+def recognize_pages(
+    transform: "Transform",
+    pdf_path: Path,
+    analysing_path: Path,
+    ocr_size: str,
+    includes_footnotes: bool,
+    includes_cover: bool,
+    ignore_pdf_errors: bool,
+    aborted: Callable[[], bool],
+    on_ocr_event: "Callable[[OCREvent], None]",
+) -> None:
+    """Run only the OCR stage of ``transform`` into ``analysing_path``.
+
+    The layout is the one ``transform_markdown``/``transform_epub`` use, and
+    pdf_craft marks it done once every page is recognized; a later transform
+    call on the same ``analysing_path`` goes straight to assembly.
+    """
+    from pdf_craft_compat import transform_ocr
+
+    # the transform's own OCR keeps the model that is already loaded
+    ocr = transform_ocr(transform)
+    for event in ocr.recognize(
+        pdf_path=pdf_path,
+        asset_path=analysing_path / "assets",
+        ocr_path=analysing_path / "ocr",
         ocr_size=ocr_size,
-        local_only=local_only,
-        includes_cover=includes_cover,
         includes_footnotes=includes_footnotes,
         ignore_pdf_errors=ignore_pdf_errors,
-        lan=language,
+        cover_path=analysing_path / "cover.png" if includes_cover else None,
+        aborted=aborted,
+    ):
+        on_ocr_event(event)
+
+
+STDOUT_PATH = Path('-')
+
+
+def convert_to_markdown_stream(
+    pdf_path: Path,
+    output_path: Path,
+    assets_path: Path | None,
+    ocr_size: str,
+    local_only: bool,
+    includes_footnotes: bool,
+    ignore_pdf_errors: bool,
+    verbose: bool,
+    pdf_handler: "PDFHandler | None" = None,
+    on_ocr_event: "Callable[[OCREvent], None] | None" = None,
+    aborted: Callable[[], bool] | None = None,
+    metrics: "MetricsCollector | None" = None,
+    priority: str | None = None,
+    max_document_tokens: int | None = None,
+) -> "OCRTokensMetering":
+    """Convert PDF to Markdown, appending each finished page to the output.
+
+    ``output_path`` ``-`` writes to stdout; everything else the conversion
+    prints goes to stderr meanwhile so the stream stays clean. Assets default
+    to ``assets`` next to the output (the working directory for stdout), as
+    with ``convert_to_markdown``. There is no checkpoint: an interrupted
+    stream is started over.
+    """
+    install_model_patch()
+    from pdf_craft import OCREventKind, OCRTokensMetering
+    from pdf_craft.pdf import OCR
+
+    from streaming import stream_markdown, write_markdown_stream
+
+    to_stdout = output_path == STDOUT_PATH
+    asset_ref_path = assets_path if assets_path is not None else Path('assets')
+    output_dir = Path('.') if to_stdout else output_path.parent
+    output_assets_path = asset_ref_path if asset_ref_path.is_absolute() else output_dir / asset_ref_path
+    metering = OCRTokensMetering(input_tokens=0, output_tokens=0)
+
+    def count_tokens(event: "OCREvent") -> None:
+        if event.kind == OCREventKind.COMPLETE:
+            metering.input_tokens += event.input_tokens
+            metering.output_tokens += event.output_tokens
+
+    stream = sys.stdout
+    with ExitStack() as stack:
+        if to_stdout:
+            stack.enter_context(redirect_stdout(sys.stderr))
+        else:
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+            stream = stack.enter_context(open(output_path, 'w', encoding='utf-8'))
+
+        if verbose:
+            print(f"Streaming {pdf_path} to Markdown...")
+
+        on_chunk = None
+        if verbose:
+            def on_chunk(chunk) -> None:
+                if not chunk.final:
+                    print(f"  Page {chunk.page_index}/{chunk.total_pages} written")
+
+        ocr = OCR(model_path=None, pdf_handler=pdf_handler, local_only=local_only)
+        with _document_job(pdf_path, priority, max_document_tokens), _document_metrics(
+            metrics, _chain_ocr_events(count_tokens, on_ocr_event),
+        ) as on_ocr_event:
+            write_markdown_stream(
+                stream_markdown(
+                    ocr=ocr,
+                    pdf_path=pdf_path,
+                    assets_path=output_assets_path,
+                    asset_ref_path=asset_ref_path,
+                    ocr_size=ocr_size,
+                    includes_footnotes=includes_footnotes,
+                    ignore_pdf_errors=ignore_pdf_errors,
+                    aborted=aborted or (lambda: False),
+                    on_ocr_event=on_ocr_event,
+                ),
+                output=stream,
+                on_chunk=on_chunk,
+            )
+
+        if verbose:
+            print(f"Conversion complete!")
+            print(f"  Input tokens: {metering.input_tokens}")
+            print(f"  Output tokens: {metering.output_tokens}")
+            print(f"  Output: {'<stdout>' if to_stdout else output_path}")
+
+    return metering
+
+
+def is_batch_input(inputs: list[str]) -> bool:
+    """Whether the positional inputs describe a batch rather than a single PDF."""
+    if len(inputs) != 1:
+        return True
+    spec = inputs[0]
+    return (
+        spec.startswith('@')
+        or any(c in spec for c in _GLOB_CHARS)
+        or Path(spec).is_dir()
     )
 
+
+def expand_inputs(inputs: list[str]) -> list[Path]:
+    """Expand directories, glob patterns and @manifest files into PDF paths.
+
+    A manifest lists one path per line; blank lines and lines starting with
+    ``#`` are ignored and relative paths are resolved against the manifest.
+    Duplicates are dropped while keeping the first occurrence's order.
+    """
+    pdf_paths: list[Path] = []
+    for spec in inputs:
+        if spec.startswith('@'):
+            manifest_path = Path(spec[1:])
+            if not manifest_path.is_file():
+                raise FileNotFoundError(f"Manifest file not found: {manifest_path}")
+            for line in manifest_path.read_text(encoding='utf-8').splitlines():
+                line = line.strip()
+                if not line or line.startswith('#'):
+                    continue
+                path = Path(line)
+                if not path.is_absolute():
+                    path = manifest_path.parent / path
+                pdf_paths.append(path)
+        elif any(c in spec for c in _GLOB_CHARS):
+            matched = sorted(glob.glob(spec, recursive=True))
+            pdf_paths.extend(Path(m) for m in matched if Path(m).is_file())
+        elif Path(spec).is_dir():
+            pdf_paths.extend(sorted(
+                p for p in Path(spec).iterdir()
+                if p.is_file() and p.suffix.lower() == '.pdf'
+            ))
+        else:
+            pdf_paths.append(Path(spec))
+
+    seen: set[Path] = set()
+    unique_paths: list[Path] = []
+    for path in pdf_paths:
+        key = path.resolve()
+        if key not in seen:
+            seen.add(key)
+            unique_paths.append(path)
+    return unique_paths
+
+
+def batch_output_paths(pdf_paths: list[Path], output_dir: Path, output_format: str) -> list[Path]:
+    """Map each input PDF to ``<output_dir>/<stem>.<ext>``, de-duplicating stems."""
+    suffix = '.epub' if output_format == 'epub' else '.md'
+    used: set[str] = set()
+    output_paths: list[Path] = []
+    for pdf_path in pdf_paths:
+        name = pdf_path.stem
+        candidate = name
+        counter = 2
+        while candidate.lower() in used:
+            candidate = f"{name}-{counter}"
+            counter += 1
+        used.add(candidate.lower())
+        output_paths.append(output_dir / f"{candidate}{suffix}")
+    return output_paths
+
+
+def build_job(args: argparse.Namespace, pdf_path: Path, output_path: Path, output_format: str) -> dict:
+    """Describe one conversion as a server job; paths are made absolute."""
+    return {
+        'pdf_path': str(pdf_path.resolve()),
+        'output_path': str(output_path.resolve()),
+        'format': output_format,
+        'assets_path': str(args.assets_path.resolve()) if args.assets_path else None,
+        'ocr_size': args.ocr_size,
+        'includes_cover': not args.no_cover,
+        'includes_footnotes': args.footnotes,
+        'ignore_pdf_errors': args.ignore_pdf_errors,
+        'language': args.language,
+        'resume': args.resume,
+        'priority': args.priority,
+        'max_document_tokens': args.max_document_tokens,
+    }
+
+
+def convert_remote(server_url: str, job: dict, verbose: bool) -> dict:
+    """Run a job on a ``pdf-craftq serve`` instance instead of loading a model."""
+    from server import request_conversion
+
+    def print_progress(event: dict) -> None:
+        if verbose and event['kind'] in ('COMPLETE', 'FAILED', 'SKIP'):
+            print(f"  Page {event['page_index']}/{event['total_pages']}: {event['kind'].lower()}")
+
+    if verbose:
+        print(f"Submitting {job['pdf_path']} to {server_url}...")
+    done = request_conversion(server_url, job, on_event=print_progress)
     if verbose:
         print(f"Conversion complete!")
-        print(f"  Input tokens: {result.input_tokens}")
-        print(f"  Output tokens: {result.output_tokens}")
-        print(f"  Output: {output_path}")
+        print(f"  Input tokens: {done['input_tokens']}")
+        print(f"  Output tokens: {done['output_tokens']}")
+        print(f"  Output: {done['output_path']}")
+    return done
+
+
+def run_part(
+    args: argparse.Namespace,
+    metrics: "MetricsCollector | None" = None,
+    pdf_handler: "PDFHandler | None" = None,
+) -> int:
+    """Recognize a page range or shard of one PDF into a partial result directory."""
+    from sharding import parse_page_ranges, parse_shard, recognize_part, select_pages
+
+    pdf_path = Path(args.input[0])
+    install_model_patch()
+    from pdf_craft.pdf import OCR, pdf_pages_count
+
+    try:
+        ranges = parse_page_ranges(args.pages) if args.pages else None
+        shard = parse_shard(args.shard) if args.shard else None
+        pages = select_pages(pdf_pages_count(pdf_path), ranges, shard)
+        if args.verbose:
+            print(f"Recognizing {len(pages)} page(s) of {pdf_path} into {args.output}...")
+
+        ocr = OCR(model_path=None, pdf_handler=pdf_handler, local_only=args.local_only)
+        with _document_job(pdf_path, args.priority, args.max_document_tokens), \
+                _document_metrics(metrics, None) as on_ocr_event:
+            manifest = recognize_part(
+                ocr=ocr,
+                pdf_path=pdf_path,
+                part_path=args.output,
+                pages=pages,
+                ocr_size=args.ocr_size,
+                includes_footnotes=args.footnotes,
+                ignore_pdf_errors=args.ignore_pdf_errors,
+                on_ocr_event=on_ocr_event,
+                # merge refuses shards recognized with different model options
+                options=result_options(),
+            )
+    except KeyboardInterrupt:
+        print("\nInterrupted by user", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Shard complete: {len(manifest.pages)} of {manifest.total_pages} page(s) -> {args.output}")
+    if metrics is not None:
+        write_metrics(metrics, args.metrics_out)
+    return 0
+
+
+def merge_main(argv: list[str]) -> int:
+    """``pdf-craftq merge``: stitch shard directories into the final document."""
+    from sharding import merge_parts
+
+    parser = argparse.ArgumentParser(
+        prog='pdf-craftq merge',
+        description='Merge shard directories produced with --pages/--shard into Markdown or EPUB',
+    )
+    parser.add_argument(
+        'parts',
+        nargs='+',
+        type=Path,
+        help='Shard directories, in any order',
+    )
+    parser.add_argument(
+        '-o', '--output',
+        type=Path,
+        required=True,
+        help='Output file path (.md for Markdown, .epub for EPUB)',
+    )
+    parser.add_argument(
+        '-t', '--to',
+        choices=['markdown', 'md', 'epub'],
+        help='Output format (default: inferred from output file extension)',
+    )
+    parser.add_argument(
+        '--assets-path',
+        type=Path,
+        help='Directory for Markdown assets (default: assets/ next to output)',
+    )
+    parser.add_argument(
+        '--no-cover',
+        action='store_true',
+        help='EPUB: do not include cover page',
+    )
+    parser.add_argument(
+        '--language',
+        choices=['zh', 'en'],
+        default='zh',
+        help='EPUB: book language (default: zh)',
+    )
+    parser.add_argument(
+        '--allow-gaps',
+        action='store_true',
+        help='Merge even if the shards do not cover every page of the PDF',
+    )
+    args = parser.parse_args(argv)
+
+    output_format = 'epub' if get_output_format(args.output, args.to) == 'epub' else 'markdown'
+    try:
+        pages = merge_parts(
+            part_paths=args.parts,
+            output_path=args.output,
+            output_format=output_format,
+            assets_path=args.assets_path,
+            includes_cover=not args.no_cover,
+            language=args.language,
+            allow_gaps=args.allow_gaps,
+        )
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    print(f"Merged {len(pages)} page(s) from {len(args.parts)} shard(s) -> {args.output}")
+    return 0
+
+
+def run_batch(
+    args: argparse.Namespace,
+    output_format: str,
+    ocr_cache: "OCRCache | None" = None,
+    metrics: "MetricsCollector | None" = None,
+    pdf_handler: "PDFHandler | None" = None,
+) -> int:
+    """Convert every PDF of a batch through one process and one loaded model."""
+    pdf_paths = expand_inputs(args.input)
+    args.output.mkdir(parents=True, exist_ok=True)
+    output_paths = batch_output_paths(pdf_paths, args.output, output_format)
+
+    transform = None
+    try:
+        if args.server is None:
+            transform = create_transform(args.local_only, pdf_handler)
+            if args.verbose:
+                print(f"Loading model for {len(pdf_paths)} file(s)...")
+            transform.load_models()
+    except KeyboardInterrupt:
+        print("\nInterrupted by user", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"Error: Failed to load model: {e}", file=sys.stderr)
+        return 1
+
+    interrupted = threading.Event()
+    # Chapter analysis and packaging of one document run here while the model
+    # recognizes the next one; a single worker keeps the GIL-bound assembly
+    # from competing with itself
+    assembler = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-craftq-assembly") \
+        if args.server is None else None
+
+    def convert_item(pdf_path: Path, output_path: Path) -> "Future[Any]":
+        """Recognize one document; the returned future completes once its output is written."""
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"Input file not found: {pdf_path}")
+        if args.server is not None:
+            job = build_job(args, pdf_path, output_path, output_format)
+            convert_remote(args.server, job, args.verbose)
+            done: Future[Any] = Future()
+            done.set_result(None)
+            return done
+        elif output_format == 'epub':
+            return convert_to_epub(
+                pdf_path=pdf_path,
+                output_path=output_path,
+                ocr_size=args.ocr_size,
+                local_only=args.local_only,
+                includes_cover=not args.no_cover,
+                includes_footnotes=args.footnotes,
+                ignore_pdf_errors=args.ignore_pdf_errors,
+                language=args.language,
+                verbose=args.verbose,
+                transform=transform,
+                aborted=interrupted.is_set,
+                metrics=metrics,
+                checkpoint=True,
+                resume=args.resume,
+                priority=args.priority,
+                max_document_tokens=args.max_document_tokens,
+                assembler=assembler,
+            )
+        else:
+            return convert_to_markdown(
+                pdf_path=pdf_path,
+                output_path=output_path,
+                assets_path=args.assets_path,
+                ocr_size=args.ocr_size,
+                local_only=args.local_only,
+                includes_footnotes=args.footnotes,
+                ignore_pdf_errors=args.ignore_pdf_errors,
+                verbose=args.verbose,
+                transform=transform,
+                aborted=interrupted.is_set,
+                metrics=metrics,
+                checkpoint=True,
+                resume=args.resume,
+                priority=args.priority,
+                max_document_tokens=args.max_document_tokens,
+                assembler=assembler,
+            )
+
+    failed: list[Path] = []
+    total = len(pdf_paths)
+    items = list(enumerate(zip(pdf_paths, output_paths), start=1))
+    report_lock = threading.Lock()
+
+    def report(index: int, pdf_path: Path, output_path: Path, elapsed: float | None, error: BaseException | None) -> None:
+        with report_lock:
+            if error is not None:
+                failed.append(pdf_path)
+                print(f"[{index}/{total}] FAILED {pdf_path}: {describe_error(error)}", file=sys.stderr)
+            else:
+                print(f"[{index}/{total}] OK {pdf_path} -> {output_path} ({elapsed:.1f}s)")
+
+    def start_item(index: int, pdf_path: Path, output_path: Path) -> None:
+        started_at = time.perf_counter()
+        try:
+            assembly = convert_item(pdf_path, output_path)
+        except Exception as e:
+            report(index, pdf_path, output_path, None, e)
+            return
+
+        def finished(future: "Future[Any]") -> None:
+            error = KeyboardInterrupt() if future.cancelled() else future.exception()
+            report(index, pdf_path, output_path, None if error else time.perf_counter() - started_at, error)
+
+        assembly.add_done_callback(finished)
+
+    try:
+        if args.jobs <= 1:
+            for index, (pdf_path, output_path) in items:
+                start_item(index, pdf_path, output_path)
+        else:
+            # Several documents in flight let the model spread pages over all GPU replicas
+            with ThreadPoolExecutor(max_workers=args.jobs) as pool:
+                futures = [
+                    pool.submit(start_item, index, pdf_path, output_path)
+                    for index, (pdf_path, output_path) in items
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except KeyboardInterrupt:
+                    interrupted.set()
+                    pool.shutdown(wait=True, cancel_futures=True)
+                    raise
+        if assembler is not None:
+            # Only the assembly of the last document(s) is left to wait for
+            assembler.shutdown(wait=True)
+    except KeyboardInterrupt:
+        interrupted.set()
+        if assembler is not None:
+            assembler.shutdown(wait=True, cancel_futures=True)
+        print("\nInterrupted by user", file=sys.stderr)
+        return 130
+
+    print(f"Batch complete: {total - len(failed)} succeeded, {len(failed)} failed")
+    if ocr_cache is not None:
+        print_cache_stats(ocr_cache)
+    if metrics is not None:
+        write_metrics(metrics, args.metrics_out)
+    return 1 if failed else 0
 
 
 def main(argv: list[str] | None = None) -> int:
+    if argv is None:
+        argv = sys.argv[1:]
+    if argv and argv[0] == 'serve':
+        from server import main as serve_main
+        return serve_main(argv[1:])
+    if argv and argv[0] == 'merge':
+        return merge_main(argv[1:])
+    if argv and argv[0] == 'bench':
+        from bench import main as bench_main
+        return bench_main(argv[1:])
+
     parser = argparse.ArgumentParser(
         prog='pdf-craftq',
         description='Convert PDF to Markdown or EPUB using quantized DeepSeek OCR model',
@@ -111,14 +1101,23 @@ Examples:
   %(prog)s input.pdf -o output.epub        Convert PDF to EPUB
   %(prog)s input.pdf -t markdown -o out    Explicit format specification
   %(prog)s input.pdf -o out.md --ocr-size base   Use base OCR model size
+  %(prog)s input.pdf -o -                  Stream Markdown to stdout as pages finish
+  %(prog)s books/ -o out/                  Convert every PDF in a directory
+  %(prog)s "scans/*.pdf" -o out/ -t epub   Convert files matching a glob
+  %(prog)s @manifest.txt -o out/           Convert files listed in a manifest
+  %(prog)s serve --port 8765               Keep the model loaded in a local server
+  %(prog)s input.pdf -o out.md --server http://127.0.0.1:8765
+                                           Convert through a running server
+  %(prog)s big.pdf --shard 2/4 -o parts/2   Recognize the second quarter of the pages
+  %(prog)s merge parts/* -o big.md         Merge shard directories into one document
 ''',
     )
 
-    # Positional argument: input file
+    # Positional argument: input file, or a batch (directory, glob, @manifest)
     parser.add_argument(
         'input',
-        type=Path,
-        help='Input PDF file',
+        nargs='+',
+        help='Input PDF file, or a directory, glob pattern or @manifest for batch mode',
     )
 
     # Output file (required, like pandoc -o)
@@ -126,7 +1125,8 @@ Examples:
         '-o', '--output',
         type=Path,
         required=True,
-        help='Output file path (.md for Markdown, .epub for EPUB)',
+        help='Output file path (.md for Markdown, .epub for EPUB, - for Markdown on stdout); '
+             'output directory in batch mode',
     )
 
     # Output format (optional, inferred from extension if not specified)
@@ -139,9 +1139,10 @@ Examples:
     # OCR options
     parser.add_argument(
         '--ocr-size',
-        choices=['tiny', 'small', 'base', 'large', 'gundam'],
+        choices=['tiny', 'small', 'base', 'large', 'gundam', 'auto'],
         default='base',
-        help='OCR model size (default: base)',
+        help='OCR model size; "auto" picks the smallest size per page from its text density '
+             'and retries one size up when the output looks degenerate (default: base)',
     )
 
     parser.add_argument(
@@ -184,6 +1185,78 @@ Examples:
         help='Continue processing even if PDF errors occur',
     )
 
+    parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=1,
+        help='Batch mode: number of documents converted concurrently, '
+             'use the number of GPUs to keep every replica busy (default: 1)',
+    )
+
+    parser.add_argument(
+        '--priority',
+        choices=['interactive', 'normal', 'bulk'],
+        help='Queue priority of these pages when the model is shared with other documents, '
+             'e.g. through --jobs or --server (default: normal)',
+    )
+
+    parser.add_argument(
+        '--max-document-tokens',
+        type=int,
+        metavar='N',
+        help='Output token budget of each document; the page reaching it is truncated and the '
+             'conversion stops, --resume continues with a fresh budget',
+    )
+
+    add_model_arguments(parser)
+
+    parser.add_argument(
+        '--prefetch',
+        type=int,
+        default=0,
+        metavar='K',
+        help='Render and downscale the next K pages in worker processes while the GPU '
+             'recognizes the current one (default: 0, disabled)',
+    )
+
+    parser.add_argument(
+        '--pages',
+        metavar='RANGES',
+        help='Only recognize these pages, e.g. "1-200,350-"; -o names a shard directory for "merge"',
+    )
+
+    parser.add_argument(
+        '--shard',
+        metavar='I/N',
+        help='Only recognize the I-th of N contiguous page shards; -o names a shard directory for "merge"',
+    )
+
+    parser.add_argument(
+        '--stream',
+        action='store_true',
+        help='Append Markdown to the output page by page as recognition proceeds '
+             '(implied by -o -)',
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted conversion from the page checkpoint kept next to the output',
+    )
+
+    parser.add_argument(
+        '--metrics-out',
+        type=Path,
+        metavar='FILE',
+        help='Write per-stage timings, page throughput and latency percentiles as JSON',
+    )
+
+    parser.add_argument(
+        '--server',
+        metavar='URL',
+        help='Send the job to a running "pdf-craftq serve" instead of loading the model',
+    )
+
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
@@ -197,22 +1270,113 @@ Examples:
     )
 
     args = parser.parse_args(argv)
+    if args.metrics_out is not None and args.server is not None:
+        parser.error('--metrics-out cannot be combined with --server')
+    if (args.pages is not None or args.shard is not None) and args.server is not None:
+        parser.error('--pages and --shard cannot be combined with --server')
+    if args.output == STDOUT_PATH:
+        args.stream = True
+    if args.stream:
+        if args.to == 'epub' or (args.to is None and get_output_format(args.output, None) == 'epub'):
+            parser.error('streaming output is Markdown only')
+        if args.server is not None or args.pages is not None or args.shard is not None or args.resume:
+            parser.error('--stream and -o - cannot be combined with --server, --pages, --shard or --resume')
+        if is_batch_input(args.input):
+            parser.error('--stream and -o - take a single input PDF')
 
-    # Validate input file
-    if not args.input.exists():
-        print(f"Error: Input file not found: {args.input}", file=sys.stderr)
+    metrics = None
+    if args.metrics_out is not None:
+        from metrics import MetricsCollector
+        metrics = MetricsCollector()
+    ocr_cache = configure_model_patch(args, metrics) if args.server is None else None
+    return convert_inputs(args, ocr_cache, metrics)
+
+
+def check_inputs(args: argparse.Namespace) -> str | None:
+    """Describe what is wrong with the input and output paths, or None if they are usable."""
+    partial = args.pages is not None or args.shard is not None
+    if is_batch_input(args.input):
+        if partial:
+            return "--pages and --shard take a single input PDF"
+        try:
+            pdf_paths = expand_inputs(args.input)
+        except FileNotFoundError as e:
+            return str(e)
+        if not pdf_paths:
+            return "No PDF files matched the batch input"
+        if args.output.exists() and not args.output.is_dir():
+            return f"Batch output must be a directory: {args.output}"
+        return None
+
+    input_path = Path(args.input[0])
+    if not input_path.exists():
+        return f"Input file not found: {input_path}"
+    return None
+
+
+def convert_inputs(
+    args: argparse.Namespace,
+    ocr_cache: "OCRCache | None",
+    metrics: "MetricsCollector | None",
+) -> int:
+    """Run the conversion selected by the parsed command line."""
+    # Fail on a bad path before --prefetch imports the model stack and starts its process pool
+    error = check_inputs(args)
+    if error is not None:
+        print(f"Error: {error}", file=sys.stderr)
         return 1
 
-    if not args.input.suffix.lower() == '.pdf':
-        print(f"Warning: Input file does not have .pdf extension: {args.input}", file=sys.stderr)
+    pdf_handler = create_pdf_handler(args) if args.server is None else None
+    try:
+        return _convert_checked_inputs(args, ocr_cache, metrics, pdf_handler)
+    finally:
+        if pdf_handler is not None:
+            pdf_handler.close()
+
+
+def _convert_checked_inputs(
+    args: argparse.Namespace,
+    ocr_cache: "OCRCache | None",
+    metrics: "MetricsCollector | None",
+    pdf_handler: "PDFHandler | None",
+) -> int:
+    if args.pages is not None or args.shard is not None:
+        return run_part(args, metrics, pdf_handler)
+
+    if is_batch_input(args.input):
+        output_format = 'epub' if args.to == 'epub' else 'markdown'
+        return run_batch(args, output_format, ocr_cache, metrics, pdf_handler)
+
+    input_path = Path(args.input[0])
+    if not input_path.suffix.lower() == '.pdf':
+        print(f"Warning: Input file does not have .pdf extension: {input_path}", file=sys.stderr)
 
     # Determine output format
     output_format = get_output_format(args.output, args.to)
 
+    transform = create_transform(args.local_only, pdf_handler) if pdf_handler is not None else None
     try:
-        if output_format in ('markdown', 'md'):
+        if args.server is not None:
+            job = build_job(args, input_path, args.output, output_format)
+            convert_remote(args.server, job, args.verbose)
+        elif args.stream:
+            convert_to_markdown_stream(
+                pdf_path=input_path,
+                output_path=args.output,
+                assets_path=args.assets_path,
+                ocr_size=args.ocr_size,
+                local_only=args.local_only,
+                includes_footnotes=args.footnotes,
+                ignore_pdf_errors=args.ignore_pdf_errors,
+                verbose=args.verbose,
+                pdf_handler=pdf_handler,
+                metrics=metrics,
+                priority=args.priority,
+                max_document_tokens=args.max_document_tokens,
+            )
+        elif output_format in ('markdown', 'md'):
             convert_to_markdown(
-                pdf_path=args.input,
+                pdf_path=input_path,
                 output_path=args.output,
                 assets_path=args.assets_path,
                 ocr_size=args.ocr_size,
@@ -220,10 +1384,16 @@ Examples:
                 includes_footnotes=args.footnotes,
                 ignore_pdf_errors=args.ignore_pdf_errors,
                 verbose=args.verbose,
+                transform=transform,
+                metrics=metrics,
+                checkpoint=True,
+                resume=args.resume,
+                priority=args.priority,
+                max_document_tokens=args.max_document_tokens,
             )
         elif output_format == 'epub':
             convert_to_epub(
-                pdf_path=args.input,
+                pdf_path=input_path,
                 output_path=args.output,
                 ocr_size=args.ocr_size,
                 local_only=args.local_only,
@@ -232,18 +1402,30 @@ Examples:
                 ignore_pdf_errors=args.ignore_pdf_errors,
                 language=args.language,
                 verbose=args.verbose,
+                transform=transform,
+                metrics=metrics,
+                checkpoint=True,
+                resume=args.resume,
+                priority=args.priority,
+                max_document_tokens=args.max_document_tokens,
             )
         else:
             print(f"Error: Unsupported output format: {output_format}", file=sys.stderr)
             return 1
 
+        # keep the Markdown on stdout free of status lines
+        with redirect_stdout(sys.stderr) if args.output == STDOUT_PATH else nullcontext():
+            if ocr_cache is not None and args.verbose:
+                print_cache_stats(ocr_cache)
+            if metrics is not None:
+                write_metrics(metrics, args.metrics_out)
         return 0
 
     except KeyboardInterrupt:
         print("\nInterrupted by user", file=sys.stderr)
         return 130
     except Exception as e:
-        print(f"Error: {e}", file=sys.stderr)
+        print(f"Error: {describe_error(e)}", file=sys.stderr)
         return 1
 
 
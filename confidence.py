@@ -0,0 +1,132 @@
+"""
+识别结果的置信度评分
+
+推测式两级识别（QuantizedDeepSeekOCRModel 的 draft_size）先以小尺寸识别每页，
+再按置信度决定是否以目标尺寸重新识别。置信度由三部分组成，取其中最低者：
+
+- token 概率：贪心解码所选 token 的平均对数概率与低概率 token 占比
+- 退化检测：有内容的页面输出为空、重复循环、文字量远少于文本行数（见 auto_size）
+- 字符合理性：替换符、控制字符、私用区等异常字符的占比
+
+token 概率由 TokenLogProbs 作为 LogitsProcessor 在解码时记录。与 decode_limits 相同，
+DeepSeek-OCR 的 infer 不暴露 logits_processor，加载时用 record_generate 包装一次
+model.generate，再通过线程局部变量传入当前页的 TokenLogProbs。
+每步只在设备上做一次 logsumexp，结果在解码结束后一次性取回，不增加逐步同步。
+"""
+
+import math
+import threading
+import unicodedata
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Generator
+
+import numpy as np
+import torch
+from transformers import LogitsProcessor, LogitsProcessorList
+
+from auto_size import PageFeatures, looks_degenerate, strip_grounding
+
+
+# 所选 token 概率低于该值时计为低概率 token
+_LOW_TOKEN_PROB = 0.5
+# 异常字符占比每增加 1%，字符合理性得分下降 0.1
+_GARBLED_PENALTY = 10.0
+# unicodedata 类别：控制、格式、私用区、代理、未分配
+_GARBLED_CATEGORIES = frozenset(("Cc", "Cf", "Co", "Cs", "Cn"))
+
+_LOCAL = threading.local()
+
+
+@dataclass(frozen=True)
+class PageConfidence:
+    # 0～1，越高越可信
+    score: float
+    # 所选 token 的平均对数概率与低概率 token 占比；没有记录到解码时为 None
+    mean_logprob: float | None
+    low_token_ratio: float | None
+    # 非空白字符中异常字符的占比
+    garbled_ratio: float
+    # 识别结果疑似退化
+    degenerate: bool
+
+
+class TokenLogProbs(LogitsProcessor):
+    """记录一次 infer 中每一步所选 token 的对数概率，不修改 scores"""
+
+    def __init__(self) -> None:
+        self._steps: list[Any] = []
+
+    def __call__(self, input_ids: Any, scores: Any) -> Any:
+        # 贪心解码选中概率最大的 token，其对数概率即 max - logsumexp
+        logits = scores[0].float()
+        self._steps.append(logits.max() - torch.logsumexp(logits, dim=-1))
+        return scores
+
+    @contextmanager
+    def active(self) -> Generator["TokenLogProbs", None, None]:
+        """在当前线程的 generate 调用中启用"""
+        _LOCAL.recorder = self
+        try:
+            yield self
+        finally:
+            _LOCAL.recorder = None
+
+    def values(self) -> np.ndarray | None:
+        """各步的对数概率；没有经过 generate 时为 None"""
+        if not self._steps:
+            return None
+        return torch.stack(self._steps).cpu().numpy()
+
+
+def record_generate(model: Any) -> Any:
+    """包装 model.generate，使其使用当前线程的 TokenLogProbs（加载时调用一次）"""
+    original_generate = model.generate
+
+    def recorded_generate(*args: Any, **kwargs: Any) -> Any:
+        recorder: TokenLogProbs | None = getattr(_LOCAL, "recorder", None)
+        if recorder is None:
+            return original_generate(*args, **kwargs)
+        processors = LogitsProcessorList(kwargs.get("logits_processor") or [])
+        processors.append(recorder)
+        kwargs["logits_processor"] = processors
+        return original_generate(*args, **kwargs)
+
+    model.generate = recorded_generate
+    return model
+
+
+def garbled_ratio(text: str) -> float:
+    """非空白字符中替换符与异常类别字符的占比"""
+    characters = [char for char in strip_grounding(text) if not char.isspace()]
+    if not characters:
+        return 0.0
+    garbled = sum(
+        1 for char in characters
+        if char == "\ufffd" or unicodedata.category(char) in _GARBLED_CATEGORIES
+    )
+    return garbled / len(characters)
+
+
+def score_page(text: str, logprobs: np.ndarray | None, features: PageFeatures) -> PageConfidence:
+    """综合 token 概率、退化检测与字符合理性给出页面置信度"""
+    token_score = 1.0
+    mean_logprob: float | None = None
+    low_token_ratio: float | None = None
+    if logprobs is not None and len(logprobs) > 0:
+        mean_logprob = float(np.mean(logprobs))
+        low_token_ratio = float(np.mean(logprobs < math.log(_LOW_TOKEN_PROB)))
+        # 几何平均概率反映整体把握，低概率 token 占比反映局部看不清的片段
+        token_score = min(math.exp(mean_logprob), 1.0 - low_token_ratio)
+
+    garbled = garbled_ratio(text)
+    character_score = max(0.0, 1.0 - garbled * _GARBLED_PENALTY)
+    degenerate = looks_degenerate(text, features)
+
+    return PageConfidence(
+        score=0.0 if degenerate else round(min(token_score, character_score), 4),
+        mean_logprob=mean_logprob,
+        low_token_ratio=low_token_ratio,
+        garbled_ratio=garbled,
+        degenerate=degenerate,
+    )
@@ -0,0 +1,162 @@
+"""
+Shared pytest fixtures: a CPU stub in place of the quantized DeepSeek-OCR model.
+
+The stub replaces ``AutoModel.from_pretrained`` / ``AutoTokenizer.from_pretrained``
+and pretends one CUDA device exists, so the whole pdf_craft pipeline runs on
+hosts without a GPU, network access or poppler.
+"""
+
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageDraw
+
+
+STUB_RESPONSE = (
+    "<|ref|>text<|/ref|><|det|>[[100, 100, 900, 200]]<|/det|>\n"
+    "Stub page text."
+)
+
+
+class StubOCRModel:
+    """Mimics the remote-code DeepSeek-OCR model: ``infer`` plus ``generate``.
+
+    ``response`` is either a fixed string or a callable receiving the infer kwargs.
+    """
+
+    def __init__(self, response=STUB_RESPONSE, delay: float = 0.0) -> None:
+        self.response = response
+        self.delay = delay
+        self.infer_calls: list[dict] = []
+
+    def generate(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def infer(self, tokenizer, **kwargs) -> str:
+        self.infer_calls.append(kwargs)
+        if self.delay:
+            time.sleep(self.delay)
+        if callable(self.response):
+            return self.response(kwargs)
+        return self.response
+
+
+@dataclass
+class StubBackend:
+    models: list[StubOCRModel] = field(default_factory=list)
+    tokenizer_loads: int = 0
+    # response given to models loaded from now on
+    response: object = STUB_RESPONSE
+
+    @property
+    def model_loads(self) -> int:
+        return len(self.models)
+
+    @property
+    def infer_calls(self) -> int:
+        return sum(len(m.infer_calls) for m in self.models)
+
+
+# commit of the snapshot that loading from the (stubbed) Hub leaves in the cache
+STUB_REVISION = "5" * 40
+
+
+def download_stub_snapshot(repo_id: str, cache_dir: str | None) -> None:
+    """Leave a snapshot in the Hugging Face cache as ``from_pretrained`` does when it downloads."""
+    from huggingface_hub import constants
+
+    if Path(repo_id).is_dir():
+        return
+    model_dir = Path(cache_dir or constants.HF_HUB_CACHE) / f"models--{repo_id.replace('/', '--')}"
+    snapshot = model_dir / "snapshots" / STUB_REVISION
+    if snapshot.is_dir():
+        return
+    snapshot.mkdir(parents=True)
+    (snapshot / "config.json").write_text("{}")
+    (model_dir / "refs").mkdir(exist_ok=True)
+    (model_dir / "refs" / "main").write_text(STUB_REVISION)
+
+
+@pytest.fixture
+def stub_backend(monkeypatch, tmp_path_factory):
+    import torch
+    import quantized_model
+    from huggingface_hub import constants
+    from pdf_craft.pdf.handler import DefaultPDFDocument
+
+    backend = StubBackend()
+
+    def load_tokenizer(*args, **kwargs):
+        backend.tokenizer_loads += 1
+        download_stub_snapshot(kwargs["pretrained_model_name_or_path"], kwargs.get("cache_dir"))
+        return object()
+
+    def load_model(*args, **kwargs):
+        model = StubOCRModel(backend.response)
+        backend.models.append(model)
+        return model
+
+    monkeypatch.setattr(constants, "HF_HUB_CACHE", str(tmp_path_factory.mktemp("hub")))
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: True)
+    monkeypatch.setattr(torch.cuda, "device_count", lambda: 1)
+    monkeypatch.setattr(torch.cuda, "memory_allocated", lambda device=None: 0)
+    monkeypatch.setattr(torch.cuda, "max_memory_allocated", lambda device=None: 0)
+    monkeypatch.setattr(quantized_model.AutoTokenizer, "from_pretrained", load_tokenizer)
+    monkeypatch.setattr(quantized_model.AutoModel, "from_pretrained", load_model)
+    monkeypatch.setattr(DefaultPDFDocument, "render_page", _render_stub_page)
+    yield backend
+    # CLI runs may have re-applied the patch with options; restore the default
+    quantized_model.apply_quantized_model_patch(quiet=True)
+
+
+def _render_stub_page(self, page_index: int, dpi: int) -> Image.Image:
+    image = Image.new("RGB", (600, 800), "white")
+    ImageDraw.Draw(image).text((60, 80), f"Page {page_index}", fill="black")
+    return image
+
+
+class SlowRenderHandler:
+    """Picklable PDFHandler for the prefetch worker processes.
+
+    Kept here because conftest imports nothing heavy, so spawned workers start fast.
+    """
+
+    def __init__(self, pages: int, delay: float = 0.0, size: tuple[int, int] = (2480, 3508)) -> None:
+        self.pages = pages
+        self.delay = delay
+        self.size = size
+
+    def open(self, pdf_path: Path) -> "SlowRenderDocument":
+        return SlowRenderDocument(self.pages, self.delay, self.size)
+
+
+class SlowRenderDocument:
+    def __init__(self, pages: int, delay: float, size: tuple[int, int]) -> None:
+        self.pages_count = pages
+        self.delay = delay
+        self.size = size
+
+    def render_page(self, page_index: int, dpi: int) -> Image.Image:
+        time.sleep(self.delay)
+        image = Image.new("RGB", self.size, "white")
+        ImageDraw.Draw(image).text((200, 200), f"Page {page_index}", fill="black")
+        image.info["rendered_at"] = time.time()
+        return image
+
+    def close(self) -> None:
+        pass
+
+
+def make_pdf(path: Path, pages: int) -> Path:
+    """Write a blank PDF with the given number of pages."""
+    from pypdf import PdfWriter
+
+    writer = PdfWriter()
+    for _ in range(pages):
+        writer.add_blank_page(width=300, height=400)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
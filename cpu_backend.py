@@ -0,0 +1,157 @@
+"""
+CPU 推理后端
+
+bitsandbytes NF4 权重只能在 GPU 上运行，因此 CPU 模式加载官方全精度权重
+（deepseek-ai/DeepSeek-OCR），再按 cpu_dtype 选择计算精度：
+
+- bfloat16：直接以 bf16 加载，内存占用减半，需要支持 AVX512-BF16 / AMX 的 CPU 才能跑满
+- float32：兼容性最好，速度与内存开销最大
+- int8：以 float32 加载后对所有 Linear 做动态 int8 量化，适合不支持 bf16 的多核 CPU
+
+单页解码是访存密集型的，一页用满所有核心的效率不高。CPU 模式同时推理多页
+（cpu_workers），每页的 intra-op 线程数为核心数 / cpu_workers，总线程数不超过核心数。
+
+DeepSeek-OCR 的 infer 把输入张量硬编码到 .cuda()；CPU 模式加载后在进程内把
+Tensor.cuda 重定向为留在 CPU 上（浮点张量转换为计算精度）。重定向对整个进程生效，
+因此 CPU 模型加载期间同一进程不应使用 GPU 副本；最后一个 CPU 模型卸载后恢复原方法。
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable
+
+# 全精度权重，CPU 模式使用
+CPU_MODEL_NAME = "deepseek-ai/DeepSeek-OCR"
+
+# CPU 副本在调度器与统计中使用的设备号
+CPU_DEVICE_NUMBER = -1
+
+CPU_DTYPES = ("bfloat16", "float32", "int8")
+
+_redirect_lock = threading.Lock()
+# 尚未撤销的重定向数，以及重定向前的 Tensor.cuda
+_redirects = 0
+_original_cuda: Any = None
+
+DEVICES = ("cuda", "cpu", "auto")
+
+# 默认每页使用的 intra-op 线程数
+_DEFAULT_THREADS_PER_WORKER = 4
+
+
+@dataclass(frozen=True)
+class CPUPlan:
+    cores: int
+    # 同时推理的页数
+    workers: int
+    # 每页的 intra-op 线程数
+    threads_per_worker: int
+
+
+def available_cores() -> int:
+    """当前进程可用的核心数（遵循 taskset / cgroup 的 CPU 亲和性）"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def plan_cpu(workers: int | None = None, threads: int | None = None, cores: int | None = None) -> CPUPlan:
+    """
+    确定并发页数与每页线程数；未指定的一项由核心数推出
+
+    Args:
+        workers: 同时推理的页数，默认每 4 个核心一页
+        threads: 每页的 intra-op 线程数，默认核心数 / workers
+        cores: 可用核心数，默认取当前进程的 CPU 亲和性
+    """
+    if workers is not None and workers <= 0:
+        raise ValueError("cpu_workers must be positive")
+    if threads is not None and threads <= 0:
+        raise ValueError("cpu_threads must be positive")
+    cores = cores or available_cores()
+    if workers is None:
+        workers = max(1, cores // (threads or _DEFAULT_THREADS_PER_WORKER))
+    if threads is None:
+        threads = max(1, cores // workers)
+    return CPUPlan(cores=cores, workers=workers, threads_per_worker=threads)
+
+
+def resolve_device(device: str) -> str:
+    """解析 auto：有可用 GPU 时使用 cuda，否则使用 cpu"""
+    if device not in DEVICES:
+        raise ValueError(f"Unknown device: {device}, expected one of {', '.join(DEVICES)}")
+    if device != "auto":
+        return device
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def load_options(cpu_dtype: str) -> dict[str, Any]:
+    """CPU 模式下传给 AutoModel.from_pretrained 的参数"""
+    import torch
+
+    if cpu_dtype not in CPU_DTYPES:
+        raise ValueError(f"Unknown cpu_dtype: {cpu_dtype}, expected one of {', '.join(CPU_DTYPES)}")
+    return {
+        # flash-attention 只支持 CUDA
+        "_attn_implementation": "eager",
+        # 动态 int8 量化要求 float32 权重
+        "torch_dtype": torch.bfloat16 if cpu_dtype == "bfloat16" else torch.float32,
+        "low_cpu_mem_usage": True,
+    }
+
+
+def compute_dtype(cpu_dtype: str) -> Any:
+    import torch
+    return torch.bfloat16 if cpu_dtype == "bfloat16" else torch.float32
+
+
+def prepare_model(model: Any, cpu_dtype: str, threads_per_worker: int) -> Any:
+    """设置线程数，按需做动态 int8 量化"""
+    import torch
+
+    torch.set_num_threads(threads_per_worker)
+    if cpu_dtype == "int8":
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if hasattr(model, "eval"):
+        model.eval()
+    return model
+
+
+def redirect_cuda_to_cpu(dtype: Any) -> Callable[[], None]:
+    """
+    把 Tensor.cuda 替换为留在 CPU 上的版本，浮点张量转换为 dtype
+
+    返回撤销函数（只生效一次）；所有重定向都撤销后恢复原来的 Tensor.cuda
+    """
+    import torch
+
+    global _redirects, _original_cuda
+
+    def stay_on_cpu(self: "torch.Tensor", *args: Any, **kwargs: Any) -> "torch.Tensor":
+        if self.is_floating_point() and self.dtype != dtype:
+            return self.to(dtype)
+        return self
+
+    with _redirect_lock:
+        if _redirects == 0:
+            _original_cuda = torch.Tensor.cuda
+        _redirects += 1
+        torch.Tensor.cuda = stay_on_cpu  # type: ignore[method-assign]
+
+    undone = False
+
+    def undo() -> None:
+        global _redirects, _original_cuda
+        nonlocal undone
+        with _redirect_lock:
+            if undone:
+                return
+            undone = True
+            _redirects -= 1
+            if _redirects == 0:
+                torch.Tensor.cuda = _original_cuda  # type: ignore[method-assign]
+                _original_cuda = None
+
+    return undo
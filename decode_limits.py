@@ -0,0 +1,148 @@
+"""
+单页解码上限与重复检测
+
+DeepSeek-OCR 的 infer 以固定的 max_new_tokens（8192）调用 generate，少数病态页面会
+陷入重复循环，一直解码到上限，单页耗时可达数十秒。DecodeGuard 作为 StoppingCriteria
+注入 generate：
+
+- max_new_tokens：单页输出 token 上限，达到后截断
+- 重复检测：输出末尾同一段 token（周期不超过 _MAX_PERIOD）连续出现 min_repeats 次
+  且总长度不少于 _MIN_REPEAT_SPAN 时停止解码，并把重复段裁剪为一份
+
+DeepSeek-OCR 的 infer 不暴露 stopping_criteria，与 doc_page_extractor 的中断注入相同，
+加载时用 guard_generate 包装一次 model.generate，再通过线程局部变量传入当前页的 DecodeGuard。
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Generator
+
+import numpy as np
+from transformers import StoppingCriteria
+
+
+# 重复单元的最大长度（token）
+_MAX_PERIOD = 200
+# 重复部分的最小总长度（token），避免把分隔线、省略号之类的短重复当作循环
+_MIN_REPEAT_SPAN = 64
+# 每解码多少个 token 检查一次重复
+_CHECK_INTERVAL = 32
+
+TRUNCATED_MAX_TOKENS = "max_tokens"
+TRUNCATED_BUDGET = "budget"
+TRUNCATED_REPETITION = "repetition"
+
+_LOCAL = threading.local()
+
+
+def find_repetition(tokens: np.ndarray, min_repeats: int) -> tuple[int, int] | None:
+    """
+    检测末尾的重复循环
+
+    Returns:
+        (周期, 重复次数)，重复次数按整个连续重复段计算；没有循环时为 None
+    """
+    length = len(tokens)
+    for period in range(1, min(_MAX_PERIOD, length // min_repeats) + 1):
+        repeats = max(min_repeats, -(-_MIN_REPEAT_SPAN // period))
+        span = period * repeats
+        if span > length:
+            continue
+        tail = tokens[length - span:]
+        if np.array_equal(tail[period:], tail[:-period]):
+            # 继续向前延伸，找出整个重复段
+            start = length - span
+            while start >= period and np.array_equal(tokens[start - period:start], tokens[start:start + period]):
+                start -= period
+                repeats += 1
+            return period, repeats
+    return None
+
+
+class DecodeGuard(StoppingCriteria):
+    """
+    一次 infer 的解码上限与重复检测
+
+    Args:
+        max_new_tokens: 输出 token 上限，None 表示不限制
+        min_repeats: 末尾重复多少次视为循环，None 表示不检测
+        limited_by_budget: 上限来自文档的剩余预算，截断原因记为 budget
+    """
+
+    def __init__(
+        self,
+        max_new_tokens: int | None = None,
+        min_repeats: int | None = None,
+        limited_by_budget: bool = False,
+    ) -> None:
+        super().__init__()
+        if max_new_tokens is not None and max_new_tokens <= 0:
+            raise ValueError("max_new_tokens must be positive")
+        if min_repeats is not None and min_repeats < 2:
+            raise ValueError("min_repeats must be at least 2")
+        self._max_new_tokens = max_new_tokens
+        self._min_repeats = min_repeats
+        self._limited_by_budget = limited_by_budget
+        self._input_tokens: int | None = None
+        self._next_check = _CHECK_INTERVAL
+        # 截断后保留的序列长度（含输入），仅重复循环时裁剪
+        self._keep_length: int | None = None
+        self.output_tokens = 0
+        # 截断原因：max_tokens、budget、repetition；正常结束为 None
+        self.truncation: str | None = None
+
+    def __call__(self, input_ids: Any, scores: Any, **kwargs: Any) -> Any:
+        if self.truncation is not None:
+            return True
+        length = int(input_ids.shape[-1])
+        if self._input_tokens is None:
+            # 首次调用时已生成一个 token，据此反推输入长度
+            self._input_tokens = length - 1
+        self.output_tokens = length - self._input_tokens
+
+        if self._min_repeats is not None and self.output_tokens >= self._next_check:
+            self._next_check = self.output_tokens + _CHECK_INTERVAL
+            output = input_ids[0, self._input_tokens:].detach().cpu().numpy()
+            repetition = find_repetition(output, self._min_repeats)
+            if repetition is not None:
+                period, repeats = repetition
+                self._keep_length = length - period * (repeats - 1)
+                self.output_tokens -= period * (repeats - 1)
+                self.truncation = TRUNCATED_REPETITION
+                return True
+
+        if self._max_new_tokens is not None and self.output_tokens >= self._max_new_tokens:
+            self.truncation = TRUNCATED_BUDGET if self._limited_by_budget else TRUNCATED_MAX_TOKENS
+            return True
+        return False
+
+    @contextmanager
+    def active(self) -> Generator["DecodeGuard", None, None]:
+        """在当前线程的 generate 调用中启用"""
+        _LOCAL.guard = self
+        try:
+            yield self
+        finally:
+            _LOCAL.guard = None
+
+    def trim(self, output: Any) -> Any:
+        if self._keep_length is None or not hasattr(output, "shape"):
+            return output
+        return output[..., :self._keep_length]
+
+
+def guard_generate(model: Any) -> Any:
+    """包装 model.generate，使其使用当前线程的 DecodeGuard（加载时调用一次）"""
+    original_generate = model.generate
+
+    def guarded_generate(*args: Any, **kwargs: Any) -> Any:
+        guard: DecodeGuard | None = getattr(_LOCAL, "guard", None)
+        if guard is None:
+            return original_generate(*args, **kwargs)
+        stopping = kwargs.get("stopping_criteria") or []
+        stopping.append(guard)
+        kwargs["stopping_criteria"] = stopping
+        return guard.trim(original_generate(*args, **kwargs))
+
+    model.generate = guarded_generate
+    return model
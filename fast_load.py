@@ -0,0 +1,252 @@
+"""
+模型快速加载
+
+每个启用的设备都会调用一次 AutoModel.from_pretrained，transformers 每次都重新读取并
+解析同一组 safetensors 分片，N 张卡就读 N 遍。SharedCheckpoint 在一次加载过程中替换
+transformers 的 load_state_dict：每个分片只以 mmap 方式映射一次，张量直接指向映射的
+页面（torch.frombuffer），各副本共享同一份主机内存，不再为每个副本复制一份权重。
+
+materialize_snapshot 把 HuggingFace 缓存中的快照（符号链接 + 多个分片）物化为本地
+目录：普通文件实体拷贝，权重合并为单个 model.safetensors，并按元素宽度排列张量使每个
+张量都自然对齐。共享缓存在 NFS 上时，把物化目录放在本地磁盘即可离线、快速启动。
+"""
+
+import json
+import mmap
+import os
+import shutil
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Generator, Iterable
+
+import torch
+
+
+MATERIALIZED_MARKER = "craftq-materialized.json"
+WEIGHTS_NAME = "model.safetensors"
+WEIGHTS_INDEX_NAME = "model.safetensors.index.json"
+
+_MATERIALIZED_VERSION = 1
+# safetensors 规定头部长度为 8 的倍数时数据区对齐，不足部分以空格填充
+_HEADER_ALIGNMENT = 8
+
+_DTYPES: dict[str, torch.dtype] = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+    "F8_E4M3": torch.float8_e4m3fn,
+    "F8_E5M2": torch.float8_e5m2,
+}
+_DTYPE_NAMES = {dtype: name for name, dtype in _DTYPES.items()}
+
+
+def read_safetensors_header(path: Path) -> tuple[int, dict[str, Any]]:
+    """返回数据区起始偏移与头部（含 __metadata__）"""
+    with open(path, "rb") as f:
+        (header_length,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_length))
+    return 8 + header_length, header
+
+
+def load_safetensors_mmap(path: Path) -> dict[str, torch.Tensor]:
+    """
+    以内存映射方式加载 safetensors 文件，返回的张量直接引用映射的页面
+
+    映射使用写时复制（ACCESS_COPY）：只读访问共享页缓存，写入不会改动文件
+    """
+    data_start, header = read_safetensors_header(path)
+    header.pop("__metadata__", None)
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+
+    tensors: dict[str, torch.Tensor] = {}
+    for name, info in header.items():
+        dtype = _DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        shape = info["shape"]
+        count = (end - start) // dtype.itemsize
+        if count == 0:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+        # 张量持有 mmap 的引用，映射随最后一个张量释放
+        tensors[name] = torch.frombuffer(mapped, dtype=dtype, count=count, offset=data_start + start).reshape(shape)
+    return tensors
+
+
+def save_safetensors(tensors: dict[str, torch.Tensor], path: Path, metadata: dict[str, str] | None = None) -> None:
+    """以 safetensors 格式保存张量（不依赖 safetensors 包）"""
+    entries = []
+    for name, tensor in tensors.items():
+        tensor = tensor.detach().contiguous().cpu()
+        entries.append((name, _DTYPE_NAMES[tensor.dtype], list(tensor.shape), _tensor_bytes(tensor)))
+    _write_safetensors(path, entries, metadata or {"format": "pt"})
+
+
+class SharedCheckpoint:
+    """
+    一次模型加载期间共享的 safetensors 映射
+
+    在 patch_transformers() 范围内，transformers 对同一文件的重复读取返回同一组张量
+    """
+
+    def __init__(self) -> None:
+        self._state_dicts: dict[str, dict[str, torch.Tensor]] = {}
+        self._lock = threading.Lock()
+        self.files_mapped = 0
+
+    def load_state_dict(self, checkpoint_file: str | os.PathLike) -> dict[str, torch.Tensor]:
+        key = os.path.realpath(checkpoint_file)
+        with self._lock:
+            state_dict = self._state_dicts.get(key)
+            if state_dict is None:
+                _, header = read_safetensors_header(Path(key))
+                if header.get("__metadata__", {}).get("format") not in ("pt", "tf", "flax", "mlx"):
+                    raise OSError(
+                        f"The safetensors archive passed at {checkpoint_file} does not contain the valid metadata."
+                    )
+                state_dict = self._state_dicts[key] = load_safetensors_mmap(Path(key))
+                self.files_mapped += 1
+        # transformers 可能增删字典中的键，只共享张量、不共享字典
+        return dict(state_dict)
+
+    @contextmanager
+    def patch_transformers(self) -> Generator["SharedCheckpoint", None, None]:
+        from transformers import modeling_utils
+
+        original = modeling_utils.load_state_dict
+
+        def load_state_dict(checkpoint_file, *args, **kwargs):
+            if str(checkpoint_file).endswith(".safetensors"):
+                return self.load_state_dict(checkpoint_file)
+            return original(checkpoint_file, *args, **kwargs)
+
+        modeling_utils.load_state_dict = load_state_dict
+        try:
+            yield self
+        finally:
+            modeling_utils.load_state_dict = original
+            # 副本已拷贝到设备，释放映射
+            self._state_dicts.clear()
+
+
+def materialized_revision(target_path: Path) -> str | None:
+    """物化目录对应的快照 commit；目录不存在或不完整时返回 None"""
+    try:
+        marker = json.loads((target_path / MATERIALIZED_MARKER).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if marker.get("version") != _MATERIALIZED_VERSION:
+        return None
+    return marker.get("revision")
+
+
+def materialize_snapshot(snapshot_path: Path, target_path: Path, revision: str) -> Path:
+    """
+    将快照物化为可直接加载的本地目录，完成后原子替换 target_path
+
+    Args:
+        snapshot_path: HuggingFace 缓存中的快照目录
+        target_path: 物化目录
+        revision: 快照的 commit，记录在标记文件中用于判断是否过期
+    """
+    temp_path = target_path.with_name(f"{target_path.name}.tmp-{os.getpid()}")
+    if temp_path.exists():
+        shutil.rmtree(temp_path)
+    temp_path.mkdir(parents=True)
+    try:
+        shards = _weight_shards(snapshot_path)
+        for source in snapshot_path.rglob("*"):
+            relative = source.relative_to(snapshot_path)
+            if source.is_dir() or source in shards or relative.as_posix() == WEIGHTS_INDEX_NAME:
+                continue
+            (temp_path / relative).parent.mkdir(parents=True, exist_ok=True)
+            # 缓存中的文件是指向 blobs/ 的符号链接，拷贝实际内容
+            shutil.copyfile(source, temp_path / relative)
+        if shards:
+            _merge_shards(shards, temp_path / WEIGHTS_NAME)
+        (temp_path / MATERIALIZED_MARKER).write_text(
+            json.dumps({"version": _MATERIALIZED_VERSION, "revision": revision}) + "\n",
+            encoding="utf-8",
+        )
+        if target_path.exists():
+            shutil.rmtree(target_path)
+        temp_path.replace(target_path)
+    except BaseException:
+        shutil.rmtree(temp_path, ignore_errors=True)
+        raise
+    return target_path
+
+
+def _weight_shards(snapshot_path: Path) -> list[Path]:
+    index_path = snapshot_path / WEIGHTS_INDEX_NAME
+    if index_path.exists():
+        weight_map = json.loads(index_path.read_text(encoding="utf-8"))["weight_map"]
+        return [snapshot_path / name for name in sorted(set(weight_map.values()))]
+    if (snapshot_path / WEIGHTS_NAME).exists():
+        return [snapshot_path / WEIGHTS_NAME]
+    return []
+
+
+def _merge_shards(shards: list[Path], output_path: Path) -> None:
+    entries = []
+    mapped_files = []
+    try:
+        for shard in shards:
+            data_start, header = read_safetensors_header(shard)
+            header.pop("__metadata__", None)
+            with open(shard, "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            mapped_files.append(mapped)
+            for name, info in header.items():
+                start, end = info["data_offsets"]
+                data = memoryview(mapped)[data_start + start:data_start + end]
+                entries.append((name, info["dtype"], info["shape"], data))
+        # 元素宽度大的张量在前：头部按 8 字节对齐后，每个张量的偏移都是其元素宽度的倍数
+        entries.sort(key=lambda entry: (-_DTYPES[entry[1]].itemsize, entry[0]))
+        _write_safetensors(output_path, entries, {"format": "pt"})
+        entries.clear()
+    finally:
+        for mapped in mapped_files:
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+
+
+def _write_safetensors(
+    path: Path,
+    entries: Iterable[tuple[str, str, list[int], Any]],
+    metadata: dict[str, str],
+) -> None:
+    entries = list(entries)
+    header: dict[str, Any] = {"__metadata__": metadata}
+    offset = 0
+    for name, dtype, shape, data in entries:
+        length = memoryview(data).nbytes
+        header[name] = {"dtype": dtype, "shape": shape, "data_offsets": [offset, offset + length]}
+        offset += length
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    header_bytes += b" " * (-len(header_bytes) % _HEADER_ALIGNMENT)
+
+    temp_path = path.with_name(f"{path.name}.tmp")
+    with open(temp_path, "wb") as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for _, _, _, data in entries:
+            f.write(data)
+    temp_path.replace(path)
+
+
+def _tensor_bytes(tensor: torch.Tensor) -> bytes:
+    if tensor.numel() == 0:
+        return b""
+    return tensor.reshape(-1).view(torch.uint8).numpy().tobytes()
@@ -0,0 +1,292 @@
+"""
+转换过程计时与吞吐统计
+
+MetricsCollector 汇总各阶段耗时（模型加载、PDF 渲染、页面识别、Markdown/EPUB 组装）、
+页面吞吐与单页延迟分位数、各设备显存峰值以及等待模型副本空位的时间。
+页面级数据来自 pdf_craft 的 OCREvent，模型级数据由 QuantizedDeepSeekOCRModel 上报。
+被截断的页面（达到单页上限、文档预算或重复循环）与推测式识别中置信度不足、
+以更大尺寸重新识别的页面按文档与页码列出。
+每条记录同时以 MetricEvent 推送给回调，便于接入外部监控。
+"""
+
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum, auto
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Generator
+
+if TYPE_CHECKING:
+    from pdf_craft import OCREvent
+
+
+class MetricKind(Enum):
+    STAGE = auto()
+    PAGE = auto()
+    LOCK_WAIT = auto()
+    DEVICE_MEMORY = auto()
+
+
+@dataclass
+class MetricEvent:
+    """
+    一条度量记录
+
+    value 的单位：STAGE / PAGE / LOCK_WAIT 为秒，DEVICE_MEMORY 为字节
+    """
+    kind: MetricKind
+    name: str
+    value: float
+    page_index: int | None = None
+    device_number: int | None = None
+
+
+# 报告中的阶段顺序；各阶段为所有文档、所有页面的耗时之和
+STAGES = ("model_load", "render", "inference", "assembly")
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    # 最近秩法，样本很少时也不会插值出不存在的延迟
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class DocumentMetrics:
+    """单个文档的计时状态，由 MetricsCollector.document 创建"""
+
+    def __init__(self, collector: "MetricsCollector", name: str | None) -> None:
+        self._collector = collector
+        self._name = name
+        self._rendered_ms: dict[int, int] = {}
+        self._last_ocr_time: float | None = None
+
+    def on_ocr_event(self, event: "OCREvent") -> None:
+        from pdf_craft import OCREventKind
+
+        self._last_ocr_time = time.perf_counter()
+        if event.kind == OCREventKind.RENDERED:
+            self._rendered_ms[event.page_index] = event.cost_time_ms
+            self._collector.record_stage("render", event.cost_time_ms / 1000, page_index=event.page_index)
+        elif event.kind in (OCREventKind.COMPLETE, OCREventKind.FAILED):
+            # 文档内的页面依次识别，此前上报的截断与升级都属于这一页
+            self._collector.assign_page(self._name, event.page_index)
+            rendered_ms = self._rendered_ms.pop(event.page_index, 0)
+            self._collector.record_page(
+                page_index=event.page_index,
+                seconds=(event.cost_time_ms - rendered_ms) / 1000,
+                failed=event.kind == OCREventKind.FAILED,
+                input_tokens=event.input_tokens,
+                output_tokens=event.output_tokens,
+            )
+        elif event.kind == OCREventKind.SKIP:
+            self._collector.record_skipped_page()
+
+
+class MetricsCollector:
+    """
+    线程安全的度量汇总器，可在批量转换的多个文档之间共享
+
+    Args:
+        on_event: 每条度量记录产生时的回调
+    """
+
+    def __init__(self, on_event: Callable[[MetricEvent], None] | None = None) -> None:
+        self._on_event = on_event
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self._stage_seconds: dict[str, float] = {stage: 0.0 for stage in STAGES}
+        self._page_latencies: list[float] = []
+        self._failed_pages = 0
+        self._skipped_pages = 0
+        # 推理前跳过的空白页与复用结果的重复页（见 page_dedup）
+        self._blank_pages = 0
+        self._reused_pages = 0
+        # 推测式识别：先以草稿尺寸识别的页面数（见 confidence）
+        self._drafted_pages = 0
+        # 已确定页码的截断与升级记录（按报告字段），以及模型上报、尚未对应到页码的记录（按文档）
+        self._page_records: dict[str, list[dict]] = {"truncated_pages": [], "escalated_pages": []}
+        self._pending_records: dict[str | None, list[tuple[str, dict]]] = {}
+        self._documents = 0
+        self._input_tokens = 0
+        self._output_tokens = 0
+        self._lock_waits: list[float] = []
+        self._lock_waits_by_priority: dict[str, list[float]] = {}
+        self._peak_memory: dict[int, int] = {}
+
+    @contextmanager
+    def document(self, name: str | None = None) -> Generator[DocumentMetrics, None, None]:
+        """
+        统计一次文档转换；OCR 事件需转发给 DocumentMetrics.on_ocr_event
+
+        最后一个 OCR 事件之后到转换结束的时间计入 assembly 阶段。
+        name 应与该文档页面所属作业的 document 一致（见 scheduler.job），用于为截断与升级记录确定页码
+        """
+        document = DocumentMetrics(self, name)
+        started_at = time.perf_counter()
+        try:
+            yield document
+        finally:
+            finished_at = time.perf_counter()
+            assembly_from = document._last_ocr_time or started_at
+            with self._lock:
+                self._documents += 1
+                # 没有对应到页码的记录（例如转换中断）仍然计入报告
+                for key, record in self._pending_records.pop(name, []):
+                    self._page_records[key].append(record)
+            self.record_stage("assembly", finished_at - assembly_from)
+
+    def record_stage(self, stage: str, seconds: float, page_index: int | None = None) -> None:
+        with self._lock:
+            self._stage_seconds[stage] = self._stage_seconds.get(stage, 0.0) + seconds
+        self._emit(MetricEvent(kind=MetricKind.STAGE, name=stage, value=seconds, page_index=page_index))
+
+    def record_page(
+        self,
+        page_index: int,
+        seconds: float,
+        failed: bool = False,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+    ) -> None:
+        with self._lock:
+            self._stage_seconds["inference"] += seconds
+            self._page_latencies.append(seconds)
+            self._input_tokens += input_tokens
+            self._output_tokens += output_tokens
+            if failed:
+                self._failed_pages += 1
+        self._emit(MetricEvent(kind=MetricKind.PAGE, name="inference", value=seconds, page_index=page_index))
+
+    def record_skipped_page(self) -> None:
+        with self._lock:
+            self._skipped_pages += 1
+
+    def record_deduplicated_page(self, blank: bool) -> None:
+        with self._lock:
+            if blank:
+                self._blank_pages += 1
+            else:
+                self._reused_pages += 1
+
+    def record_truncated_page(self, document: str | None, reason: str, output_tokens: int) -> None:
+        """记录一次被截断的解码；页码在该页的 OCR 事件到达时确定"""
+        with self._lock:
+            self._pending_records.setdefault(document, []).append((
+                "truncated_pages",
+                {"document": document, "page": None, "reason": reason, "output_tokens": output_tokens},
+            ))
+
+    def record_draft_page(
+        self,
+        document: str | None,
+        confidence: float,
+        draft_size: str,
+        size: str,
+        escalated: bool,
+    ) -> None:
+        """记录一页草稿识别；升级重新识别的页面与截断一样在 OCR 事件到达时确定页码"""
+        with self._lock:
+            self._drafted_pages += 1
+            if escalated:
+                self._pending_records.setdefault(document, []).append((
+                    "escalated_pages",
+                    {"document": document, "page": None, "confidence": confidence,
+                     "draft_size": draft_size, "size": size},
+                ))
+
+    def assign_page(self, document: str | None, page_index: int) -> None:
+        with self._lock:
+            for key, record in self._pending_records.pop(document, []):
+                record["page"] = page_index
+                self._page_records[key].append(record)
+
+    def record_lock_wait(self, seconds: float, device_number: int | None = None, priority: str = "normal") -> None:
+        with self._lock:
+            self._lock_waits.append(seconds)
+            waits = self._lock_waits_by_priority.setdefault(priority, [])
+            waits.append(seconds)
+        self._emit(MetricEvent(
+            kind=MetricKind.LOCK_WAIT,
+            name="replica",
+            value=seconds,
+            device_number=device_number,
+        ))
+
+    def record_device_memory(self, device_number: int, peak_bytes: int) -> None:
+        with self._lock:
+            if peak_bytes <= self._peak_memory.get(device_number, -1):
+                return
+            self._peak_memory[device_number] = peak_bytes
+        self._emit(MetricEvent(
+            kind=MetricKind.DEVICE_MEMORY,
+            name="peak_allocated",
+            value=peak_bytes,
+            device_number=device_number,
+        ))
+
+    def report(self) -> dict:
+        """可直接 JSON 序列化的汇总报告"""
+        with self._lock:
+            wall_seconds = time.perf_counter() - self._started_at
+            latencies = sorted(self._page_latencies)
+            lock_waits = self._lock_waits
+            page_records = {key: [dict(record) for record in records] for key, records in self._page_records.items()}
+            for pending in self._pending_records.values():
+                for key, record in pending:
+                    page_records[key].append(dict(record))
+            return {
+                "wall_seconds": round(wall_seconds, 3),
+                "documents": self._documents,
+                "stages": {stage: round(seconds, 3) for stage, seconds in self._stage_seconds.items()},
+                "pages": {
+                    "recognized": len(latencies),
+                    "failed": self._failed_pages,
+                    "skipped": self._skipped_pages,
+                    "blank": self._blank_pages,
+                    "reused": self._reused_pages,
+                    "truncated": len(page_records["truncated_pages"]),
+                    "drafted": self._drafted_pages,
+                    "escalated": len(page_records["escalated_pages"]),
+                    "per_second": round(len(latencies) / wall_seconds, 3) if wall_seconds > 0 else 0.0,
+                    "latency_ms": {
+                        "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+                        "p50": round(_percentile(latencies, 50) * 1000, 1),
+                        "p90": round(_percentile(latencies, 90) * 1000, 1),
+                        "p99": round(_percentile(latencies, 99) * 1000, 1),
+                        "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+                    },
+                },
+                "tokens": {"input": self._input_tokens, "output": self._output_tokens},
+                "truncated_pages": page_records["truncated_pages"],
+                "escalated_pages": page_records["escalated_pages"],
+                "lock_wait": {
+                    "count": len(lock_waits),
+                    "total_seconds": round(sum(lock_waits), 3),
+                    "max_seconds": round(max(lock_waits, default=0.0), 3),
+                    "by_priority": {
+                        priority: {
+                            "count": len(waits),
+                            "total_seconds": round(sum(waits), 3),
+                            "p90_seconds": round(_percentile(sorted(waits), 90), 3),
+                        }
+                        for priority, waits in sorted(self._lock_waits_by_priority.items())
+                    },
+                },
+                "devices": {
+                    str(device_number): {"peak_memory_bytes": peak_bytes}
+                    for device_number, peak_bytes in sorted(self._peak_memory.items())
+                },
+            }
+
+    def write_json(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.report(), indent=2) + "\n", encoding="utf-8")
+
+    def _emit(self, event: MetricEvent) -> None:
+        if self._on_event is not None:
+            self._on_event(event)
@@ -0,0 +1,161 @@
+"""
+页面 OCR 结果缓存
+
+以页面图像内容哈希、prompt、尺寸配置和模型快照版本为键，将 generate 的结果
+持久化到磁盘（SQLite），命中时直接返回文本而不触碰 GPU。
+总大小超过上限时按最近最少使用（LRU）淘汰。
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+
+_DB_FILENAME = "ocr_cache.sqlite3"
+_DEFAULT_MAX_SIZE_BYTES = 1024**3
+
+
+@dataclass
+class CachedResult:
+    text: str
+    input_tokens: int
+    output_tokens: int
+
+
+@dataclass
+class CacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int
+
+
+class OCRCache:
+    """
+    磁盘 OCR 缓存，可在多个模型实例、多次运行之间共享
+
+    Args:
+        cache_dir: 缓存目录，不存在时自动创建
+        max_size_bytes: 缓存文本总大小上限，None 表示不限制
+    """
+
+    def __init__(self, cache_dir: Path, max_size_bytes: int | None = _DEFAULT_MAX_SIZE_BYTES) -> None:
+        if max_size_bytes is not None and max_size_bytes <= 0:
+            raise ValueError("max_size_bytes must be positive")
+
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        self._max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(cache_dir / _DB_FILENAME), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, "
+            "text TEXT NOT NULL, "
+            "input_tokens INTEGER NOT NULL, "
+            "output_tokens INTEGER NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "last_used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._conn.commit()
+
+        row = self._conn.execute("SELECT MAX(last_used) FROM entries").fetchone()
+        self._tick: int = row[0] or 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @staticmethod
+    def make_key(*parts: object) -> str:
+        """将若干可 JSON 序列化的部分组合为稳定的缓存键"""
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def file_digest(file_path: Path) -> str:
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def get(self, key: str) -> CachedResult | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text, input_tokens, output_tokens FROM entries WHERE key = ?",
+                (key,),
+            ).fetchone()
+            if row is None:
+                self._misses += 1
+                return None
+
+            self._hits += 1
+            self._conn.execute(
+                "UPDATE entries SET last_used = ? WHERE key = ?",
+                (self._next_tick(), key),
+            )
+            self._conn.commit()
+            return CachedResult(text=row[0], input_tokens=row[1], output_tokens=row[2])
+
+    def put(self, key: str, result: CachedResult) -> None:
+        size = len(result.text.encode("utf-8"))
+        if self._max_size_bytes is not None and size > self._max_size_bytes:
+            return
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(key, text, input_tokens, output_tokens, size, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, result.text, result.input_tokens, result.output_tokens, size, self._next_tick()),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            entries, size_bytes = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                entries=entries,
+                size_bytes=size_bytes,
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _next_tick(self) -> int:
+        self._tick += 1
+        return self._tick
+
+    def _evict(self) -> None:
+        if self._max_size_bytes is None:
+            return
+        total: int = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self._max_size_bytes:
+            return
+
+        # 从最久未使用的条目开始删除，直到总大小回到上限以内
+        evicted_keys: list[str] = []
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY last_used"):
+            if total <= self._max_size_bytes:
+                break
+            evicted_keys.append(key)
+            total -= size
+
+        self._conn.executemany("DELETE FROM entries WHERE key = ?", ((k,) for k in evicted_keys))
+        self._evictions += len(evicted_keys)
@@ -0,0 +1,195 @@
+"""
+推理前的空白页与重复页检测
+
+扫描书籍中常见整页空白的衬页、分隔页，以及反复出现的广告页、样板页。
+PageDeduplicator 在推理前为每页计算感知指纹：
+
+- 空白页：2×2 实心墨迹块少于 blank_ink_blocks 个的页面不经模型，直接返回空结果。
+  按绝对数量而非占比判断，只有一行标题的分部页、献词页不会被当作空白；
+  扫描灰尘与压缩噪点是孤立像素，构不成实心块
+- 重复页：按墨迹外框裁剪原图后缩小为 48×64 的灰度缩略图，与同一文档中已识别页面的
+  缩略图比较，差异（归一化到墨迹总量）不超过 max_difference 时复用先前的识别结果
+
+按墨迹外框对齐后，同一页面的重新编码、平移差异在 0.1 以内，
+版式相同、内容不同的正文页差异在 0.3 左右或更高。300 DPI 页面的指纹约需数十毫秒，
+与已识别页面的比较只涉及缩略图，远小于一次推理的开销。
+"""
+
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable
+
+import numpy as np
+from PIL import Image
+
+
+# 分析图像的高度，墨迹占比在此分辨率上计算，零星噪点被平均掉
+_ANALYSIS_HEIGHT = 512
+# 原图中墨迹像素少于该数目的行、列不计入外框，避免扫描灰尘撑大外框
+_MIN_EDGE_INK_PIXELS = 3
+# 低于背景亮度该比例的像素视为墨迹
+_INK_THRESHOLD = 0.8
+# 比较用缩略图的尺寸（宽, 高）
+_THUMBNAIL_SIZE = (48, 64)
+# 墨迹外框长宽比相差超过该比例的页面不做比较
+_MAX_ASPECT_DIFFERENCE = 0.1
+
+_DEFAULT_BLANK_INK_BLOCKS = 16
+_DEFAULT_MAX_DIFFERENCE = 0.15
+_DEFAULT_MAX_PAGES = 1024
+_DEFAULT_MAX_DOCUMENTS = 16
+
+
+@dataclass(frozen=True)
+class PageFingerprint:
+    ink_ratio: float
+    # 墨迹外框的高宽比；空白页为 0
+    aspect_ratio: float
+    # 墨迹浓度缩略图；空白页为 None
+    thumbnail: np.ndarray | None
+
+    @property
+    def blank(self) -> bool:
+        return self.thumbnail is None
+
+
+@dataclass
+class DedupStats:
+    # 跳过的空白页
+    blank: int
+    # 复用先前结果的重复页
+    reused: int
+    # 经过检测、需要推理的页面
+    unique: int
+
+
+def fingerprint(image: Image.Image, blank_ink_blocks: int = _DEFAULT_BLANK_INK_BLOCKS) -> PageFingerprint:
+    """计算页面的墨迹占比与对齐后的缩略图"""
+    gray = image.convert("L")
+    width = max(1, round(gray.width * _ANALYSIS_HEIGHT / gray.height))
+    pixels = np.asarray(gray.resize((width, _ANALYSIS_HEIGHT), Image.Resampling.BOX), dtype=np.float32)
+
+    background = float(np.percentile(pixels, 90)) or 255.0
+    ink_ratio = float((pixels < background * _INK_THRESHOLD).mean())
+
+    full_ink = np.asarray(gray) < background * _INK_THRESHOLD
+    solid = full_ink[:-1, :-1] & full_ink[1:, :-1] & full_ink[:-1, 1:] & full_ink[1:, 1:]
+    if np.count_nonzero(solid) < blank_ink_blocks:
+        return PageFingerprint(ink_ratio=ink_ratio, aspect_ratio=0.0, thumbnail=None)
+
+    # 在原图上按墨迹外框裁剪，页边距与扫描偏移不影响比较
+    rows = np.flatnonzero(np.count_nonzero(full_ink, axis=1) >= _MIN_EDGE_INK_PIXELS)
+    columns = np.flatnonzero(np.count_nonzero(full_ink, axis=0) >= _MIN_EDGE_INK_PIXELS)
+    if len(rows) == 0 or len(columns) == 0:
+        return PageFingerprint(ink_ratio=ink_ratio, aspect_ratio=0.0, thumbnail=None)
+    box = (int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1)
+    thumbnail = gray.crop(box).resize(_THUMBNAIL_SIZE, Image.Resampling.BOX)
+    return PageFingerprint(
+        ink_ratio=ink_ratio,
+        aspect_ratio=(box[3] - box[1]) / (box[2] - box[0]),
+        # 墨迹浓度：背景为 0，与页面底色无关
+        thumbnail=np.clip(background - np.asarray(thumbnail, dtype=np.float32), 0, None),
+    )
+
+
+def difference(a: PageFingerprint, b: PageFingerprint) -> float:
+    """两页缩略图的差异，0 为相同；空白页或外框形状相差过大时为 1"""
+    if a.thumbnail is None or b.thumbnail is None:
+        return 1.0
+    if abs(a.aspect_ratio - b.aspect_ratio) > _MAX_ASPECT_DIFFERENCE * max(a.aspect_ratio, b.aspect_ratio):
+        return 1.0
+    total = max(float(a.thumbnail.sum()), float(b.thumbnail.sum()), 1.0)
+    return float(np.abs(a.thumbnail - b.thumbnail).sum()) / total
+
+
+@dataclass
+class _Seen:
+    key: Hashable
+    fingerprint: PageFingerprint
+    text: str
+
+
+class PageDeduplicator:
+    """
+    检测空白页并在同一文档内复用重复页的识别结果，可在多个文档之间共享
+
+    文档由调用方给出（通常是 scheduler 作业的 document）；key 区分 prompt 与尺寸配置，
+    不同 key 的结果不会互相复用。每个文档只保留最近 max_pages 页，
+    最多同时跟踪 max_documents 个文档，超出时丢弃最久未使用的文档。
+
+    Args:
+        blank_ink_blocks: 2×2 实心墨迹块少于该数目的页面视为空白
+        max_difference: 差异不超过该值的页面视为重复，0 表示只检测空白页
+        max_pages: 每个文档保留用于比较的页数
+        max_documents: 同时跟踪的文档数
+    """
+
+    def __init__(
+        self,
+        blank_ink_blocks: int = _DEFAULT_BLANK_INK_BLOCKS,
+        max_difference: float = _DEFAULT_MAX_DIFFERENCE,
+        max_pages: int = _DEFAULT_MAX_PAGES,
+        max_documents: int = _DEFAULT_MAX_DOCUMENTS,
+    ) -> None:
+        if not 0 <= max_difference < 1:
+            raise ValueError("max_difference must be in [0, 1)")
+        if max_pages <= 0 or max_documents <= 0:
+            raise ValueError("max_pages and max_documents must be positive")
+
+        self._blank_ink_blocks = blank_ink_blocks
+        self._max_difference = max_difference
+        self._max_pages = max_pages
+        self._max_documents = max_documents
+        self._lock = threading.Lock()
+        self._documents: OrderedDict[str | None, list[_Seen]] = OrderedDict()
+        self._blank = 0
+        self._reused = 0
+        self._unique = 0
+
+    @property
+    def blank_ink_blocks(self) -> int:
+        return self._blank_ink_blocks
+
+    @property
+    def max_difference(self) -> float:
+        return self._max_difference
+
+    def fingerprint(self, image: Image.Image) -> PageFingerprint:
+        return fingerprint(image, self._blank_ink_blocks)
+
+    def lookup(self, document: str | None, key: Hashable, page: PageFingerprint) -> str | None:
+        """
+        返回可直接使用的结果：空白页为空字符串，重复页为先前的识别结果；
+        需要推理时返回 None，推理完成后应调用 remember
+        """
+        if page.blank:
+            with self._lock:
+                self._blank += 1
+            return ""
+        with self._lock:
+            seen = self._documents.get(document)
+            if seen is not None:
+                self._documents.move_to_end(document)
+                for entry in reversed(seen):
+                    if entry.key == key and difference(entry.fingerprint, page) <= self._max_difference:
+                        self._reused += 1
+                        return entry.text
+            self._unique += 1
+            return None
+
+    def remember(self, document: str | None, key: Hashable, page: PageFingerprint, text: str) -> None:
+        if page.blank or self._max_difference == 0:
+            return
+        with self._lock:
+            seen = self._documents.setdefault(document, [])
+            self._documents.move_to_end(document)
+            seen.append(_Seen(key=key, fingerprint=page, text=text))
+            if len(seen) > self._max_pages:
+                del seen[0]
+            while len(self._documents) > self._max_documents:
+                self._documents.popitem(last=False)
+
+    def stats(self) -> DedupStats:
+        with self._lock:
+            return DedupStats(blank=self._blank, reused=self._reused, unique=self._unique)
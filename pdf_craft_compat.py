@@ -0,0 +1,70 @@
+"""
+pdf_craft 内部接口适配
+
+流式输出与单独的 OCR 阶段复用了 pdf_craft 未公开的函数与属性。这些依赖集中在本模块：
+导入时逐一解析，任何一个缺失都抛出 ImportError，写明已安装的版本与验证过的版本，
+而不是在转换进行到一半时才出现 AttributeError。
+
+本模块会导入 pdf_craft，只能在 install_model_patch 之后按需导入。
+"""
+
+import importlib
+from importlib import metadata
+from typing import Any
+
+# 以下内部接口按此版本编写并验证
+TESTED_VERSION = "1.0.3"
+
+
+def _installed_version() -> str:
+    try:
+        return metadata.version("pdf-craft")
+    except metadata.PackageNotFoundError:
+        return "unknown"
+
+
+def _incompatible(name: str) -> ImportError:
+    return ImportError(
+        f"pdf-craft {_installed_version()} does not provide {name}, which pdf-craftq relies on; "
+        f"it was tested with pdf-craft {TESTED_VERSION} "
+        f"(pip install \"pdf-craft=={TESTED_VERSION}\")"
+    )
+
+
+def _resolve(module_name: str, attribute: str) -> Any:
+    try:
+        return getattr(importlib.import_module(module_name), attribute)
+    except (ImportError, AttributeError):
+        raise _incompatible(f"{module_name}.{attribute}") from None
+
+
+Jointer = _resolve("pdf_craft.sequence.jointer", "Jointer")
+TITLE_TAGS = _resolve("pdf_craft.sequence.jointer", "TITLE_TAGS")
+normalize_paragraph_content = _resolve("pdf_craft.sequence.jointer", "_normalize_paragraph_content")
+page_index_from_layout = _resolve("pdf_craft.sequence.generation", "_page_index_from_layout")
+line_parts_after_replace_references = _resolve(
+    "pdf_craft.sequence.generation", "_line_parts_after_replace_references",
+)
+
+for _method in ("_transform_and_join_asset_layouts", "_can_merge_paragraphs"):
+    if not callable(getattr(Jointer, _method, None)):
+        raise _incompatible(f"Jointer.{_method}")
+del _method
+
+
+def transform_and_join_asset_layouts(jointer, page_index: int, raw_layouts: list) -> list:
+    """Jointer 对单页布局的转换与资源合并（Jointer.execute 的单页步骤）"""
+    return jointer._transform_and_join_asset_layouts(page_index, raw_layouts)
+
+
+def can_merge_paragraphs(jointer, previous, following) -> bool:
+    """跨页的两个段落能否拼接为一段"""
+    return jointer._can_merge_paragraphs(previous, following)
+
+
+def transform_ocr(transform) -> Any:
+    """Transform 内部持有的 OCR；pdf_craft 没有单独运行 OCR 阶段的公开入口"""
+    ocr = getattr(transform, "_ocr", None)
+    if ocr is None:
+        raise _incompatible("Transform._ocr")
+    return ocr
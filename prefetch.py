@@ -0,0 +1,171 @@
+"""
+页面预取
+
+pdf_craft 逐页执行“渲染 → 识别”，poppler 渲染页面时 GPU 处于空闲。
+PrefetchPDFHandler 作为 pdf_craft 的 PDFHandler 使用：请求第 i 页时，
+进程池已在后台渲染并缩放第 i+1 … i+K 页。已提交但尚未取走的页面最多 K 页，
+识别跟不上时渲染自动暂停（背压），内存占用因此有上限。
+
+缩放依据 _SIZE_CONFIGS：模型只会把页面缩放到 base_size（crop_mode 下为
+image_size 切片网格），300 DPI 的原图远大于此。缩放后保留两倍余量，
+使从页面裁剪出的图片、表格资源仍然清晰。
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+
+from PIL import Image
+
+
+# crop_mode 下 DeepSeek-OCR 最多按 3x3 网格切片
+_MAX_CROP_GRID = 3
+# 相对模型输入尺寸保留的余量，保证裁剪出的资源清晰
+_ASSET_HEADROOM = 2
+
+# 工作进程内当前打开的文档，同一 PDF 的后续页面复用
+_worker_document: tuple[Path, object] | None = None
+
+
+def prefetch_max_side(ocr_size: str) -> int:
+    """页面预取时缩放后的最长边像素数"""
+    from auto_size import AUTO_SIZE
+    from quantized_model import _SIZE_CONFIGS
+
+    # auto 模式下每页尺寸未知，按最大的一档保留分辨率
+    configs = _SIZE_CONFIGS.values() if ocr_size == AUTO_SIZE else [_SIZE_CONFIGS[ocr_size]]
+    model_side = 0
+    for config in configs:
+        model_side = max(model_side, config.base_size)
+        if config.crop_mode:
+            model_side = max(model_side, config.image_size * _MAX_CROP_GRID)
+    return model_side * _ASSET_HEADROOM
+
+
+def _render_page(handler, pdf_path: Path, page_index: int, dpi: int, max_side: int | None) -> Image.Image:
+    # 在工作进程中执行：渲染并缩放一页
+    global _worker_document
+    if _worker_document is None or _worker_document[0] != pdf_path:
+        if _worker_document is not None:
+            _worker_document[1].close()
+        _worker_document = (pdf_path, handler.open(pdf_path))
+    image = _worker_document[1].render_page(page_index, dpi)
+    if max_side is not None and max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS)
+    return image
+
+
+class PrefetchPDFDocument:
+    """由 PrefetchPDFHandler.open 创建，按页码顺序预取后续页面"""
+
+    def __init__(self, handler: "PrefetchPDFHandler", pdf_path: Path) -> None:
+        self._handler = handler
+        self._pdf_path = pdf_path
+        self._document = handler.inner.open(pdf_path)
+        self._futures: dict[int, Future] = {}
+        self._next_page = 1
+        self._lock = threading.Lock()
+
+    @property
+    def pages_count(self) -> int:
+        return self._document.pages_count
+
+    @property
+    def pending_pages(self) -> list[int]:
+        """已提交渲染、尚未被取走的页码"""
+        with self._lock:
+            return sorted(self._futures)
+
+    def render_page(self, page_index: int, dpi: int) -> Image.Image:
+        with self._lock:
+            future = self._futures.pop(page_index, None)
+            if future is None:
+                # 跳页（续传、分片）时丢弃已失效的预取，从请求的页码重新开始
+                self._cancel_pending()
+                future = self._submit(page_index, dpi)
+            # pdf_craft 跳过的页面（已有结果）不会再被请求
+            for stale_page in [p for p in self._futures if p < page_index]:
+                self._futures.pop(stale_page).cancel()
+            self._next_page = max(self._next_page, page_index + 1)
+            self._fill(dpi)
+        return future.result()
+
+    def close(self) -> None:
+        with self._lock:
+            self._cancel_pending()
+        self._document.close()
+
+    def _fill(self, dpi: int) -> None:
+        # 背压：已提交未取走的页面不超过 prefetch 页
+        while len(self._futures) < self._handler.prefetch and self._next_page <= self.pages_count:
+            self._futures[self._next_page] = self._submit(self._next_page, dpi)
+            self._next_page += 1
+
+    def _submit(self, page_index: int, dpi: int) -> Future:
+        return self._handler.executor().submit(
+            _render_page,
+            self._handler.inner,
+            self._pdf_path,
+            page_index,
+            dpi,
+            self._handler.max_side,
+        )
+
+    def _cancel_pending(self) -> None:
+        for future in self._futures.values():
+            future.cancel()
+        self._futures.clear()
+
+
+class PrefetchPDFHandler:
+    """
+    在进程池中预先渲染后续页面的 PDFHandler
+
+    Args:
+        prefetch: 预取的页数 K，即背压上限
+        max_side: 缩放后的最长边，None 表示不缩放；通常取 prefetch_max_side(ocr_size)
+        workers: 渲染进程数，默认 min(K, CPU 数)
+        inner: 实际负责打开和渲染 PDF 的处理器，必须可以 pickle，默认使用 poppler
+    """
+
+    def __init__(
+        self,
+        prefetch: int = 4,
+        max_side: int | None = None,
+        workers: int | None = None,
+        inner=None,
+    ) -> None:
+        if prefetch <= 0:
+            raise ValueError("prefetch must be positive")
+        if inner is None:
+            from pdf_craft import DefaultPDFHandler
+            inner = DefaultPDFHandler()
+
+        self.prefetch = prefetch
+        self.max_side = max_side
+        self.inner = inner
+        self._workers = workers or max(1, min(prefetch, os.cpu_count() or 1))
+        self._executor: ProcessPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+
+    def open(self, pdf_path: Path) -> PrefetchPDFDocument:
+        return PrefetchPDFDocument(self, Path(pdf_path))
+
+    def executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn：父进程已有推理线程与 CUDA 上下文，fork 并不安全
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self._workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+                self._executor = None
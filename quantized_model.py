@@ -5,21 +5,46 @@
 使其加载 4-bit 量化模型而非官方原始模型。
 """
 
+import gc
+import hashlib
+import os
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from dataclasses import dataclass
+from functools import partial
 from importlib.util import find_spec
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Callable, Iterable, Sequence, Union, cast
 
 from huggingface_hub import snapshot_download
-from readerwriterlock import rwlock
+from PIL import Image
 from transformers import AutoModel, AutoTokenizer, BitsAndBytesConfig
 
+from doc_page_extractor import AbortError, TokenLimitError
 from doc_page_extractor.types import DeepSeekOCRSize, ExtractionContext
 from doc_page_extractor.check_env import check_env
 from doc_page_extractor.injection import InferWithInterruption, preprocess_model
 
+from auto_size import AUTO_SIZE, SIZE_LADDER, PageFeatures, analyse_page, choose_size, escalate, looks_degenerate
+from confidence import TokenLogProbs, record_generate, score_page
+import cpu_backend
+from decode_limits import TRUNCATED_BUDGET, TRUNCATED_REPETITION, DecodeGuard, guard_generate
+from fast_load import SharedCheckpoint, materialize_snapshot, materialized_revision
+from metrics import MetricsCollector
+from ocr_cache import CachedResult, OCRCache
+from page_dedup import PageDeduplicator, PageFingerprint
+from residency import ResidencyEvent, ResidencyManager
+from scheduler import JobInfo, QueueMonitor, QueueStats, ReplicaScheduler, ReplicaStats, current_job
+from snapshot_index import SnapshotIndex
 
-@dataclass
+
+@dataclass(frozen=True)
 class _SizeConfig:
     base_size: int
     image_size: int
@@ -41,17 +66,93 @@ else:
     _ATTN_IMPLEMENTATION = "eager"
 
 
+# 页面图像：文件路径，或内存中的 PIL 图像 / numpy 数组
+PageImage = Union[Path, str, Image.Image, Any]
+
+# 内存图像需落地为文件才能交给 infer，优先使用内存文件系统
+_RAM_TEMP_DIR: str | None = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+
+
+@dataclass
+class _BatchItem:
+    index: int
+    prompt: str
+    image: PageImage
+    config: _SizeConfig
+    cache_key: str | None = None
+    # size="auto" 时记录所选尺寸与页面特征，用于退化检测与升级重试
+    size: DeepSeekOCRSize | None = None
+    features: PageFeatures | None = None
+    # 推测式识别：先以 draft 尺寸识别，置信度不足时再以 size 重新识别
+    draft: DeepSeekOCRSize | None = None
+    draft_cache_key: str | None = None
+    # 启用重复页检测时的页面指纹，推理完成后登记到 PageDeduplicator
+    fingerprint: PageFingerprint | None = None
+
+
+def _to_pil_image(image: PageImage) -> Image.Image:
+    if isinstance(image, Image.Image):
+        pil_image = image
+    elif hasattr(image, "__array_interface__"):
+        pil_image = Image.fromarray(image)
+    else:
+        raise TypeError(f"Unsupported page image type: {type(image).__name__}")
+    if pil_image.mode not in ("RGB", "L"):
+        pil_image = pil_image.convert("RGB")
+    return pil_image
+
+
+def _open_page_image(image: PageImage) -> Image.Image:
+    if isinstance(image, (str, Path)):
+        with Image.open(image) as opened:
+            opened.load()
+            return opened
+    return _to_pil_image(image)
+
+
+def _image_digest(image: PageImage) -> str:
+    if isinstance(image, (str, Path)):
+        return OCRCache.file_digest(Path(image))
+    pil_image = _to_pil_image(image)
+    sha256 = hashlib.sha256(f"{pil_image.mode}:{pil_image.width}x{pil_image.height}:".encode("ascii"))
+    sha256.update(pil_image.tobytes())
+    return sha256.hexdigest()
+
+
+def _plan_batches(items: list[_BatchItem], batch_size: int) -> list[list[_BatchItem]]:
+    """按 _SizeConfig 分组（保持各组首次出现的顺序），再按 batch_size 切块"""
+    if batch_size <= 0:
+        raise ValueError("batch_size must be positive")
+
+    groups: dict[_SizeConfig, list[_BatchItem]] = {}
+    for item in items:
+        groups.setdefault(item.config, []).append(item)
+
+    batches: list[list[_BatchItem]] = []
+    for group in groups.values():
+        for start in range(0, len(group), batch_size):
+            batches.append(group[start:start + batch_size])
+    return batches
+
+
 @dataclass
 class _Models:
     tokenizer: AutoTokenizer
     llms: list[AutoModel]
+    device_numbers: list[int]
+    scheduler: ReplicaScheduler
+    # 设备号 → 副本下标，加载时确定，推理路径上只做字典查找
+    device_indexes: dict[int, int]
+    # CPU 模式：单个副本，每页单独占用一个并发名额
+    cpu: bool = False
 
 
 class QuantizedDeepSeekOCRModel:
     """
     量化版 DeepSeek-OCR 模型
 
-    实现 DeepSeekOCRModel 协议，使用 bitsandbytes 4-bit 量化模型
+    实现 DeepSeekOCRModel 协议，使用 bitsandbytes 4-bit 量化模型；
+    device="cpu" 时改为在 CPU 上运行全精度权重（见 cpu_backend）
     """
 
     # 量化模型的 HuggingFace repo ID
@@ -62,23 +163,95 @@ class QuantizedDeepSeekOCRModel:
         model_path: Path | None,
         local_only: bool,
         enable_devices_numbers: Iterable[int] | None,
+        ocr_cache: OCRCache | None = None,
+        max_inflight_per_device: int = 1,
+        batch_size: int = 8,
+        debug_output_path: Path | None = None,
+        metrics: MetricsCollector | None = None,
+        max_auto_escalations: int = 1,
+        revision: str | None = None,
+        materialized_path: Path | None = None,
+        idle_unload_seconds: float | None = None,
+        memory_pressure: Callable[[], bool] | None = None,
+        on_residency_event: Callable[[ResidencyEvent], None] | None = None,
+        queue_monitor: QueueMonitor | None = None,
+        device: str = "cuda",
+        cpu_dtype: str = "bfloat16",
+        cpu_workers: int | None = None,
+        cpu_threads: int | None = None,
+        page_dedup: PageDeduplicator | None = None,
+        max_new_tokens: int | None = None,
+        repetition_stop: int | None = None,
+        draft_size: DeepSeekOCRSize | None = None,
+        min_confidence: float = 0.85,
     ) -> None:
         if local_only and model_path is None:
             raise ValueError(
                 "model_path must be provided when local_only is True")
+        if cpu_dtype not in cpu_backend.CPU_DTYPES:
+            raise ValueError(f"Unknown cpu_dtype: {cpu_dtype}")
+        if max_new_tokens is not None and max_new_tokens <= 0:
+            raise ValueError("max_new_tokens must be positive")
+        if repetition_stop is not None and repetition_stop < 2:
+            raise ValueError("repetition_stop must be at least 2")
+        if draft_size is not None and draft_size not in _SIZE_CONFIGS:
+            raise ValueError(f"Unknown draft_size: {draft_size}")
+        if not 0 <= min_confidence <= 1:
+            raise ValueError("min_confidence must be in [0, 1]")
 
-        self._rwlock = rwlock.RWLockFair()
-        self._model_name = self.QUANTIZED_MODEL_NAME
+        # 只保护下载、加载与卸载；推理路径不取此锁
+        self._load_lock = threading.Lock()
+        # "auto" 在构造时解析：权重仓库（以及缓存键）取决于设备
+        self._device = cpu_backend.resolve_device(device)
+        self._cpu_dtype = cpu_dtype
+        self._cpu_plan: cpu_backend.CPUPlan | None = None
+        if self._device == "cpu":
+            self._cpu_plan = cpu_backend.plan_cpu(cpu_workers, cpu_threads)
+        self._model_name = cpu_backend.CPU_MODEL_NAME if self._device == "cpu" else self.QUANTIZED_MODEL_NAME
         self._model_path: Path | None = model_path
         self._local_only = local_only
         self._models: _Models | None = None
         self._enable_devices_numbers: Iterable[int] | None = enable_devices_numbers
         self._device_number_to_index: list[int | None] | None = None
+        self._ocr_cache: OCRCache | None = ocr_cache
+        # 推理前跳过空白页、复用同一文档中重复页的结果
+        self._page_dedup: PageDeduplicator | None = page_dedup
+        self._model_revision: str | None = None
+        # 固定的模型版本（commit hash、分支或标签），None 表示跟随 main
+        self._revision: str | None = revision
+        # 物化的本地模型目录（见 fast_load），为 None 时直接从缓存快照加载
+        self._materialized_path: Path | None = materialized_path
+        # 空闲或内存紧张时自动卸载，下一次 generate 时重新加载
+        self._residency: ResidencyManager | None = None
+        if idle_unload_seconds is not None or memory_pressure is not None:
+            self._residency = ResidencyManager(
+                unload=self._release_models,
+                idle_timeout=idle_unload_seconds,
+                pressure_check=memory_pressure,
+                on_event=on_residency_event,
+            )
+        self._max_inflight_per_device = max_inflight_per_device
+        # 队列统计跨越模型的卸载与重新加载
+        self._queue_monitor = queue_monitor or QueueMonitor()
+        self._batch_size = batch_size
+        self._context_lock = threading.Lock()
+        self._debug_output_path: Path | None = debug_output_path
+        self._debug_page_counter = 0
+        self._scratch_dir: tempfile.TemporaryDirectory | None = None
+        self._metrics: MetricsCollector | None = metrics
+        self._max_auto_escalations = max_auto_escalations
+        # 单页输出 token 上限与重复循环检测（见 decode_limits）
+        self._max_new_tokens = max_new_tokens
+        self._repetition_stop = repetition_stop
+        # 推测式两级识别的草稿尺寸与接受草稿结果的最低置信度（见 confidence）
+        self._draft_size: DeepSeekOCRSize | None = draft_size
+        self._min_confidence = min_confidence
 
     def download(self, revision: str | None) -> None:
-        with self._rwlock.gen_wlock():
+        revision = revision or self._revision
+        with self._load_lock:
             # 检查模型是否已存在
-            existing_path = self._find_pretrained_path()
+            existing_path = self._find_pretrained_path(revision)
             if existing_path is not None:
                 print(f"[QuantizedModel] 模型已存在: {existing_path}")
                 print("[QuantizedModel] 跳过下载")
@@ -91,7 +264,10 @@ class QuantizedDeepSeekOCRModel:
                 revision=revision,
                 cache_dir=self._cache_dir(),
             )
-            if self._model_path is not None and self._find_pretrained_path() is None:
+            snapshot_index = self._snapshot_index()
+            if snapshot_index is not None:
+                snapshot_index.invalidate()
+            if self._model_path is not None and self._find_pretrained_path(revision) is None:
                 raise RuntimeError(
                     f"Model downloaded but not found in expected cache structure. "
                     f"Expected path: {self._model_path}/models--{self._model_name.replace('/', '--')}/snapshots/. "
@@ -102,82 +278,555 @@ class QuantizedDeepSeekOCRModel:
     def load(self) -> None:
         self._ensure_models()
 
+    def replica_stats(self) -> list[ReplicaStats]:
+        """各设备副本的在途请求数与累计分派数；模型未加载时为空"""
+        models = self._models
+        if models is None:
+            return []
+        return models.scheduler.stats()
+
+    def queue_stats(self) -> list[QueueStats]:
+        """各优先级的排队深度与等待时间"""
+        return self._queue_monitor.stats()
+
+    @property
+    def max_inflight_per_device(self) -> int:
+        if self._cpu_plan is not None:
+            return self._cpu_plan.workers
+        return self._max_inflight_per_device
+
+    @property
+    def device(self) -> str:
+        """实际使用的设备（cuda 或 cpu），auto 在构造时已解析"""
+        return self._device
+
+    @property
+    def cpu_plan(self) -> cpu_backend.CPUPlan | None:
+        """CPU 模式下的并发页数与每页线程数"""
+        return self._cpu_plan
+
+    @property
+    def residency(self) -> ResidencyManager | None:
+        return self._residency
+
     def unload(self) -> None:
-        with self._rwlock.gen_wlock():
-            if self._models is not None:
-                self._models = None
+        if self._residency is not None:
+            # 经由驻留管理卸载，记录事件并等待在途请求结束
+            self._residency.unload()
+        else:
+            self._release_models()
 
     def generate(
         self,
         prompt: str,
         image_path: Path,
         output_path: Path,
-        size: DeepSeekOCRSize,
+        size: DeepSeekOCRSize | str,
         context: ExtractionContext | None,
         device_number: int | None,
     ) -> str:
 
+        return self.generate_batch(
+            items=[(prompt, image_path, size)],
+            output_path=output_path,
+            context=context,
+            device_number=device_number,
+        )[0]
+
+    def generate_batch(
+        self,
+        items: Sequence[tuple[str, PageImage, DeepSeekOCRSize | str]],
+        output_path: Path | None = None,
+        context: ExtractionContext | None = None,
+        device_number: int | None = None,
+        batch_size: int | None = None,
+    ) -> list[str]:
+        """
+        批量识别多个页面，结果按输入顺序返回
+
+        相同 _SizeConfig 的页面归为一组并按 batch_size 切块。每块选定一个副本，
+        块内页面在该副本上并发推理，每页占用一个调度名额，因此无论有多少块或调用
+        同时运行，每个副本上同时推理的页数都不超过 max_inflight_per_device；
+        不同块可同时运行在不同副本上。
+        DeepSeek-OCR 的 infer 只接受单张图像，因此块内并发代替了张量级 padding。
+
+        页面图像可以是文件路径，也可以是内存中的 PIL 图像或 numpy 数组；
+        内存图像只在内存文件系统中短暂落地。除非构造时指定 debug_output_path，
+        否则不保存 infer 的结果文件（result.mmd、带框图片等）。
+
+        size 为 "auto" 时按页面文本密度选择尺寸（见 auto_size），结果疑似退化时
+        升级到下一档重试，最多 max_auto_escalations 次。
+
+        max_new_tokens / repetition_stop 限制单页解码长度（见 decode_limits），作业带有
+        输出预算（scheduler.job 的 max_output_tokens）时，单页上限不超过剩余预算，
+        预算用尽后的页面以 TokenLimitError 失败。截断的页面记录到 metrics，且不写入缓存。
+
+        构造时指定 page_dedup 时，空白页直接返回空字符串，与当前作业文档中已识别页面
+        重复的页面复用先前的结果（见 page_dedup），两者都不占用副本。
+
+        构造时指定 draft_size 时，目标尺寸（指定的或自动选择的）大于 draft_size 的页面
+        先以 draft_size 识别，置信度（见 confidence）低于 min_confidence 时再以目标尺寸
+        重新识别。草稿结果以 draft_size 本身的缓存键写入缓存，最终结果单独缓存。
+
+        Args:
+            items: (prompt, image, size) 列表，size 可以是 "auto"
+            output_path: infer 的工作目录，为 None 时使用内存中的临时目录
+            context: 所有页面共享的 ExtractionContext，token 计数会累加到其中
+            device_number: 指定设备；为 None 时由调度器选择副本
+            batch_size: 每块页面数，默认使用构造时的 batch_size
+
+        排队时的优先级、截止时间与公平共享取决于调用方所在的作业（见 scheduler.job）。
+        """
+        results: list[str | None] = [None] * len(items)
+        pending: list[_BatchItem] = []
+        job = current_job()
+        use_cache = self._ocr_cache is not None
+        if use_cache and self._resolve_model_revision() is None:
+            # 缓存键包含模型快照的 commit：本地还没有快照时先加载（下载）模型再查缓存
+            with self._residency.active() if self._residency is not None else nullcontext():
+                self._ensure_models()
+            # 仍无法确定版本时不读写缓存，不同版本的结果不会混用
+            use_cache = self._model_revision is not None
+
+        for index, (prompt, image, size) in enumerate(items):
+            page_image: Image.Image | None = None
+            fingerprint: PageFingerprint | None = None
+            if self._page_dedup is not None:
+                page_image = _open_page_image(image)
+                fingerprint = self._page_dedup.fingerprint(page_image)
+
+            features: PageFeatures | None = None
+            if size == AUTO_SIZE:
+                features = analyse_page(page_image or _open_page_image(image))
+                size = cast(DeepSeekOCRSize, choose_size(features))
+            draft: DeepSeekOCRSize | None = None
+            if self._draft_size is not None and SIZE_LADDER.index(self._draft_size) < SIZE_LADDER.index(size):
+                draft = self._draft_size
+            item = _BatchItem(
+                index=index,
+                prompt=prompt,
+                image=image,
+                config=_SIZE_CONFIGS[size],
+                size=size,
+                features=features,
+                fingerprint=fingerprint,
+                draft=draft,
+            )
+            if fingerprint is not None:
+                reused = self._reuse_page(job, prompt, item.config, fingerprint)
+                if reused is not None:
+                    results[index] = reused
+                    continue
+            if use_cache:
+                assert self._ocr_cache is not None
+                item.cache_key = self._cache_key(prompt, image, item.config, auto=features is not None, draft=draft)
+                if draft is not None:
+                    item.draft_cache_key = self._cache_key(prompt, image, _SIZE_CONFIGS[draft])
+                cached = self._ocr_cache.get(item.cache_key)
+                if cached is not None:
+                    # 命中缓存：不加载模型，仅回放 token 计数以保持配额统计一致
+                    if context is not None:
+                        with self._context_lock:
+                            context.input_tokens += cached.input_tokens
+                            context.output_tokens += cached.output_tokens
+                    results[index] = cached.text
+                    self._remember_page(job, item, cached.text)
+                    continue
+            pending.append(item)
+
+        if pending:
+            with self._residency.active() if self._residency is not None else nullcontext():
+                self._generate_pending(
+                    pending, output_path, context, device_number, batch_size, results, job,
+                )
+            for item in pending:
+                self._remember_page(job, item, cast(str, results[item.index]))
+
+        return cast(list[str], results)
+
+    def _reuse_page(self, job: JobInfo, prompt: str, config: _SizeConfig, fingerprint: PageFingerprint) -> str | None:
+        assert self._page_dedup is not None
+        text = self._page_dedup.lookup(job.document, (prompt, config), fingerprint)
+        if text is not None and self._metrics is not None:
+            self._metrics.record_deduplicated_page(blank=fingerprint.blank)
+        return text
+
+    def _remember_page(self, job: JobInfo, item: _BatchItem, text: str) -> None:
+        if self._page_dedup is not None and item.fingerprint is not None:
+            self._page_dedup.remember(job.document, (item.prompt, item.config), item.fingerprint, text)
+
+    def _generate_pending(
+        self,
+        pending: list[_BatchItem],
+        output_path: Path | None,
+        context: ExtractionContext | None,
+        device_number: int | None,
+        batch_size: int | None,
+        results: list[str | None],
+        job: JobInfo,
+    ) -> None:
         models = self._ensure_models()
-        if device_number is None:
-            model_index = self._get_device_number_to_index()[0]
+        if output_path is None:
+            output_path = self._get_scratch_dir()
+
+        # 未指定设备时交给调度器选择最空闲的副本
+        requested_index: int | None = None
+        if device_number is not None:
+            requested_index = models.device_indexes.get(device_number)
+            if requested_index is None:
+                raise ValueError(f"Device number {device_number} is not enabled.")
+
+        if models.cpu:
+            # 块内并发会叠加每页的 intra-op 线程；CPU 上按页排队，同时推理的页数即 cpu_workers
+            batch_size = 1
+        batches = _plan_batches(pending, batch_size or self._batch_size)
+        if len(batches) == 1:
+            self._run_batch(models, requested_index, batches[0], output_path, context, results, job)
         else:
-            model_index = self._get_device_number_to_index()[device_number]
-
-        if model_index is None:
-            raise ValueError(f"Device number {device_number} is not enabled.")
-
-        tokenizer = models.tokenizer
-        llm_model = models.llms[model_index]
-        config = _SIZE_CONFIGS[size]
-
-        with self._rwlock.gen_rlock():
-            with InferWithInterruption(llm_model, context) as infer:
-                text_result = infer(
-                    tokenizer,
-                    prompt=prompt,
-                    image_file=str(image_path),
-                    output_path=str(output_path),
-                    base_size=config.base_size,
-                    image_size=config.image_size,
-                    crop_mode=config.crop_mode,
-                    save_results=True,
-                    test_compress=True,
-                    eval_mode=True,
+            workers = min(len(batches), self.max_inflight_per_device if models.cpu else models.scheduler.replica_count)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = [
+                    pool.submit(self._run_batch, models, requested_index, batch, output_path, context, results, job)
+                    for batch in batches
+                ]
+                for future in futures:
+                    future.result()
+
+    def _run_batch(
+        self,
+        models: _Models,
+        requested_index: int | None,
+        batch: list["_BatchItem"],
+        output_path: Path,
+        context: ExtractionContext | None,
+        results: list[str | None],
+        job: JobInfo,
+    ) -> None:
+        # 工作线程不继承调用方的 contextvars，作业信息显式传入
+        # 调度器是推理路径上唯一的同步点。models 是加载时的快照，unload 只替换
+        # self._models，在途推理持有的引用在本块结束后才释放，因此无需再加锁
+        pages = deque(batch)
+        pages_lock = threading.Lock()
+
+        def next_page() -> "_BatchItem | None":
+            with pages_lock:
+                return pages.popleft() if pages else None
+
+        def infer_in_extra_slot(model_index: int) -> None:
+            # 块内的其他页面各自在同一副本上占用调度名额，与其他块、其他文档一起排队，
+            # 每个副本同时推理的页数因此不超过 max_inflight_per_device
+            while pages:
+                with models.scheduler.acquire(model_index, job):
+                    item = next_page()
+                    if item is None:
+                        return
+                    self._infer_item(
+                        models.tokenizer, models.llms[model_index], item, output_path, context, results, job,
+                    )
+
+        workers = min(len(batch), self.max_inflight_per_device)
+        futures: list[Future[None]] = []
+        device_number: int | None = None
+        try:
+            with ThreadPoolExecutor(max_workers=workers - 1) if workers > 1 else nullcontext() as pool:
+                wait_started_at = time.perf_counter()
+                with models.scheduler.acquire(requested_index, job) as model_index:
+                    device_number = models.device_numbers[model_index]
+                    if self._metrics is not None:
+                        self._metrics.record_lock_wait(
+                            time.perf_counter() - wait_started_at, device_number, job.priority.name.lower(),
+                        )
+                    if pool is not None:
+                        futures = [pool.submit(infer_in_extra_slot, model_index) for _ in range(workers - 1)]
+                    # 当前线程用块的名额处理页面，不再等待名额，保证块总能推进
+                    while (item := next_page()) is not None:
+                        self._infer_item(
+                            models.tokenizer, models.llms[model_index], item, output_path, context, results, job,
+                        )
+                # 先释放块的名额再等待其他页面：它们可能正在排队等待同一副本的名额
+                for future in futures:
+                    future.result()
+        finally:
+            if self._metrics is not None and device_number is not None:
+                self._record_peak_memory(device_number)
+
+    def _infer_item(
+        self,
+        tokenizer: AutoTokenizer,
+        llm_model: AutoModel,
+        item: "_BatchItem",
+        output_path: Path,
+        context: ExtractionContext | None,
+        results: list[str | None],
+        job: JobInfo,
+    ) -> None:
+        # 排队中的页面在开始推理前响应中断，不必等到生成第一个 token
+        if context is not None and context.check_aborted():
+            raise AbortError()
+        # 作业的输出预算已用尽：与 pdf_craft 的 max_output_tokens 一样以 TokenLimitError 中断
+        if job.budget is not None and job.budget.remaining <= 0:
+            error = TokenLimitError()
+            if context is not None:
+                error.input_tokens, error.output_tokens = context.input_tokens, context.output_tokens
+            raise error
+
+        # 每个页面使用独立的 context，避免并发推理同时修改共享计数
+        item_context: ExtractionContext | None = None
+        if context is not None:
+            with self._context_lock:
+                item_context = ExtractionContext(
+                    check_aborted=context.check_aborted,
+                    max_tokens=context.max_tokens,
+                    max_output_tokens=context.max_output_tokens,
+                    input_tokens=context.input_tokens,
+                    output_tokens=context.output_tokens,
                 )
-            return text_result
+        start_input_tokens = item_context.input_tokens if item_context is not None else 0
+        start_output_tokens = item_context.output_tokens if item_context is not None else 0
 
-    def _ensure_models(self) -> _Models:
-        check_env()
+        temp_image_path: Path | None = None
+        if isinstance(item.image, (str, Path)):
+            image_path = Path(item.image)
+        else:
+            # BMP 不压缩，写入内存文件系统几乎只是一次拷贝
+            image_path = temp_image_path = self._get_scratch_dir() / f"{uuid.uuid4().hex}.bmp"
+            _to_pil_image(item.image).save(image_path, format="BMP")
+
+        debug = self._debug_output_path is not None
+        if debug:
+            output_path = self._next_debug_output_path()
+
+        try:
+            size, config = item.size, item.config
+            drafting = item.draft is not None
+            if drafting:
+                size, config = item.draft, _SIZE_CONFIGS[cast(DeepSeekOCRSize, item.draft)]
+            escalations = 0
+            while True:
+                guard = self._decode_guard(job)
+                recorder = TokenLogProbs() if drafting else None
+                attempt_input_tokens = item_context.input_tokens if item_context is not None else 0
+                attempt_output_tokens = item_context.output_tokens if item_context is not None else 0
+                with InferWithInterruption(llm_model, item_context) as infer, \
+                        guard.active() if guard is not None else nullcontext(), \
+                        recorder.active() if recorder is not None else nullcontext():
+                    text_result = infer(
+                        tokenizer,
+                        prompt=item.prompt,
+                        image_file=str(image_path),
+                        output_path=str(output_path),
+                        base_size=config.base_size,
+                        image_size=config.image_size,
+                        crop_mode=config.crop_mode,
+                        save_results=debug,
+                        test_compress=debug,
+                        eval_mode=True,
+                    )
+                if guard is not None:
+                    self._finish_guard(guard, job)
+                if recorder is not None:
+                    drafting = False
+                    if guard is None or guard.truncation is None:
+                        self._cache_result(
+                            item.draft_cache_key, text_result,
+                            item_context.input_tokens - attempt_input_tokens if item_context is not None else 0,
+                            item_context.output_tokens - attempt_output_tokens if item_context is not None else 0,
+                        )
+                    if self._accept_draft(item, text_result, recorder, guard, job):
+                        break
+                    size, config = item.size, item.config
+                    continue
+                # 自动尺寸：结果疑似退化时换更大一档重试
+                if item.features is None or size is None or escalations >= self._max_auto_escalations:
+                    break
+                next_size = escalate(size)
+                if next_size is None or not looks_degenerate(text_result, item.features):
+                    break
+                # 文档预算已用尽：保留当前结果，不再重试
+                if job.budget is not None and job.budget.remaining <= 0:
+                    break
+                size, config = cast(DeepSeekOCRSize, next_size), _SIZE_CONFIGS[next_size]
+                escalations += 1
+        finally:
+            if temp_image_path is not None:
+                temp_image_path.unlink(missing_ok=True)
+            if context is not None and item_context is not None:
+                with self._context_lock:
+                    context.input_tokens += item_context.input_tokens - start_input_tokens
+                    context.output_tokens += item_context.output_tokens - start_output_tokens
+
+        results[item.index] = text_result
+        # 截断的结果取决于本次的上限与预算，不写入缓存
+        if guard is None or guard.truncation is None:
+            self._cache_result(
+                item.cache_key, text_result,
+                item_context.input_tokens - start_input_tokens if item_context is not None else 0,
+                item_context.output_tokens - start_output_tokens if item_context is not None else 0,
+            )
+
+    def _cache_result(self, cache_key: str | None, text: str, input_tokens: int, output_tokens: int) -> None:
+        if self._ocr_cache is not None and cache_key is not None:
+            self._ocr_cache.put(cache_key, CachedResult(text=text, input_tokens=input_tokens, output_tokens=output_tokens))
+
+    def _accept_draft(
+        self,
+        item: "_BatchItem",
+        text: str,
+        recorder: TokenLogProbs,
+        guard: DecodeGuard | None,
+        job: JobInfo,
+    ) -> bool:
+        """草稿结果的置信度达到 min_confidence 时接受；文档预算已用尽时也不再重新识别"""
+        assert item.draft is not None and item.size is not None
+        features = item.features or analyse_page(_open_page_image(item.image))
+        score = score_page(text, recorder.values(), features).score
+        if guard is not None and guard.truncation == TRUNCATED_REPETITION:
+            # 重复循环已被裁剪，文本本身看不出退化
+            score = 0.0
+        accepted = score >= self._min_confidence or (job.budget is not None and job.budget.remaining <= 0)
+        if self._metrics is not None:
+            self._metrics.record_draft_page(job.document, score, item.draft, item.size, escalated=not accepted)
+        return accepted
+
+    def _decode_guard(self, job: JobInfo) -> DecodeGuard | None:
+        """本页的解码上限：单页上限与文档剩余预算中较小者；没有任何限制时为 None"""
+        max_new_tokens = self._max_new_tokens
+        limited_by_budget = False
+        if job.budget is not None:
+            # 同一作业的页面并发推理时，预算可能在检查之后才被用尽
+            remaining = max(1, job.budget.remaining)
+            if max_new_tokens is None or remaining < max_new_tokens:
+                max_new_tokens, limited_by_budget = remaining, True
+        if max_new_tokens is None and self._repetition_stop is None:
+            return None
+        return DecodeGuard(max_new_tokens, self._repetition_stop, limited_by_budget)
+
+    def _finish_guard(self, guard: DecodeGuard, job: JobInfo) -> None:
+        if job.budget is not None:
+            job.budget.consume(guard.output_tokens, truncated=guard.truncation == TRUNCATED_BUDGET)
+        if guard.truncation is not None and self._metrics is not None:
+            self._metrics.record_truncated_page(job.document, guard.truncation, guard.output_tokens)
+
+    def _record_peak_memory(self, device_number: int) -> None:
         import torch
 
-        with self._rwlock.gen_rlock():
-            if self._models is not None:
-                return self._models
+        assert self._metrics is not None
+        if device_number != cpu_backend.CPU_DEVICE_NUMBER and torch.cuda.is_available():
+            self._metrics.record_device_memory(device_number, torch.cuda.max_memory_allocated(device_number))
+
+    def _get_scratch_dir(self) -> Path:
+        with self._context_lock:
+            if self._scratch_dir is None:
+                self._scratch_dir = tempfile.TemporaryDirectory(prefix="pdf-craftq-", dir=_RAM_TEMP_DIR)
+            return Path(self._scratch_dir.name)
+
+    def _next_debug_output_path(self) -> Path:
+        assert self._debug_output_path is not None
+        with self._context_lock:
+            self._debug_page_counter += 1
+            page_number = self._debug_page_counter
+        output_path = self._debug_output_path / f"page-{page_number:05d}"
+        output_path.mkdir(parents=True, exist_ok=True)
+        return output_path
+
+    def _cache_key(
+        self,
+        prompt: str,
+        image: PageImage,
+        config: _SizeConfig,
+        auto: bool = False,
+        draft: DeepSeekOCRSize | None = None,
+    ) -> str:
+        revision = self._resolve_model_revision()
+        # 版本未知时调用方不使用缓存
+        assert self._ocr_cache is not None and revision is not None
+        parts: list[object] = [
+            self._model_name,
+            revision,
+            _image_digest(image),
+            prompt,
+            config.base_size,
+            config.image_size,
+            config.crop_mode,
+        ]
+        if self._device == "cpu":
+            # 不同计算精度（含动态 int8 量化）的输出不同；GPU 只有 4-bit 权重一种，键保持不变
+            parts.extend((self._device, self._cpu_dtype))
+        if auto:
+            # 自动尺寸的结果可能来自升级重试，与直接指定该尺寸的结果分开缓存
+            parts.append(AUTO_SIZE)
+        if draft is not None:
+            # 推测式识别的结果可能是草稿，取决于草稿尺寸与置信度阈值
+            parts.extend(("draft", draft, self._min_confidence))
+        return self._ocr_cache.make_key(*parts)
+
+    def _resolve_model_revision(self) -> str | None:
+        """模型快照的 commit hash（快照目录名）；本地还没有快照时为 None"""
+        if self._model_revision is None:
+            pretrained_path = self._find_pretrained_path()
+            if pretrained_path is not None:
+                self._model_revision = Path(pretrained_path).name
+            elif self._materialized_path is not None:
+                # 缓存中没有快照时 _prepare_materialized 沿用已有的物化目录
+                current = materialized_revision(self._materialized_path)
+                if current is not None and self._revision in (None, current):
+                    self._model_revision = current
+        return self._model_revision
 
-        with self._rwlock.gen_wlock():
+    def _ensure_models(self) -> _Models:
+        # 快速路径：引用赋值是原子的，已加载时不做环境检查、不取锁
+        models = self._models
+        if models is not None:
+            return models
+
+        with self._load_lock:
             if self._models is not None:
                 return self._models
 
-            device_number_to_index = self._get_device_number_to_index()
-            if len(device_number_to_index) == 0:
-                raise RuntimeError("No CUDA devices available")
+            import torch
+
+            cpu_plan = self._cpu_plan
+            if cpu_plan is not None:
+                replica_devices = [cpu_backend.CPU_DEVICE_NUMBER]
+            else:
+                check_env()
+                device_number_to_index = self._get_device_number_to_index()
+                if len(device_number_to_index) == 0:
+                    raise RuntimeError("No CUDA devices available (use device=\"cpu\" to run on the CPU)")
+                replica_devices = [
+                    device_number
+                    for device_number, model_index in enumerate(device_number_to_index)
+                    if model_index is not None
+                ]
+
+            load_started_at = time.perf_counter()
 
             name_or_path = self._model_name
             cache_dir: str | None = None
+            local_files_only = self._local_only
 
-            if self._local_only:
-                name_or_path = self._find_pretrained_path()
-                if name_or_path is None:
-                    raise ValueError(
-                        f"Local model not found at {self._model_path}. "
-                        f"Expected Hugging Face cache structure: "
-                        f"{self._model_path}/models--{self._model_name.replace('/', '--')}/snapshots/[hash]/. "
-                        f"Please run download_models() first to download the model."
-                    )
-            else:
+            pretrained_path: str | None = None
+            if self._local_only or self._revision is not None:
+                pretrained_path = self._find_pretrained_path()
+            if self._materialized_path is not None:
+                pretrained_path = self._prepare_materialized() or pretrained_path
+            if pretrained_path is not None:
+                # 本地已有对应快照：直接从快照目录加载，不访问 Hub
+                name_or_path = pretrained_path
+                local_files_only = True
+            elif self._local_only:
+                raise ValueError(
+                    f"Local model not found at {self._model_path}. "
+                    f"Expected Hugging Face cache structure: "
+                    f"{self._model_path}/models--{self._model_name.replace('/', '--')}/snapshots/[hash]/. "
+                    f"Please run download_models() first to download the model."
+                )
+            hub_revision: str | None = None
+            if name_or_path == self._model_name:
                 cache_dir = self._cache_dir()
+                hub_revision = self._revision
 
-            print(f"[QuantizedModel] 加载量化模型: {name_or_path}")
+            print(f"[QuantizedModel] 加载{'全精度' if cpu_plan is not None else '量化'}模型: {name_or_path}")
             print(f"[QuantizedModel] 缓存目录: {cache_dir}")
 
             # 量化模型已经是 4-bit，直接加载即可
@@ -186,47 +835,134 @@ class QuantizedDeepSeekOCRModel:
                 pretrained_model_name_or_path=name_or_path,
                 trust_remote_code=True,
                 cache_dir=cache_dir,
-                local_files_only=self._local_only,
+                local_files_only=local_files_only,
+                revision=hub_revision,
             )
 
             llm_models: list[AutoModel] = []
-            for device_number, model_index in enumerate(device_number_to_index):
-                if model_index is None:
-                    continue
+            device_numbers: list[int] = []
+            # 各副本共享同一份内存映射的权重，分片只读取一次
+            with SharedCheckpoint().patch_transformers():
+                for device_number in replica_devices:
+                    if cpu_plan is not None:
+                        print(
+                            f"[QuantizedModel] 加载模型到 CPU ({self._cpu_dtype}, "
+                            f"{cpu_plan.workers} 页并发 × {cpu_plan.threads_per_worker} 线程)..."
+                        )
+                        model = AutoModel.from_pretrained(
+                            pretrained_model_name_or_path=name_or_path,
+                            trust_remote_code=True,
+                            use_safetensors=True,
+                            cache_dir=cache_dir,
+                            local_files_only=local_files_only,
+                            revision=hub_revision,
+                            **cpu_backend.load_options(self._cpu_dtype),
+                        )
+                        model = cpu_backend.prepare_model(model, self._cpu_dtype, cpu_plan.threads_per_worker)
+                        # infer 中的 .cuda() 留在 CPU 上，模型释放后撤销
+                        restore_cuda = cpu_backend.redirect_cuda_to_cpu(cpu_backend.compute_dtype(self._cpu_dtype))
+                        llm_models.append(record_generate(guard_generate(preprocess_model(model))))
+                        device_numbers.append(device_number)
+                        continue
 
-                print(f"[QuantizedModel] 加载模型到 GPU {device_number}...")
-
-                # 加载预量化的模型
-                model = AutoModel.from_pretrained(
-                    pretrained_model_name_or_path=name_or_path,
-                    _attn_implementation=_ATTN_IMPLEMENTATION,
-                    trust_remote_code=True,
-                    use_safetensors=True,
-                    cache_dir=cache_dir,
-                    local_files_only=self._local_only,
-                    device_map={"": device_number},  # 量化模型使用 device_map
-                    torch_dtype=torch.bfloat16,
-                )
+                    print(f"[QuantizedModel] 加载模型到 GPU {device_number}...")
 
-                llm_models.append(preprocess_model(model))
+                    # 加载预量化的模型
+                    model = AutoModel.from_pretrained(
+                        pretrained_model_name_or_path=name_or_path,
+                        _attn_implementation=_ATTN_IMPLEMENTATION,
+                        trust_remote_code=True,
+                        use_safetensors=True,
+                        cache_dir=cache_dir,
+                        local_files_only=local_files_only,
+                        revision=hub_revision,
+                        device_map={"": device_number},  # 量化模型使用 device_map
+                        torch_dtype=torch.bfloat16,
+                    )
 
-                # 打印显存使用
-                if torch.cuda.is_available():
-                    allocated = torch.cuda.memory_allocated(device_number) / 1024**3
-                    print(f"[QuantizedModel] GPU {device_number} 显存占用: {allocated:.2f} GB")
+                    llm_models.append(record_generate(guard_generate(preprocess_model(model))))
+                    device_numbers.append(device_number)
+
+                    # 打印显存使用
+                    if torch.cuda.is_available():
+                        allocated = torch.cuda.memory_allocated(device_number)
+                        print(f"[QuantizedModel] GPU {device_number} 显存占用: {allocated / 1024**3:.2f} GB")
+                        if self._metrics is not None:
+                            self._metrics.record_device_memory(device_number, allocated)
+
+            if self._metrics is not None:
+                self._metrics.record_stage("model_load", time.perf_counter() - load_started_at)
 
             self._models = _Models(
                 tokenizer=tokenizer,
                 llms=llm_models,
+                device_numbers=device_numbers,
+                scheduler=ReplicaScheduler(
+                    replica_count=len(llm_models),
+                    max_inflight=self.max_inflight_per_device,
+                    monitor=self._queue_monitor,
+                ),
+                device_indexes={number: index for index, number in enumerate(device_numbers)},
+                cpu=cpu_plan is not None,
             )
-            return self._models
+            models = self._models
+            if cpu_plan is not None:
+                # 在途推理持有的快照引用释放后才撤销 Tensor.cuda 的重定向
+                weakref.finalize(models, restore_cuda)
+            # 从 Hub 加载时快照刚下载到缓存中，此时才能确定缓存键中的版本
+            self._resolve_model_revision()
+
+        # 在加载锁之外通知驻留管理，避免与卸载路径的锁顺序相反
+        if self._residency is not None:
+            self._residency.record_load()
+        return models
+
+    def _release_models(self) -> None:
+        with self._load_lock:
+            if self._models is None:
+                return
+            self._models = None
+
+        # 显式归还缓存分配器持有的显存（对所有设备生效）；
+        # 在途推理持有的快照引用要等其结束才会释放
+        gc.collect()
+        import torch
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
+
+    def _prepare_materialized(self) -> str | None:
+        """物化目录可用时返回其路径；缓存中的快照更新后重新物化"""
+        assert self._materialized_path is not None
+        target = self._materialized_path
+        current = materialized_revision(target)
+        pretrained_path = self._find_pretrained_path()
+        if pretrained_path is None:
+            # 缓存中没有快照（例如离线机器）：沿用已有的物化目录
+            if current is not None and self._revision in (None, current):
+                return str(target)
+            return None
+
+        revision = Path(pretrained_path).name
+        if current != revision:
+            print(f"[QuantizedModel] 物化模型快照: {pretrained_path} -> {target}")
+            materialize_snapshot(Path(pretrained_path), target, revision)
+        return str(target)
 
     def _cache_dir(self) -> str | None:
         if self._model_path is not None:
             return str(self._model_path)
         return None
 
-    def _find_pretrained_path(self) -> str | None:
+    def _find_pretrained_path(self, revision: str | None = None) -> str | None:
+        snapshot_index = self._snapshot_index()
+        if snapshot_index is None:
+            return None
+        snapshot = snapshot_index.resolve(revision or self._revision)
+        if snapshot is None:
+            return None
+        return str(snapshot.path)
+
+    def _snapshot_index(self) -> SnapshotIndex | None:
         # 获取缓存基础目录
         if self._model_path is not None:
             base_cache_dir = self._model_path
@@ -239,22 +975,7 @@ class QuantizedDeepSeekOCRModel:
         cache_model_dir = base_cache_dir / f"models--{self._model_name.replace('/', '--')}"
         if not cache_model_dir.exists():
             return None
-
-        ref_file = cache_model_dir / "refs" / "main"
-        if ref_file.exists() and ref_file.is_file():
-            snapshot_hash = ref_file.read_text().strip()
-            snapshot_path = cache_model_dir / "snapshots" / snapshot_hash
-            if snapshot_path.exists() and snapshot_path.is_dir():
-                return str(snapshot_path)
-
-        snapshots_dir = cache_model_dir / "snapshots"
-        if not snapshots_dir.exists():
-            return None
-        snapshot_dirs = [d for d in snapshots_dir.iterdir() if d.is_dir()]
-        if not snapshot_dirs:
-            return None
-        latest_snapshot = max(snapshot_dirs, key=lambda d: d.stat().st_mtime)
-        return str(latest_snapshot)
+        return SnapshotIndex(cache_model_dir)
 
     def _get_device_number_to_index(self) -> list[int | None]:
         if self._device_number_to_index is None:
@@ -286,14 +1007,16 @@ class QuantizedDeepSeekOCRModel:
         return self._device_number_to_index
 
 
-def apply_quantized_model_patch(quiet: bool = False):
+def apply_quantized_model_patch(quiet: bool = False, **model_options):
     """
     应用 monkey-patch，将 doc_page_extractor 中的原始模型类替换为量化版本
 
-    必须在导入 pdf_craft 之前调用此函数
+    必须在导入 pdf_craft 之前调用此函数；可重复调用以更新模型选项
 
     Args:
         quiet: 如果为 True，则不输出 patch 信息
+        **model_options: 传给 QuantizedDeepSeekOCRModel 构造函数的额外选项，
+            例如 ocr_cache=OCRCache(...)、metrics=MetricsCollector(...)
     """
     from doc_page_extractor import model as dpe_model
     from doc_page_extractor import extractor as dpe_extractor
@@ -302,11 +1025,16 @@ def apply_quantized_model_patch(quiet: bool = False):
         print("[Patch] 应用量化模型 monkey-patch...")
         print(f"[Patch] 原始模型类: {dpe_model.DeepSeekOCRHugginfaceModel}")
 
+    model_factory = QuantizedDeepSeekOCRModel
+    if model_options:
+        # pdf_craft 只传入 model_path/local_only/enable_devices_numbers，其余选项在此绑定
+        model_factory = partial(QuantizedDeepSeekOCRModel, **model_options)
+
     # 替换 model 模块中的类
-    dpe_model.DeepSeekOCRHugginfaceModel = QuantizedDeepSeekOCRModel
+    dpe_model.DeepSeekOCRHugginfaceModel = model_factory
 
     # 关键：同时替换 extractor 模块中已导入的引用
-    dpe_extractor.DeepSeekOCRHugginfaceModel = QuantizedDeepSeekOCRModel
+    dpe_extractor.DeepSeekOCRHugginfaceModel = model_factory
 
     if not quiet:
         print(f"[Patch] 替换为: {dpe_model.DeepSeekOCRHugginfaceModel}")
@@ -0,0 +1,221 @@
+"""
+模型驻留管理
+
+共享 GPU 的部署中，空闲的转换进程不应一直占用显存。ResidencyManager 跟踪模型的
+在途请求与最近一次使用时间：空闲超过 idle_timeout，或内存压力回调触发时卸载模型，
+下一次 generate 时再透明地重新加载。卸载只在没有在途请求时进行；压力触发时若仍有
+请求在运行，则在最后一个请求结束时卸载。
+
+策略本身只依赖注入的时钟与卸载函数，可以用假时钟和假模型做单元测试；
+后台线程只是定期调用 poll()。
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from enum import Enum, auto
+from typing import Callable, Generator
+
+
+class ResidencyEventKind(Enum):
+    LOAD = auto()
+    UNLOAD = auto()
+
+
+@dataclass(frozen=True)
+class ResidencyEvent:
+    kind: ResidencyEventKind
+    # 卸载原因："idle"、"pressure" 或 "manual"；加载时为 "demand"
+    reason: str
+    # 卸载事件记录本次驻留的时长（秒），加载事件为 None
+    resident_seconds: float | None
+    at: float
+
+
+@dataclass(frozen=True)
+class ResidencyStats:
+    resident: bool
+    loads: int
+    unloads: int
+    resident_seconds: float
+    idle_seconds: float
+
+
+class ResidencyManager:
+    """
+    按空闲时间与内存压力卸载模型
+
+    Args:
+        unload: 释放模型的函数，只在没有在途请求时调用
+        idle_timeout: 空闲多少秒后卸载，None 表示不按空闲卸载
+        pressure_check: 返回 True 表示内存紧张，由 poll() 定期调用
+        poll_interval: 后台线程调用 poll() 的间隔（秒）
+        clock: 单调时钟，默认 time.monotonic
+        on_event: 接收 ResidencyEvent 的回调
+    """
+
+    def __init__(
+        self,
+        unload: Callable[[], None],
+        idle_timeout: float | None = None,
+        pressure_check: Callable[[], bool] | None = None,
+        poll_interval: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+        on_event: Callable[[ResidencyEvent], None] | None = None,
+    ) -> None:
+        self._unload = unload
+        self._idle_timeout = idle_timeout
+        self._pressure_check = pressure_check
+        self._poll_interval = poll_interval
+        self._clock = clock
+        self._on_event = on_event
+        self._lock = threading.Lock()
+        self._active = 0
+        self._loaded_at: float | None = None
+        self._last_used_at = clock()
+        self._unload_pending: str | None = None
+        self._loads = 0
+        self._unloads = 0
+        self._resident_seconds = 0.0
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+
+    @property
+    def resident(self) -> bool:
+        return self._loaded_at is not None
+
+    @contextmanager
+    def active(self) -> Generator[None, None, None]:
+        """包住一次使用模型的请求，期间不会卸载"""
+        with self._lock:
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._last_used_at = self._clock()
+                reason = self._unload_pending if self._active == 0 else None
+                if reason is not None:
+                    self._unload_locked(reason)
+
+    def record_load(self) -> None:
+        """模型完成加载时由模型调用"""
+        with self._lock:
+            if self._loaded_at is not None:
+                return
+            now = self._clock()
+            self._loaded_at = now
+            self._last_used_at = now
+            self._loads += 1
+            self._emit(ResidencyEvent(ResidencyEventKind.LOAD, "demand", None, now))
+        self._ensure_thread()
+
+    def poll(self) -> bool:
+        """检查空闲超时与内存压力，卸载时返回 True"""
+        reason: str | None = None
+        if self._pressure_check is not None and self.resident and self._pressure_check():
+            reason = "pressure"
+        with self._lock:
+            if self._loaded_at is None:
+                return False
+            if reason is None and self._idle_timeout is not None and self._active == 0:
+                if self._clock() - self._last_used_at >= self._idle_timeout:
+                    reason = "idle"
+            if reason is None:
+                return False
+            if self._active > 0:
+                # 有请求在运行：等最后一个请求结束再卸载
+                self._unload_pending = reason
+                return False
+            self._unload_locked(reason)
+            return True
+
+    def memory_pressure(self) -> bool:
+        """外部内存压力通知：立即卸载，或在在途请求结束后卸载"""
+        with self._lock:
+            if self._loaded_at is None:
+                return False
+            if self._active > 0:
+                self._unload_pending = "pressure"
+                return False
+            self._unload_locked("pressure")
+            return True
+
+    def unload(self) -> None:
+        """立即卸载（若有在途请求则在其结束后卸载）"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            if self._active > 0:
+                self._unload_pending = "manual"
+                return
+            self._unload_locked("manual")
+
+    def stats(self) -> ResidencyStats:
+        with self._lock:
+            now = self._clock()
+            resident_seconds = self._resident_seconds
+            if self._loaded_at is not None:
+                resident_seconds += now - self._loaded_at
+            return ResidencyStats(
+                resident=self._loaded_at is not None,
+                loads=self._loads,
+                unloads=self._unloads,
+                resident_seconds=resident_seconds,
+                idle_seconds=0.0 if self._active else now - self._last_used_at,
+            )
+
+    def close(self) -> None:
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+            self._thread = None
+
+    def _unload_locked(self, reason: str) -> None:
+        # 调用者持有 self._lock；在途计数为 0，卸载不会与推理交错
+        assert self._loaded_at is not None
+        self._unload()
+        now = self._clock()
+        resident_seconds = now - self._loaded_at
+        self._resident_seconds += resident_seconds
+        self._loaded_at = None
+        self._unload_pending = None
+        self._unloads += 1
+        self._emit(ResidencyEvent(ResidencyEventKind.UNLOAD, reason, resident_seconds, now))
+
+    def _emit(self, event: ResidencyEvent) -> None:
+        if self._on_event is not None:
+            self._on_event(event)
+
+    def _ensure_thread(self) -> None:
+        if self._idle_timeout is None and self._pressure_check is None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="model-residency", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._poll_interval):
+            self.poll()
+
+
+def device_memory_pressure(min_free_fraction: float) -> Callable[[], bool]:
+    """任一 GPU 的空闲显存低于总量的 min_free_fraction 时返回 True 的压力检查"""
+
+    def check() -> bool:
+        import torch
+
+        if not torch.cuda.is_available():
+            return False
+        for device_number in range(torch.cuda.device_count()):
+            free, total = torch.cuda.mem_get_info(device_number)
+            if free < total * min_free_fraction:
+                return True
+        return False
+
+    return check
@@ -0,0 +1,392 @@
+"""
+多 GPU 副本调度
+
+_ensure_models 为每个启用的设备加载一个模型副本。ReplicaScheduler 记录每个副本的
+在途请求数，把未指定设备的 generate 调用分派给最空闲的副本；所有副本都满载时，
+调用方排队等待。调度逻辑不依赖 torch，可用假副本和假时钟在 CPU 上测试。
+
+多个文档共享一个模型时，排队顺序由调用方所在的作业决定（见 job()）：
+- 优先级：INTERACTIVE 先于 NORMAL，NORMAL 先于 BULK
+- 截止时间：同一优先级内截止时间早的先服务；已超过截止时间的请求提升到最高优先级
+- 公平共享：同一优先级内，已获得服务最少的文档先服务，长文档不会饿死短文档；
+  新加入的文档从当前活跃文档的最小服务量起算，不会凭空积累额度
+- 其余情况按到达顺序
+
+作业还可以携带输出 token 预算（TokenBudget），由该作业的所有页面共同消耗。
+"""
+
+import contextvars
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from enum import IntEnum
+from typing import Callable, Generator
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    NORMAL = 1
+    BULK = 2
+
+
+class TokenBudget:
+    """一个作业的输出 token 预算，可在多个线程之间共享"""
+
+    def __init__(self, max_output_tokens: int) -> None:
+        if max_output_tokens <= 0:
+            raise ValueError("max_output_tokens must be positive")
+        self._lock = threading.Lock()
+        self.max_output_tokens = max_output_tokens
+        self._used = 0
+        # 因预算被截断、尚未被取走的页数
+        self._truncated = 0
+
+    @property
+    def remaining(self) -> int:
+        with self._lock:
+            return max(0, self.max_output_tokens - self._used)
+
+    def consume(self, output_tokens: int, truncated: bool = False) -> None:
+        with self._lock:
+            self._used += output_tokens
+            if truncated:
+                self._truncated += 1
+
+    def take_truncated(self) -> bool:
+        """自上次调用以来是否有页面因预算被截断，并清除该标记"""
+        with self._lock:
+            truncated, self._truncated = self._truncated > 0, 0
+            return truncated
+
+
+@dataclass(frozen=True)
+class JobInfo:
+    # 公平共享的单位，通常是 PDF 路径；None 的请求共享同一份额
+    document: str | None = None
+    priority: Priority = Priority.NORMAL
+    # 截止时间（time.monotonic 时刻），None 表示没有截止时间
+    deadline: float | None = None
+    # 输出 token 预算，None 表示不限制
+    budget: TokenBudget | None = field(default=None, compare=False)
+
+
+_current_job: contextvars.ContextVar[JobInfo] = contextvars.ContextVar("craftq_job", default=JobInfo())
+
+
+def current_job() -> JobInfo:
+    return _current_job.get()
+
+
+@contextmanager
+def job(
+    document: str | None = None,
+    priority: Priority | str | None = None,
+    timeout: float | None = None,
+    max_output_tokens: int | None = None,
+) -> Generator[JobInfo, None, None]:
+    """
+    设置当前线程（或 asyncio 任务）后续 generate 调用所属的作业
+
+    未指定的字段继承外层作业，例如服务端设置优先级与截止时间，转换函数再设置文档。
+
+    Args:
+        document: 文档标识
+        priority: Priority 或其名称（"interactive"、"normal"、"bulk"）
+        timeout: 从现在起多少秒内应完成，换算为截止时间
+        max_output_tokens: 本作业所有页面的输出 token 预算，每次进入时重新计数
+    """
+    info = current_job()
+    if document is not None:
+        info = replace(info, document=document)
+    if priority is not None:
+        info = replace(info, priority=parse_priority(priority))
+    if timeout is not None:
+        info = replace(info, deadline=time.monotonic() + timeout)
+    if max_output_tokens is not None:
+        info = replace(info, budget=TokenBudget(max_output_tokens))
+    token = _current_job.set(info)
+    try:
+        yield info
+    finally:
+        _current_job.reset(token)
+
+
+def parse_priority(priority: Priority | str) -> Priority:
+    if isinstance(priority, Priority):
+        return priority
+    try:
+        return Priority[priority.upper()]
+    except KeyError:
+        raise ValueError(f"Unknown priority {priority!r}") from None
+
+
+@dataclass
+class ReplicaStats:
+    index: int
+    inflight: int
+    dispatched: int
+
+
+@dataclass(frozen=True)
+class QueueStats:
+    priority: Priority
+    # 当前排队的请求数
+    waiting: int
+    # 累计获得副本的请求数
+    granted: int
+    wait_seconds_total: float
+    wait_seconds_max: float
+    # 获得副本时已超过截止时间的请求数
+    deadline_misses: int
+
+
+class QueueMonitor:
+    """
+    按优先级汇总队列深度与等待时间，可在多个调度器（例如重新加载后的模型）之间共享
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._waiting = {priority: 0 for priority in Priority}
+        self._granted = {priority: 0 for priority in Priority}
+        self._wait_total = {priority: 0.0 for priority in Priority}
+        self._wait_max = {priority: 0.0 for priority in Priority}
+        self._deadline_misses = {priority: 0 for priority in Priority}
+
+    def enqueued(self, priority: Priority) -> None:
+        with self._lock:
+            self._waiting[priority] += 1
+
+    def left(self, priority: Priority) -> None:
+        with self._lock:
+            self._waiting[priority] -= 1
+
+    def granted(self, priority: Priority, waited: float, missed_deadline: bool) -> None:
+        with self._lock:
+            self._waiting[priority] -= 1
+            self._granted[priority] += 1
+            self._wait_total[priority] += waited
+            self._wait_max[priority] = max(self._wait_max[priority], waited)
+            if missed_deadline:
+                self._deadline_misses[priority] += 1
+
+    def stats(self) -> list[QueueStats]:
+        with self._lock:
+            return [
+                QueueStats(
+                    priority=priority,
+                    waiting=self._waiting[priority],
+                    granted=self._granted[priority],
+                    wait_seconds_total=self._wait_total[priority],
+                    wait_seconds_max=self._wait_max[priority],
+                    deadline_misses=self._deadline_misses[priority],
+                )
+                for priority in Priority
+            ]
+
+    def report(self) -> dict:
+        """可直接 JSON 序列化的队列统计"""
+        return {
+            stats.priority.name.lower(): {
+                "waiting": stats.waiting,
+                "granted": stats.granted,
+                "wait_seconds_total": round(stats.wait_seconds_total, 3),
+                "wait_seconds_max": round(stats.wait_seconds_max, 3),
+                "deadline_misses": stats.deadline_misses,
+            }
+            for stats in self.stats()
+        }
+
+
+class _Waiter:
+    def __init__(self, replica_index: int | None, job: JobInfo, sequence: int, enqueued_at: float) -> None:
+        self.replica_index: int | None = replica_index
+        self.job = job
+        self.sequence = sequence
+        self.enqueued_at = enqueued_at
+
+
+class ReplicaScheduler:
+    """
+    按在途请求数调度模型副本
+
+    Args:
+        replica_count: 副本数量
+        max_inflight: 每个副本允许同时执行的请求数
+        monitor: 队列统计，默认每个调度器独立统计
+        clock: 单调时钟，与 JobInfo.deadline 使用同一时间基准
+    """
+
+    def __init__(
+        self,
+        replica_count: int,
+        max_inflight: int = 1,
+        monitor: QueueMonitor | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if replica_count <= 0:
+            raise ValueError("replica_count must be positive")
+        if max_inflight <= 0:
+            raise ValueError("max_inflight must be positive")
+
+        self._max_inflight = max_inflight
+        self._inflight: list[int] = [0] * replica_count
+        self._dispatched: list[int] = [0] * replica_count
+        self._waiters: list[_Waiter] = []
+        self._condition = threading.Condition()
+        self._monitor = monitor or QueueMonitor()
+        self._clock = clock
+        self._sequence = itertools.count()
+        # 排队顺序基于同一个时刻计算，所有等待者看到一致的顺序；时钟只在入队、
+        # 释放副本和截止时间到达时推进
+        self._now = clock()
+        # 各文档已获得的服务量（获得副本的次数），只保留有在途或排队请求的文档
+        self._service: dict[str | None, int] = {}
+        self._document_active: dict[str | None, int] = {}
+
+    @property
+    def monitor(self) -> QueueMonitor:
+        return self._monitor
+
+    @property
+    def replica_count(self) -> int:
+        return len(self._inflight)
+
+    @contextmanager
+    def acquire(self, replica_index: int | None = None, job: JobInfo | None = None) -> Generator[int, None, None]:
+        """
+        占用一个副本，退出上下文时释放
+
+        Args:
+            replica_index: 指定副本；为 None 时选择在途请求最少的副本
+            job: 请求所属的作业，默认取 current_job()
+        """
+        if replica_index is not None and not 0 <= replica_index < self.replica_count:
+            raise ValueError(f"Invalid replica index {replica_index}")
+
+        job = job or current_job()
+        with self._condition:
+            self._now = self._clock()
+            waiter = _Waiter(replica_index, job, next(self._sequence), self._now)
+            self._join_document(job.document)
+        try:
+            index = self._wait_for_replica(waiter)
+        except BaseException:
+            with self._condition:
+                self._leave_document(job.document)
+            raise
+        try:
+            yield index
+        finally:
+            with self._condition:
+                self._inflight[index] -= 1
+                self._leave_document(job.document)
+                self._now = self._clock()
+                self._condition.notify_all()
+
+    def queue_depth(self) -> int:
+        with self._condition:
+            return len(self._waiters)
+
+    def stats(self) -> list[ReplicaStats]:
+        with self._condition:
+            return [
+                ReplicaStats(index=i, inflight=inflight, dispatched=dispatched)
+                for i, (inflight, dispatched) in enumerate(zip(self._inflight, self._dispatched))
+            ]
+
+    def _wait_for_replica(self, waiter: _Waiter) -> int:
+        priority = waiter.job.priority
+        self._monitor.enqueued(priority)
+        granted = False
+        with self._condition:
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    index = self._grant(waiter)
+                    if index is not None:
+                        self._inflight[index] += 1
+                        self._dispatched[index] += 1
+                        self._service[waiter.job.document] += 1
+                        granted = True
+                        deadline = waiter.job.deadline
+                        self._monitor.granted(
+                            priority,
+                            waited=self._clock() - waiter.enqueued_at,
+                            missed_deadline=deadline is not None and self._now > deadline,
+                        )
+                        return index
+                    timeout = self._next_deadline_in()
+                    if not self._condition.wait(timeout) and timeout is not None:
+                        # 有等待者的截止时间已到，排队顺序可能改变
+                        self._now = self._clock()
+                        self._condition.notify_all()
+            finally:
+                self._waiters.remove(waiter)
+                if not granted:
+                    self._monitor.left(priority)
+                # 队首变化后，排在后面的等待者可能已可被服务
+                self._condition.notify_all()
+
+    def _join_document(self, document: str | None) -> None:
+        active = self._document_active.get(document, 0)
+        if active == 0:
+            # 新加入（或重新加入）的文档从活跃文档的最小服务量起算
+            floor = min((self._service[d] for d, n in self._document_active.items() if n > 0), default=0)
+            self._service[document] = max(self._service.get(document, 0), floor)
+        self._document_active[document] = active + 1
+
+    def _leave_document(self, document: str | None) -> None:
+        active = self._document_active[document] - 1
+        if active == 0:
+            del self._document_active[document]
+            del self._service[document]
+        else:
+            self._document_active[document] = active
+
+    def _order_key(self, waiter: _Waiter) -> tuple:
+        job = waiter.job
+        deadline = job.deadline if job.deadline is not None else math.inf
+        priority = Priority.INTERACTIVE if deadline <= self._now else job.priority
+        return (priority, deadline, self._service[job.document], waiter.sequence)
+
+    def _next_deadline_in(self) -> float | None:
+        upcoming = [
+            w.job.deadline for w in self._waiters
+            if w.job.deadline is not None and w.job.deadline > self._now
+        ]
+        if not upcoming:
+            return None
+        return max(0.0, min(upcoming) - self._clock())
+
+    def _grant(self, waiter: _Waiter) -> int | None:
+        # 按调度顺序模拟分配：排在前面且能被服务的等待者先占用副本
+        inflight = list(self._inflight)
+        for queued in sorted(self._waiters, key=self._order_key):
+            index = self._pick_replica(queued.replica_index, inflight)
+            if index is None:
+                continue
+            if queued is waiter:
+                return index
+            inflight[index] += 1
+        return None
+
+    def _pick_replica(self, replica_index: int | None, inflight: list[int]) -> int | None:
+        if replica_index is not None:
+            candidates = [replica_index]
+        else:
+            candidates = range(self.replica_count)
+
+        best: int | None = None
+        for index in candidates:
+            if inflight[index] >= self._max_inflight:
+                continue
+            if best is None or (inflight[index], self._dispatched[index]) < (
+                inflight[best],
+                self._dispatched[best],
+            ):
+                best = index
+        return best
@@ -0,0 +1,424 @@
+"""
+PDF-CraftQ conversion server - keeps one quantized model resident between jobs
+
+Usage:
+    pdf-craftq serve --port 8765
+    pdf-craftq input.pdf -o output.md --server http://127.0.0.1:8765
+
+Endpoints (JSON over localhost HTTP):
+    GET  /status    model residency, load/unload counts, running jobs and queue statistics
+    POST /load      load the model now
+    POST /unload    drop the model and release device memory
+    POST /convert   run one conversion job, streaming progress as JSON lines
+
+The client half of this module only uses the standard library, so a thin
+client does not pay for torch/transformers imports or model initialisation.
+"""
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import urlsplit
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+
+JobEvent = dict[str, Any]
+
+
+class ModelBusyError(RuntimeError):
+    """Raised when the model cannot be unloaded because jobs are running."""
+
+
+class ConversionService:
+    """Owns the resident model and runs conversion jobs against it."""
+
+    def __init__(self, local_only: bool) -> None:
+        from scheduler import QueueMonitor
+
+        self._local_only = local_only
+        # Shared with the model so queue statistics survive unload/reload
+        self.queue_monitor = QueueMonitor()
+        self._lock = threading.Lock()
+        self._transform = None
+        self._active_jobs = 0
+        self._finished_jobs = 0
+        # Residency events arrive from inside model loads, which run under self._lock
+        self._residency_lock = threading.Lock()
+        self._residency: JobEvent = {'resident': False, 'loads': 0, 'unloads': 0, 'resident_seconds': 0.0}
+
+    def status(self) -> JobEvent:
+        with self._residency_lock:
+            residency = dict(self._residency)
+        with self._lock:
+            return {
+                'loaded': self._transform is not None,
+                'active_jobs': self._active_jobs,
+                'finished_jobs': self._finished_jobs,
+                'residency': residency,
+                'queue': self.queue_monitor.report(),
+            }
+
+    def on_residency_event(self, event) -> None:
+        """Track model replica load/unload events reported by the residency manager."""
+        from residency import ResidencyEventKind
+
+        with self._residency_lock:
+            if event.kind == ResidencyEventKind.LOAD:
+                self._residency['resident'] = True
+                self._residency['loads'] += 1
+            else:
+                self._residency['resident'] = False
+                self._residency['unloads'] += 1
+                self._residency['resident_seconds'] = round(
+                    self._residency['resident_seconds'] + event.resident_seconds, 3,
+                )
+        if event.kind != ResidencyEventKind.LOAD:
+            print(
+                f"Model unloaded ({event.reason}) after {event.resident_seconds:.1f}s resident",
+                file=sys.stderr,
+            )
+
+    def load(self) -> None:
+        with self._lock:
+            self._ensure_transform()
+
+    def unload(self) -> None:
+        with self._lock:
+            if self._active_jobs > 0:
+                raise ModelBusyError(f"{self._active_jobs} job(s) still running")
+            if self._transform is None:
+                return
+            model = _ocr_model(self._transform)
+            self._transform = None
+        if model is not None:
+            # The residency thread holds the model through its unload callback;
+            # release the weights now and stop the thread with the transform
+            model.unload()
+            if model.residency is not None:
+                model.residency.close()
+        _release_device_memory()
+
+    def convert(self, job: JobEvent, on_event: Callable[[JobEvent], None]) -> JobEvent:
+        """Run one job described with the same options as the CLI converters.
+
+        ``priority`` (interactive, normal or bulk) and ``deadline_seconds`` decide
+        where the job's pages queue when several jobs share the model;
+        ``max_document_tokens`` is the job's output token budget.
+        """
+        import cli
+        from scheduler import job as scheduler_job, parse_priority
+
+        pdf_path = Path(job['pdf_path'])
+        output_path = Path(job['output_path'])
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"Input file not found: {pdf_path}")
+        output_format = cli.get_output_format(output_path, job.get('format'))
+        priority = parse_priority(job.get('priority') or 'normal')
+
+        with self._lock:
+            transform = self._ensure_transform()
+            self._active_jobs += 1
+
+        def forward_event(event) -> None:
+            on_event({
+                'event': 'progress',
+                'kind': event.kind.name,
+                'page_index': event.page_index,
+                'total_pages': event.total_pages,
+                'cost_time_ms': event.cost_time_ms,
+            })
+
+        try:
+            with scheduler_job(
+                priority=priority,
+                timeout=job.get('deadline_seconds'),
+                max_output_tokens=job.get('max_document_tokens'),
+            ):
+                if output_format in ('markdown', 'md'):
+                    assets_path = job.get('assets_path')
+                    result = cli.convert_to_markdown(
+                        pdf_path=pdf_path,
+                        output_path=output_path,
+                        assets_path=Path(assets_path) if assets_path else None,
+                        ocr_size=job.get('ocr_size', 'base'),
+                        local_only=self._local_only,
+                        includes_footnotes=job.get('includes_footnotes', False),
+                        ignore_pdf_errors=job.get('ignore_pdf_errors', False),
+                        verbose=False,
+                        transform=transform,
+                        on_ocr_event=forward_event,
+                        checkpoint=True,
+                        resume=job.get('resume', False),
+                    )
+                elif output_format == 'epub':
+                    result = cli.convert_to_epub(
+                        pdf_path=pdf_path,
+                        output_path=output_path,
+                        ocr_size=job.get('ocr_size', 'base'),
+                        local_only=self._local_only,
+                        includes_cover=job.get('includes_cover', True),
+                        includes_footnotes=job.get('includes_footnotes', False),
+                        ignore_pdf_errors=job.get('ignore_pdf_errors', False),
+                        language=job.get('language', 'zh'),
+                        verbose=False,
+                        transform=transform,
+                        on_ocr_event=forward_event,
+                        checkpoint=True,
+                        resume=job.get('resume', False),
+                    )
+                else:
+                    raise ValueError(f"Unsupported output format: {output_format}")
+        finally:
+            with self._lock:
+                self._active_jobs -= 1
+                self._finished_jobs += 1
+
+        return {
+            'event': 'done',
+            'output_path': str(output_path),
+            'input_tokens': result.input_tokens,
+            'output_tokens': result.output_tokens,
+        }
+
+    def _ensure_transform(self):
+        # Caller holds self._lock
+        if self._transform is None:
+            import cli
+            transform = cli.create_transform(self._local_only)
+            transform.load_models()
+            self._transform = transform
+        return self._transform
+
+
+def _ocr_model(transform):
+    """The QuantizedDeepSeekOCRModel behind ``transform``, or None before it is created."""
+    # pdf_craft exposes no accessor for the model its page extractor wraps
+    extractor = getattr(transform._ocr._extractor, '_page_extractor', None)
+    return getattr(extractor, '_model', None)
+
+
+def _release_device_memory() -> None:
+    import gc
+    gc.collect()
+    try:
+        import torch
+    except ImportError:
+        return
+    if torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    server: "ConversionServer"
+
+    def do_GET(self) -> None:
+        if self.path == '/status':
+            self._send_json(200, self.server.service.status())
+        else:
+            self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+
+    def do_POST(self) -> None:
+        service = self.server.service
+        try:
+            if self.path == '/load':
+                service.load()
+                self._send_json(200, service.status())
+            elif self.path == '/unload':
+                service.unload()
+                self._send_json(200, service.status())
+            elif self.path == '/convert':
+                self._handle_convert(self._read_json())
+            else:
+                self._send_json(404, {'error': f"Unknown endpoint: {self.path}"})
+        except ModelBusyError as e:
+            self._send_json(409, {'error': str(e)})
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {'error': f"Invalid request: {e}"})
+        except Exception as e:
+            self._send_json(500, {'error': str(e)})
+
+    def _handle_convert(self, job: JobEvent) -> None:
+        if 'pdf_path' not in job or 'output_path' not in job:
+            raise ValueError("pdf_path and output_path are required")
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.end_headers()
+        try:
+            done = self.server.service.convert(job, self._write_line)
+        except Exception as e:
+            self._write_line({'event': 'error', 'message': str(e)})
+        else:
+            self._write_line(done)
+
+    def _read_json(self) -> JobEvent:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b'{}'
+        payload = json.loads(body.decode('utf-8'))
+        if not isinstance(payload, dict):
+            raise ValueError("request body must be a JSON object")
+        return payload
+
+    def _send_json(self, status: int, payload: JobEvent) -> None:
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_line(self, payload: JobEvent) -> None:
+        self.wfile.write(json.dumps(payload).encode('utf-8') + b'\n')
+        self.wfile.flush()
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], service: ConversionService, verbose: bool = False) -> None:
+        super().__init__(address, _RequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def request_conversion(
+    server_url: str,
+    job: JobEvent,
+    on_event: Callable[[JobEvent], None] = lambda _: None,
+) -> JobEvent:
+    """Submit a job to a running server; returns the final ``done`` event."""
+    connection = _connect(server_url)
+    try:
+        body = json.dumps(job).encode('utf-8')
+        connection.request('POST', '/convert', body=body, headers={'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        if response.status != 200:
+            raise RuntimeError(_error_message(response))
+
+        while True:
+            line = response.readline()
+            if not line:
+                raise RuntimeError("Server closed the connection before the job finished")
+            event = json.loads(line)
+            if event['event'] == 'done':
+                return event
+            if event['event'] == 'error':
+                raise RuntimeError(event['message'])
+            on_event(event)
+    finally:
+        connection.close()
+
+
+def request_model_action(server_url: str, action: str) -> JobEvent:
+    """Call ``status``, ``load`` or ``unload`` on a running server."""
+    connection = _connect(server_url)
+    try:
+        method = 'GET' if action == 'status' else 'POST'
+        connection.request(method, f"/{action}")
+        response = connection.getresponse()
+        if response.status != 200:
+            raise RuntimeError(_error_message(response))
+        return json.loads(response.read())
+    finally:
+        connection.close()
+
+
+def _connect(server_url: str) -> http.client.HTTPConnection:
+    parts = urlsplit(server_url if '://' in server_url else f"http://{server_url}")
+    return http.client.HTTPConnection(parts.hostname or DEFAULT_HOST, parts.port or DEFAULT_PORT)
+
+
+def _error_message(response: http.client.HTTPResponse) -> str:
+    try:
+        return json.loads(response.read())['error']
+    except (ValueError, KeyError):
+        return f"Server responded with HTTP {response.status}"
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='pdf-craftq serve',
+        description='Run a local conversion server that keeps the quantized model loaded',
+    )
+    parser.add_argument(
+        '--host',
+        default=DEFAULT_HOST,
+        help=f'Address to bind (default: {DEFAULT_HOST})',
+    )
+    parser.add_argument(
+        '--port',
+        type=int,
+        default=DEFAULT_PORT,
+        help=f'Port to listen on (default: {DEFAULT_PORT})',
+    )
+    parser.add_argument(
+        '--local-only',
+        action='store_true',
+        help='Use only locally cached models, do not download',
+    )
+    parser.add_argument(
+        '--preload',
+        action='store_true',
+        help='Load the model at startup instead of on the first job',
+    )
+    parser.add_argument(
+        '-v', '--verbose',
+        action='store_true',
+        help='Log every request',
+    )
+
+    parser.add_argument(
+        '--idle-unload',
+        type=float,
+        metavar='SECONDS',
+        help='Release the model from GPU memory after this many idle seconds; '
+             'it is reloaded on the next job',
+    )
+    parser.add_argument(
+        '--min-free-memory',
+        type=float,
+        metavar='FRACTION',
+        help='Release the model while any GPU has less than this fraction of its memory free',
+    )
+
+    import cli
+    cli.add_model_arguments(parser)
+    args = parser.parse_args(argv)
+
+    service = ConversionService(local_only=args.local_only)
+    model_options: dict[str, Any] = {'queue_monitor': service.queue_monitor}
+    if args.idle_unload is not None or args.min_free_memory is not None:
+        from residency import device_memory_pressure
+
+        model_options['idle_unload_seconds'] = args.idle_unload
+        if args.min_free_memory is not None:
+            model_options['memory_pressure'] = device_memory_pressure(args.min_free_memory)
+        model_options['on_residency_event'] = service.on_residency_event
+    cli.configure_model_patch(args, **model_options)
+    try:
+        if args.preload:
+            service.load()
+        server = ConversionServer((args.host, args.port), service, verbose=args.verbose)
+    except Exception as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    host, port = server.server_address[:2]
+    print(f"pdf-craftq server listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down", file=sys.stderr)
+    finally:
+        server.server_close()
+    return 0
@@ -0,0 +1,281 @@
+"""
+页面范围与分片转换
+
+`--pages`/`--shard` 只识别 PDF 的一部分页面，产出一个分片目录：
+- ocr/page_N.xml：pdf_craft 的页面识别结果
+- assets/：页面中裁剪出的图片、表格、公式
+- cover.png：分片包含第 1 页时的封面
+- part.json：分片清单（PDF 哈希、总页数、本分片页码、识别选项与影响识别结果的模型选项），
+  识别全部完成后才写入
+
+merge_parts 校验各分片属于同一份 PDF 且选项一致，按页码合并后生成 Markdown 或 EPUB。
+页面之间的段落拼接在合并时完成，因此分片边界不会切断段落。
+"""
+
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Literal
+
+from ocr_cache import OCRCache
+
+if TYPE_CHECKING:
+    from pdf_craft import OCREvent
+    from pdf_craft.pdf import OCR
+
+
+PART_MANIFEST = "part.json"
+
+PageRanges = list[tuple[int, int | None]]
+
+
+@dataclass
+class PartManifest:
+    pdf_name: str
+    pdf_sha256: str
+    total_pages: int
+    pages: list[int]
+    ocr_size: str
+    includes_footnotes: bool
+    # 影响识别结果的模型选项（模型版本、设备、解码上限等），与断点续传的头部相同
+    options: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def load(cls, part_path: Path) -> "PartManifest":
+        manifest_path = part_path / PART_MANIFEST
+        if not manifest_path.exists():
+            raise ValueError(f"Not a finished shard (missing {PART_MANIFEST}): {part_path}")
+        return cls(**json.loads(manifest_path.read_text(encoding="utf-8")))
+
+    def save(self, part_path: Path) -> None:
+        temp_path = part_path / f"{PART_MANIFEST}.tmp"
+        temp_path.write_text(json.dumps(asdict(self), indent=2) + "\n", encoding="utf-8")
+        temp_path.replace(part_path / PART_MANIFEST)
+
+
+def parse_page_ranges(spec: str) -> PageRanges:
+    """
+    解析页码范围，如 "1-200,350-"（页码从 1 开始，结尾留空表示直到最后一页）
+    """
+    ranges: PageRanges = []
+    for chunk in spec.split(","):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        start_text, dash, end_text = chunk.partition("-")
+        try:
+            start = int(start_text) if start_text else 1
+            end = int(end_text) if end_text else None
+            if not dash:
+                end = start
+        except ValueError:
+            raise ValueError(f"Invalid page range: {chunk!r}") from None
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Invalid page range: {chunk!r}")
+        ranges.append((start, end))
+    if not ranges:
+        raise ValueError(f"Empty page range: {spec!r}")
+    return ranges
+
+
+def parse_shard(spec: str) -> tuple[int, int]:
+    """解析 "i/N"（i 从 1 开始），返回 (i, N)"""
+    index_text, slash, count_text = spec.partition("/")
+    try:
+        index, count = int(index_text), int(count_text)
+    except ValueError:
+        raise ValueError(f"Invalid shard: {spec!r}, expected i/N") from None
+    if not slash or count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Invalid shard: {spec!r}, expected i/N with 1 <= i <= N")
+    return index, count
+
+
+def select_pages(
+    total_pages: int,
+    ranges: PageRanges | None = None,
+    shard: tuple[int, int] | None = None,
+) -> list[int]:
+    """
+    按页码范围筛选页面，再将结果均分为 N 个连续的分片并取第 i 片
+
+    连续分片让每个节点处理相邻页面，合并时只需按页码拼接
+    """
+    pages = list(range(1, total_pages + 1))
+    if ranges is not None:
+        pages = [
+            page for page in pages
+            if any(start <= page and (end is None or page <= end) for start, end in ranges)
+        ]
+    if shard is not None:
+        index, count = shard
+        size, remainder = divmod(len(pages), count)
+        # 前 remainder 个分片各多一页
+        begin = (index - 1) * size + min(index - 1, remainder)
+        end = begin + size + (1 if index <= remainder else 0)
+        pages = pages[begin:end]
+    return pages
+
+
+def recognize_part(
+    ocr: "OCR",
+    pdf_path: Path,
+    part_path: Path,
+    pages: list[int],
+    ocr_size: str,
+    includes_footnotes: bool,
+    ignore_pdf_errors: bool,
+    aborted: Callable[[], bool] = lambda: False,
+    on_ocr_event: "Callable[[OCREvent], None]" = lambda _: None,
+    options: dict[str, Any] | None = None,
+) -> PartManifest:
+    """
+    识别指定页面并写出分片目录；目录中已有结果的页面会被跳过，中断后重跑即可续传
+    """
+    from pdf_craft.pdf import pdf_pages_count
+
+    part_path.mkdir(parents=True, exist_ok=True)
+    manifest = PartManifest(
+        pdf_name=pdf_path.name,
+        pdf_sha256=OCRCache.file_digest(pdf_path),
+        total_pages=pdf_pages_count(pdf_path),
+        pages=pages,
+        ocr_size=ocr_size,
+        includes_footnotes=includes_footnotes,
+        # 经 JSON 往返后再比较，与从 part.json 读出的清单一致
+        options=json.loads(json.dumps(options or {})),
+    )
+    (part_path / PART_MANIFEST).unlink(missing_ok=True)
+
+    page_set = set(pages)
+    for event in ocr.recognize(
+        pdf_path=pdf_path,
+        asset_path=part_path / "assets",
+        ocr_path=part_path / "ocr",
+        ocr_size=ocr_size,
+        includes_footnotes=includes_footnotes,
+        ignore_pdf_errors=ignore_pdf_errors,
+        cover_path=part_path / "cover.png" if 1 in page_set else None,
+        aborted=aborted,
+        page_indexes=page_set,
+    ):
+        on_ocr_event(event)
+
+    manifest.save(part_path)
+    return manifest
+
+
+def merge_parts(
+    part_paths: list[Path],
+    output_path: Path,
+    output_format: Literal["markdown", "epub"],
+    assets_path: Path | None = None,
+    includes_cover: bool = True,
+    language: Literal["zh", "en"] = "zh",
+    allow_gaps: bool = False,
+) -> list[int]:
+    """
+    按页码合并分片并生成最终的 Markdown 或 EPUB，返回合并的页码
+
+    Raises:
+        ValueError: 分片来自不同的 PDF、选项不一致、页码重叠，或缺页且未允许缺页
+    """
+    from pdf_craft.sequence import generate_chapter_files
+
+    if not part_paths:
+        raise ValueError("No shards to merge")
+    manifests = [PartManifest.load(part_path) for part_path in part_paths]
+    first = manifests[0]
+    owner: dict[int, Path] = {}
+    for part_path, manifest in zip(part_paths, manifests):
+        if manifest.pdf_sha256 != first.pdf_sha256:
+            raise ValueError(f"Shard {part_path} belongs to a different PDF")
+        if (manifest.ocr_size, manifest.includes_footnotes, manifest.options) != (
+            first.ocr_size, first.includes_footnotes, first.options,
+        ):
+            raise ValueError(
+                f"Shard {part_path} used different options than {part_paths[0]}: "
+                f"{_describe_options(manifest)} vs. {_describe_options(first)}"
+            )
+        for page in manifest.pages:
+            if page in owner:
+                raise ValueError(f"Page {page} appears in both {owner[page]} and {part_path}")
+            owner[page] = part_path
+
+    missing = [page for page in range(1, first.total_pages + 1) if page not in owner]
+    if missing and not allow_gaps:
+        raise ValueError(f"Shards do not cover {len(missing)} page(s), first missing page: {missing[0]}")
+
+    with tempfile.TemporaryDirectory(prefix="pdf-craftq-merge-") as temp_dir:
+        analysing_path = Path(temp_dir)
+        pages_path = analysing_path / "ocr"
+        merged_assets_path = analysing_path / "assets"
+        pages_path.mkdir()
+        merged_assets_path.mkdir()
+        cover_path: Path | None = None
+
+        for part_path in part_paths:
+            for page_file in (part_path / "ocr").glob("page_*.xml"):
+                page_index = int(page_file.stem.removeprefix("page_"))
+                if owner.get(page_index) == part_path:
+                    _link_or_copy(page_file, pages_path / page_file.name)
+            # 资源文件以内容哈希命名，不同分片的同名文件内容相同
+            part_assets_path = part_path / "assets"
+            if part_assets_path.exists():
+                for asset_file in part_assets_path.iterdir():
+                    target = merged_assets_path / asset_file.name
+                    if not target.exists():
+                        _link_or_copy(asset_file, target)
+            if (part_path / "cover.png").exists():
+                cover_path = part_path / "cover.png"
+
+        chapters_path = analysing_path / "chapters"
+        generate_chapter_files(pages_path, chapters_path)
+
+        if output_format == "epub":
+            from epub_generator import LaTeXRender, TableRender
+            from pdf_craft.epub import render_epub_file
+            from pdf_craft.toc import generate_toc_file
+
+            render_epub_file(
+                chapters_path=chapters_path,
+                toc_path=generate_toc_file(chapters_path, analysing_path / "toc.xml"),
+                assets_path=merged_assets_path,
+                epub_path=output_path,
+                cover_path=cover_path if includes_cover else None,
+                book_meta=None,
+                lan=language,
+                table_render=TableRender.HTML,
+                latex_render=LaTeXRender.MATHML,
+                inline_latex=True,
+                aborted=lambda: False,
+            )
+        else:
+            from pdf_craft.markdown import render_markdown_file
+
+            render_markdown_file(
+                chapters_path=chapters_path,
+                assets_path=merged_assets_path,
+                output_path=output_path,
+                output_assets_path=assets_path if assets_path is not None else Path("assets"),
+                aborted=lambda: False,
+            )
+
+    return sorted(owner)
+
+
+def _describe_options(manifest: PartManifest) -> str:
+    return json.dumps(
+        {"ocr_size": manifest.ocr_size, "includes_footnotes": manifest.includes_footnotes, **manifest.options},
+        sort_keys=True,
+    )
+
+
+def _link_or_copy(source: Path, target: Path) -> None:
+    # 同一文件系统上硬链接即可，避免复制大量页面结果
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
@@ -0,0 +1,183 @@
+"""
+模型快照解析索引
+
+HuggingFace 缓存中 models--<org>--<name>/refs/<ref> 记录引用指向的 commit，
+snapshots/<commit>/ 下的文件是指向 blobs/ 的符号链接。每次下载、加载都读取 refs
+并扫描快照目录，在挂载于 NFS、保存了大量版本的共享缓存上很慢。
+
+SnapshotIndex 把解析结果（快照路径、commit hash、各文件校验值）写入清单文件
+models--<org>--<name>/craftq-snapshot.json，并在进程内缓存。清单只在 refs 文件
+变化时失效，之后每次解析只需 stat 一次 refs 文件。
+固定 revision 为 commit hash 时直接定位快照目录，不读取 refs，适合可复现的离线启动。
+"""
+
+import json
+import os
+import re
+import threading
+from contextlib import suppress
+from dataclasses import dataclass
+from pathlib import Path
+
+
+MANIFEST_NAME = "craftq-snapshot.json"
+
+_MANIFEST_VERSION = 1
+_COMMIT_PATTERN = re.compile(r"^[0-9a-f]{40}$")
+
+# 进程内缓存：(模型缓存目录, 引用或 commit) → (refs 状态, 解析结果)
+_memory: dict[tuple[Path, str], tuple[list[int] | None, "ResolvedSnapshot"]] = {}
+_memory_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class ResolvedSnapshot:
+    revision: str
+    path: Path
+    # 相对路径 → 校验值。缓存文件是指向 blobs/<hash> 的符号链接时直接取 blob 名
+    # （LFS 文件为 sha256，其余为 git sha1），无需读取文件内容
+    files: dict[str, str]
+
+
+class SnapshotIndex:
+    """
+    单个模型的快照解析索引
+
+    Args:
+        cache_model_dir: HuggingFace 缓存中的 models--<org>--<name> 目录
+    """
+
+    def __init__(self, cache_model_dir: Path) -> None:
+        self._cache_model_dir = cache_model_dir
+
+    @property
+    def manifest_path(self) -> Path:
+        return self._cache_model_dir / MANIFEST_NAME
+
+    def resolve(self, revision: str | None = None) -> ResolvedSnapshot | None:
+        """
+        解析本地快照，不存在时返回 None
+
+        Args:
+            revision: commit hash、分支或标签名；None 表示 main
+        """
+        revision = revision or "main"
+        if _COMMIT_PATTERN.match(revision):
+            # 固定 commit：快照目录名即 commit，不受 refs 变化影响
+            return self._lookup(revision, None, lambda: revision)
+
+        ref_file = self._cache_model_dir / "refs" / revision
+        try:
+            stat = ref_file.stat()
+        except OSError:
+            if revision != "main":
+                return None
+            return self._resolve_latest()
+        state = [stat.st_mtime_ns, stat.st_size]
+        snapshot = self._lookup(revision, state, lambda: ref_file.read_text().strip())
+        if snapshot is None and revision == "main":
+            return self._resolve_latest()
+        return snapshot
+
+    def invalidate(self) -> None:
+        """丢弃进程内缓存与清单，例如下载了新版本之后"""
+        with _memory_lock:
+            for key in [key for key in _memory if key[0] == self._cache_model_dir]:
+                del _memory[key]
+        with suppress(OSError):
+            self.manifest_path.unlink(missing_ok=True)
+
+    def _resolve_latest(self) -> ResolvedSnapshot | None:
+        # 没有 refs/main（例如直接拷贝的快照）：取最新的快照，快照目录变化时失效
+        snapshots_dir = self._cache_model_dir / "snapshots"
+        try:
+            state = [snapshots_dir.stat().st_mtime_ns, 0]
+        except OSError:
+            return None
+
+        def latest_revision() -> str | None:
+            snapshot_dirs = [d for d in snapshots_dir.iterdir() if d.is_dir()]
+            if not snapshot_dirs:
+                return None
+            return max(snapshot_dirs, key=lambda d: d.stat().st_mtime).name
+
+        return self._lookup("*", state, latest_revision)
+
+    def _lookup(self, key: str, state: list[int] | None, read_revision) -> ResolvedSnapshot | None:
+        memory_key = (self._cache_model_dir, key)
+        with _memory_lock:
+            cached = _memory.get(memory_key)
+        if cached is not None and cached[0] == state:
+            return cached[1]
+
+        manifest = self._read_manifest()
+        entry = manifest.get(key)
+        snapshot: ResolvedSnapshot | None = None
+        if entry is not None and entry.get("state") == state:
+            snapshot = ResolvedSnapshot(
+                revision=entry["revision"],
+                path=Path(entry["path"]),
+                files=entry["files"],
+            )
+            if not snapshot.path.is_dir():
+                # 快照已被清理
+                snapshot = None
+
+        if snapshot is None:
+            revision = read_revision()
+            if revision is None:
+                return None
+            snapshot_path = self._cache_model_dir / "snapshots" / revision
+            if not snapshot_path.is_dir():
+                return None
+            snapshot = ResolvedSnapshot(
+                revision=revision,
+                path=snapshot_path,
+                files=_file_checksums(snapshot_path),
+            )
+            manifest[key] = {
+                "state": state,
+                "revision": snapshot.revision,
+                "path": str(snapshot.path),
+                "files": snapshot.files,
+            }
+            self._write_manifest(manifest)
+
+        with _memory_lock:
+            _memory[memory_key] = (state, snapshot)
+        return snapshot
+
+    def _read_manifest(self) -> dict[str, dict]:
+        try:
+            data = json.loads(self.manifest_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        if data.get("version") != _MANIFEST_VERSION:
+            return {}
+        return data.get("entries", {})
+
+    def _write_manifest(self, entries: dict[str, dict]) -> None:
+        temp_path = self.manifest_path.with_name(f"{MANIFEST_NAME}.{os.getpid()}.tmp")
+        try:
+            temp_path.write_text(
+                json.dumps({"version": _MANIFEST_VERSION, "entries": entries}, indent=2) + "\n",
+                encoding="utf-8",
+            )
+            temp_path.replace(self.manifest_path)
+        except OSError:
+            # 只读的共享缓存：仍可使用进程内缓存
+            with suppress(OSError):
+                temp_path.unlink(missing_ok=True)
+
+
+def _file_checksums(snapshot_path: Path) -> dict[str, str]:
+    checksums: dict[str, str] = {}
+    for path in sorted(snapshot_path.rglob("*")):
+        if path.is_dir():
+            continue
+        relative = path.relative_to(snapshot_path).as_posix()
+        if path.is_symlink():
+            checksums[relative] = Path(os.readlink(path)).name
+        else:
+            checksums[relative] = f"size:{path.stat().st_size}"
+    return checksums
@@ -0,0 +1,288 @@
+"""
+流式 Markdown 输出
+
+transform_markdown 先识别全部页面，再拼接段落、划分章节并渲染，整本书完成后才写出
+Markdown。stream_markdown 在每页识别完成后立即产出已经确定的 Markdown 片段：
+
+- 页面结果逐页送入与 pdf_craft 相同的段落拼接逻辑（Jointer），跨页段落只等到下一页
+- 脚注引用按页确定：某页的脚注全部确定后，引用它的正文才输出
+- 已输出的页面结果随即删除，内存与临时文件不随文档页数增长
+
+与 transform_markdown 的差别只在脚注编号：这里按正文中首次出现的顺序编号，
+脚注列表仍在文末输出。
+"""
+
+import math
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Generator, Iterable
+
+if TYPE_CHECKING:
+    from pdf_craft import OCREvent
+    from pdf_craft.pdf import OCR, Page, PageLayout
+    from pdf_craft.sequence import AssetLayout, ParagraphLayout, Reference
+
+
+@dataclass(frozen=True)
+class MarkdownChunk:
+    # 触发本片段的页码（从 1 开始）
+    page_index: int
+    total_pages: int
+    # 本页识别后新确定的 Markdown，可能为空（段落延续到下一页）
+    text: str
+    # 文档结束后的收尾片段：最后一个段落与脚注列表
+    final: bool = False
+
+
+def stream_markdown(
+    ocr: "OCR",
+    pdf_path: Path,
+    assets_path: Path = Path("assets"),
+    asset_ref_path: Path | None = None,
+    ocr_size: str = "gundam",
+    includes_footnotes: bool = False,
+    ignore_pdf_errors: bool = False,
+    aborted: Callable[[], bool] = lambda: False,
+    on_ocr_event: "Callable[[OCREvent], None]" = lambda _: None,
+) -> Generator[MarkdownChunk, None, None]:
+    """
+    识别 PDF 并逐页产出 Markdown 片段，依次拼接即为完整文档
+
+    Args:
+        ocr: pdf_craft 的 OCR
+        pdf_path: 输入 PDF
+        assets_path: 图片、表格等资源的输出目录
+        asset_ref_path: Markdown 中引用资源的路径，默认与 assets_path 相同
+        aborted: 返回 True 时中断识别
+        on_ocr_event: 接收每个 OCREvent
+    """
+    from pdf_craft import OCREventKind
+    from pdf_craft.common import read_xml
+    from pdf_craft.pdf import decode
+
+    assets_path.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="pdf-craftq-stream-") as temp_dir:
+        work_path = Path(temp_dir)
+        ocr_path = work_path / "ocr"
+        renderer = _StreamRenderer(
+            assets_path=work_path / "assets",
+            output_assets_path=assets_path,
+            asset_ref_path=asset_ref_path if asset_ref_path is not None else assets_path,
+        )
+        total_pages = 0
+        last_page_index = 0
+        for event in ocr.recognize(
+            pdf_path=pdf_path,
+            asset_path=work_path / "assets",
+            ocr_path=ocr_path,
+            ocr_size=ocr_size,
+            includes_footnotes=includes_footnotes,
+            ignore_pdf_errors=ignore_pdf_errors,
+            aborted=aborted,
+        ):
+            on_ocr_event(event)
+            total_pages = event.total_pages
+            if event.kind not in (OCREventKind.COMPLETE, OCREventKind.FAILED, OCREventKind.SKIP):
+                continue
+            page_file = ocr_path / f"page_{event.page_index}.xml"
+            if not page_file.exists():
+                continue
+            page = decode(read_xml(page_file))
+            # 页面已送入拼接器，结果文件不再需要
+            page_file.unlink()
+            last_page_index = event.page_index
+            yield MarkdownChunk(event.page_index, total_pages, renderer.feed(page))
+
+        yield MarkdownChunk(last_page_index, total_pages, renderer.finish(), final=True)
+
+
+def write_markdown_stream(chunks: Iterable[MarkdownChunk], output, on_chunk: Callable[[MarkdownChunk], None] | None = None) -> None:
+    """把片段依次写入文本流并立即 flush，下游可以边写边读"""
+    for chunk in chunks:
+        if chunk.text:
+            output.write(chunk.text)
+            output.flush()
+        if on_chunk is not None:
+            on_chunk(chunk)
+
+
+class _PushJointer:
+    """
+    逐页推入的 Jointer
+
+    pdf_craft 的 Jointer.execute 从页面迭代器中拉取页面；这里复用其单页转换与
+    段落合并判断，改为每推入一页返回已经确定的布局。页末的段落可能与下一页开头
+    合并，保留为 pending 直到下一页到来。
+    """
+
+    def __init__(self) -> None:
+        from pdf_craft_compat import Jointer
+
+        self._jointer = Jointer(())
+        self.pending: "ParagraphLayout | None" = None
+
+    def feed(self, page_index: int, raw_layouts: "list[PageLayout]") -> "list[AssetLayout | ParagraphLayout]":
+        from pdf_craft.sequence import ParagraphLayout
+        from pdf_craft_compat import (
+            can_merge_paragraphs,
+            normalize_paragraph_content,
+            transform_and_join_asset_layouts,
+        )
+
+        finished: "list[AssetLayout | ParagraphLayout]" = []
+        layouts = transform_and_join_asset_layouts(self._jointer, page_index, raw_layouts)
+        if not layouts:
+            return finished
+
+        first_layout = layouts[0]
+        if self.pending and isinstance(first_layout, ParagraphLayout) and \
+           can_merge_paragraphs(self._jointer, self.pending, first_layout):
+            self.pending.lines.extend(first_layout.lines)
+            del layouts[0]
+        if not layouts:
+            return finished
+
+        if self.pending:
+            normalize_paragraph_content(self.pending)
+            finished.append(self.pending)
+            self.pending = None
+        finished.extend(layouts[:-1])
+        last_layout = layouts[-1]
+        if isinstance(last_layout, ParagraphLayout):
+            self.pending = last_layout
+        else:
+            finished.append(last_layout)
+        return finished
+
+    def finish(self) -> "list[AssetLayout | ParagraphLayout]":
+        from pdf_craft_compat import normalize_paragraph_content
+
+        if self.pending is None:
+            return []
+        normalize_paragraph_content(self.pending)
+        finished, self.pending = [self.pending], None
+        return finished
+
+
+class _StreamRenderer:
+    """把逐页推入的页面渲染为 Markdown，格式与 pdf_craft 的 render_markdown_file 一致"""
+
+    def __init__(self, assets_path: Path, output_assets_path: Path, asset_ref_path: Path) -> None:
+        self._assets_path = assets_path
+        self._output_assets_path = output_assets_path
+        self._asset_ref_path = asset_ref_path
+        self._body = _PushJointer()
+        self._footnotes = _PushJointer()
+        # 已从拼接器输出、等待所在页脚注确定的正文布局
+        self._body_queue: "list[AssetLayout | ParagraphLayout]" = []
+        # 已确定的脚注布局按页分组，正文用到时再构造 References；所在页的正文渲染后即丢弃
+        self._footnote_layouts: "dict[int, list[AssetLayout | ParagraphLayout]]" = {}
+        # 脚注已全部确定的最大页码
+        self._footnotes_final_page: float = 0
+        self._references: "list[Reference]" = []
+        self._ref_id_to_number: dict[tuple[int, int], int] = {}
+        self._after_layout = False
+
+    def feed(self, page: "Page") -> str:
+        self._body_queue.extend(self._body.feed(page.index, page.body_layouts))
+        self._add_footnotes(self._footnotes.feed(page.index, page.footnotes_layouts))
+        pending = self._footnotes.pending
+        self._footnotes_final_page = page.index if pending is None else pending.lines[0].page_index - 1
+        text = self._drain()
+        self._prune_footnotes(page.index + 1)
+        return text
+
+    def finish(self) -> str:
+        self._body_queue.extend(self._body.finish())
+        self._add_footnotes(self._footnotes.finish())
+        self._footnotes_final_page = math.inf
+        return self._drain() + "".join(self._render_footnotes())
+
+    def _add_footnotes(self, layouts: "list[AssetLayout | ParagraphLayout]") -> None:
+        from pdf_craft_compat import page_index_from_layout
+
+        for layout in layouts:
+            self._footnote_layouts.setdefault(page_index_from_layout(layout), []).append(layout)
+
+    def _prune_footnotes(self, next_page_index: int) -> None:
+        """丢弃不会再被引用的脚注：正文中尚未渲染的行都不在这些页上"""
+        from pdf_craft.sequence import ParagraphLayout
+
+        unrendered = [layout for layout in self._body_queue if isinstance(layout, ParagraphLayout)]
+        if self._body.pending is not None:
+            unrendered.append(self._body.pending)
+        first_page_index = min(
+            (line.page_index for layout in unrendered for line in layout.lines),
+            default=next_page_index,
+        )
+        for page_index in [index for index in self._footnote_layouts if index < first_page_index]:
+            del self._footnote_layouts[page_index]
+
+    def _drain(self) -> str:
+        from pdf_craft.sequence import ParagraphLayout
+
+        parts: list[str] = []
+        while self._body_queue:
+            layout = self._body_queue[0]
+            if isinstance(layout, ParagraphLayout) and \
+               max(line.page_index for line in layout.lines) > self._footnotes_final_page:
+                break
+            del self._body_queue[0]
+            parts.extend(self._render(layout))
+        return "".join(parts)
+
+    def _render(self, layout: "AssetLayout | ParagraphLayout") -> Generator[str, None, None]:
+        from pdf_craft.markdown.layouts import render_layouts, render_paragraph
+        from pdf_craft.sequence import ParagraphLayout
+        from pdf_craft_compat import TITLE_TAGS
+
+        if isinstance(layout, ParagraphLayout):
+            self._resolve_references(layout)
+        if self._after_layout:
+            yield "\n\n"
+        if isinstance(layout, ParagraphLayout) and layout.ref in TITLE_TAGS:
+            yield "## "
+            yield from render_paragraph(paragraph=layout, ref_id_to_number=self._ref_id_to_number)
+            yield "\n\n"
+            self._after_layout = False
+        else:
+            yield from render_layouts(
+                layouts=[layout],
+                assets_path=self._assets_path,
+                output_assets_path=self._output_assets_path,
+                asset_ref_path=self._asset_ref_path,
+                ref_id_to_number=self._ref_id_to_number,
+            )
+            self._after_layout = True
+
+    def _resolve_references(self, layout: "ParagraphLayout") -> None:
+        from pdf_craft.sequence import Reference
+        from pdf_craft.sequence.reference import References
+        from pdf_craft_compat import line_parts_after_replace_references
+
+        for line in layout.lines:
+            footnotes = self._footnote_layouts.get(line.page_index)
+            if footnotes:
+                references = References(page_index=line.page_index, layouts=footnotes)
+                line.content = list(line_parts_after_replace_references(references, line))
+            for part in line.content:
+                if isinstance(part, Reference) and part.id not in self._ref_id_to_number:
+                    self._references.append(part)
+                    self._ref_id_to_number[part.id] = len(self._references)
+
+    def _render_footnotes(self) -> Generator[str, None, None]:
+        from pdf_craft.markdown.layouts import render_layouts
+
+        if not self._references:
+            return
+        yield "\n\n---\n\n## References"
+        for number, reference in enumerate(self._references, 1):
+            yield "\n\n"
+            yield f"[^{number}]:  "
+            yield from render_layouts(
+                layouts=reference.layouts,
+                assets_path=self._assets_path,
+                output_assets_path=self._output_assets_path,
+                asset_ref_path=self._asset_ref_path,
+            )
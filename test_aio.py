@@ -0,0 +1,150 @@
+"""
+asyncio facade: concurrency limit, cancellation through ExtractionContext, and conversions.
+"""
+
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+from doc_page_extractor.types import ExtractionContext
+
+from aio import AsyncConverter, AsyncQuantizedModel
+from conftest import STUB_RESPONSE, make_pdf
+from quantized_model import QuantizedDeepSeekOCRModel
+from scheduler import JobInfo, Priority, current_job, job
+
+
+def _create_model(**options) -> QuantizedDeepSeekOCRModel:
+    return QuantizedDeepSeekOCRModel(model_path=None, local_only=False, enable_devices_numbers=None, **options)
+
+
+def test_generate_respects_concurrency_limit(tmp_path: Path, stub_backend):
+    model = _create_model(max_inflight_per_device=4)
+    model.load()
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def track(kwargs: dict) -> str:
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return kwargs["prompt"]
+
+    stub_backend.models[0].response = track
+
+    async def main() -> tuple[list[str], int]:
+        ticks = 0
+
+        async def heartbeat() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        beat = asyncio.create_task(heartbeat())
+        async with AsyncQuantizedModel(model, max_concurrency=2) as async_model:
+            results = await asyncio.gather(*(
+                async_model.generate(f"page-{i}", tmp_path / f"{i}.png", tmp_path, "tiny")
+                for i in range(6)
+            ))
+        beat.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(main())
+    assert results == [f"page-{i}" for i in range(6)]
+    assert peak[0] == 2
+    assert ticks >= 5  # the event loop kept running while pages were inferred
+
+
+def test_cancel_aborts_queued_pages_and_keeps_token_counts(tmp_path: Path, stub_backend):
+    model = _create_model(batch_size=1)
+    model.load()
+    started = threading.Event()
+
+    def slow(kwargs: dict) -> str:
+        started.set()
+        time.sleep(0.1)
+        return kwargs["prompt"]
+
+    stub_backend.models[0].response = slow
+    context = ExtractionContext(check_aborted=lambda: False)
+
+    async def main() -> None:
+        async_model = AsyncQuantizedModel(model)
+        items = [(f"page-{i}", tmp_path / f"{i}.png", "tiny") for i in range(10)]
+        task = asyncio.create_task(async_model.generate_batch(items, tmp_path, context))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        else:
+            raise AssertionError("generate_batch was not cancelled")
+        await async_model.aclose()
+
+    asyncio.run(main())
+    # the running page finishes, the queued ones never reach the model
+    assert stub_backend.infer_calls < 10
+    assert context.check_aborted() is False
+
+
+def test_converter_runs_documents_concurrently(tmp_path: Path, stub_backend):
+    pdfs = [make_pdf(tmp_path / f"book-{i}.pdf", 1) for i in range(2)]
+    events = []
+
+    async def main() -> None:
+        loop_thread = threading.get_ident()
+
+        def on_event(event) -> None:
+            assert threading.get_ident() == loop_thread
+            events.append(event)
+
+        async with AsyncConverter(max_concurrency=2) as converter:
+            await asyncio.gather(*(
+                converter.convert_markdown(pdf, tmp_path / f"{pdf.stem}.md", on_ocr_event=on_event)
+                for pdf in pdfs
+            ))
+            await asyncio.sleep(0)  # let marshalled callbacks run
+
+    asyncio.run(main())
+    for pdf in pdfs:
+        assert "Stub page text." in (tmp_path / f"{pdf.stem}.md").read_text(encoding="utf-8")
+    assert stub_backend.model_loads == 1
+    assert events
+
+
+def test_generate_runs_in_the_callers_job(tmp_path: Path, stub_backend):
+    model = _create_model()
+    model.load()
+    seen = []
+    stub_backend.models[0].response = lambda kwargs: seen.append(current_job()) or kwargs["prompt"]
+
+    async def main() -> JobInfo:
+        async with AsyncQuantizedModel(model) as async_model:
+            with job(document="book.pdf", priority="interactive", max_output_tokens=1000) as info:
+                await async_model.generate("page", tmp_path / "page.png", tmp_path, "tiny")
+            return info
+
+    info = asyncio.run(main())
+    assert seen == [info]
+    assert seen[0].priority == Priority.INTERACTIVE and seen[0].budget is info.budget
+
+
+def test_converter_passes_priority_and_document_budget(tmp_path: Path, stub_backend):
+    pdf = make_pdf(tmp_path / "book.pdf", 1)
+    seen = []
+    stub_backend.response = lambda kwargs: seen.append(current_job()) or STUB_RESPONSE
+
+    async def main() -> None:
+        async with AsyncConverter() as converter:
+            await converter.convert_markdown(pdf, tmp_path / "book.md", priority="bulk", max_document_tokens=1000)
+
+    asyncio.run(main())
+    [info] = seen
+    assert (info.document, info.priority) == (str(pdf.resolve()), Priority.BULK)
+    assert info.budget is not None and info.budget.max_output_tokens == 1000
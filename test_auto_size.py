@@ -0,0 +1,83 @@
+"""
+Per-page OCR size selection: the page classifier, degenerate-output escalation
+and ``--ocr-size auto`` through generate_batch.
+"""
+
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from auto_size import PageFeatures, analyse_page, choose_size, escalate, looks_degenerate
+from quantized_model import QuantizedDeepSeekOCRModel
+
+
+def _text_page(lines: int, columns: int = 1, size: tuple[int, int] = (1240, 1754)) -> Image.Image:
+    """A white page with ``lines`` dark bars per column standing in for text lines."""
+    width, height = size
+    pixels = np.full((height, width), 255, dtype=np.uint8)
+    margin = width // 10
+    gutter = width // 20
+    column_width = (width - 2 * margin - gutter * (columns - 1)) // columns
+    pitch = (height - 2 * margin) / max(1, lines)
+    for column in range(columns):
+        left = margin + column * (column_width + gutter)
+        for line in range(lines):
+            top = int(margin + line * pitch)
+            bottom = top + max(2, min(int(pitch * 0.4), height // 100))
+            # alternate ink and paper every few pixels, roughly the density of glyphs
+            pixels[top:bottom, left:left + column_width:8] = 0
+            pixels[top:bottom, left + 1:left + column_width:8] = 0
+            pixels[top:bottom, left + 2:left + column_width:8] = 0
+            pixels[top:bottom, left + 3:left + column_width:8] = 0
+    return Image.fromarray(pixels).convert("RGB")
+
+
+def _create_model(**options) -> QuantizedDeepSeekOCRModel:
+    return QuantizedDeepSeekOCRModel(model_path=None, local_only=False, enable_devices_numbers=None, **options)
+
+
+def test_classifier_picks_larger_sizes_for_denser_pages():
+    blank = analyse_page(Image.new("RGB", (1240, 1754), "white"))
+    sparse = analyse_page(_text_page(5))
+    book = analyse_page(_text_page(30))
+    two_columns = analyse_page(_text_page(50, columns=2))
+
+    assert (sparse.text_lines, book.text_lines) == (5, 30)
+    assert two_columns.columns == 2
+    assert [choose_size(f) for f in (blank, sparse, book, two_columns)] == ["tiny", "small", "base", "gundam"]
+    assert choose_size(analyse_page(_text_page(5, size=(800, 4000)))) == "gundam"
+
+
+def test_degenerate_output_detection():
+    features = PageFeatures(width=1240, height=1754, ink_ratio=0.1, text_lines=30, columns=1)
+    assert looks_degenerate("", features)
+    assert looks_degenerate("<|ref|>text<|/ref|><|det|>[[1, 2, 3, 4]]<|/det|>\n", features)
+    assert looks_degenerate("\n".join(["the same line"] * 20), features)
+    assert looks_degenerate("Only a title", features)
+    assert not looks_degenerate("\n".join(f"line {i} of a normal page" for i in range(30)), features)
+    assert escalate("small") == "base"
+    assert escalate("gundam") is None
+
+
+def test_generate_batch_auto_escalates_degenerate_pages(tmp_path: Path, stub_backend):
+    model = _create_model()
+    model.load()
+
+    def truncated_below_large(kwargs: dict) -> str:
+        if kwargs["base_size"] < 1280:
+            return "Only a title"
+        return "\n".join(f"line {i} of the page" for i in range(30))
+
+    stub_backend.models[0].response = truncated_below_large
+    sparse = tmp_path / "sparse.png"
+    _text_page(5).save(sparse)
+    items = [("p", _text_page(30), "auto"), ("p", sparse, "auto")]
+    results = model.generate_batch(items, output_path=tmp_path)
+
+    calls = [call["base_size"] for call in stub_backend.models[0].infer_calls]
+    # the dense page starts at base (1024) and escalates once to large; the sparse
+    # page is fine at small (640) because five short lines are not "degenerate"
+    assert sorted(calls) == [640, 1024, 1280]
+    assert results[0].startswith("line 0")
+    assert results[1] == "Only a title"
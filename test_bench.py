@@ -0,0 +1,69 @@
+"""
+Benchmark suite smoke test and result comparison, using the fake backend.
+"""
+
+import json
+from pathlib import Path
+
+import quantized_model
+from bench import FakeBackendConfig, compare, fake_backend, main
+
+
+def test_bench_writes_comparable_results(tmp_path: Path, capsys):
+    output = tmp_path / "bench.json"
+    argv = ["--pages", "4", "--latency-ms", "1", "--output-tokens", "8", "--replicas", "1,2",
+            "--scenario", "generate", "--scenario", "cache", "--scenario", "end_to_end",
+            "--scenario", "cpu", "--cpu-workers", "1,2", "--batch-size", "2", "-o", str(output)]
+    assert main(argv) == 0
+
+    result = json.loads(output.read_text(encoding="utf-8"))
+    assert result["meta"]["backend"] == {"latency_ms": 1.0, "output_tokens": 8, "per_token_ms": 0.0}
+    assert set(result["results"]) == {"generate", "cache", "end_to_end", "cpu"}
+    assert set(result["results"]["generate"]) == {
+        "replicas_1", "replicas_1_batch_2", "replicas_2", "replicas_2_batch_2",
+    }
+    assert result["results"]["cache"]["hits"] == 4
+    assert result["results"]["cache"]["pages_inferred"] == 4
+    assert result["results"]["end_to_end"]["pages_per_second"] > 0
+    assert result["results"]["cpu"]["workers_2"]["pages_per_second"] > 0
+    # the fake backend is removed again afterwards
+    assert not isinstance(quantized_model.AutoModel.from_pretrained, type(lambda: None))
+
+
+def test_generate_measures_pages_of_a_chunk_running_concurrently(tmp_path: Path):
+    from bench import bench_generate
+
+    results = bench_generate(FakeBackendConfig(latency_ms=40, output_tokens=8), 4, [1], tmp_path, batch_size=4)
+
+    # one replica runs the four pages of a chunk side by side
+    assert results["replicas_1_batch_4"]["pages_per_second"] > 2 * results["replicas_1"]["pages_per_second"]
+
+
+def test_compare_flags_slower_throughput_and_startup():
+    old = {"results": {"generate": {"replicas_1": {"pages_per_second": 100.0}},
+                       "startup": {"import_cli_seconds": 0.10}, "cache": {"hits": 4}}}
+    new = {"results": {"generate": {"replicas_1": {"pages_per_second": 70.0}},
+                       "startup": {"import_cli_seconds": 0.11}, "cache": {"hits": 2}}}
+
+    rows = {name: regressed for name, _, _, regressed in compare(old, new, max_regression=0.2)}
+    assert rows == {
+        "cache.hits": False,
+        "generate.replicas_1.pages_per_second": True,
+        "startup.import_cli_seconds": False,
+    }
+
+
+def test_fake_backend_is_deterministic(tmp_path: Path):
+    from bench import _create_model, _page_items
+
+    config = FakeBackendConfig(latency_ms=0, output_tokens=3)
+    items = _page_items(tmp_path, 4)
+    with fake_backend(config, replicas=2) as models:
+        model = _create_model(2, batch_size=1)
+        first = model.generate_batch(items, output_path=tmp_path)
+        second = model.generate_batch(items, output_path=tmp_path)
+
+    assert first == second
+    assert first[0].endswith("page-00000 lorem lorem lorem")
+    assert len(models) == 2
+    assert sum(m.pages for m in models) == 8
@@ -0,0 +1,94 @@
+"""
+Checkpoint journal tests: torn writes, option mismatches and CLI --resume.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import cli
+from checkpoint import Checkpoint, CheckpointMismatchError
+from conftest import STUB_RESPONSE, make_pdf
+
+
+def _complete(page_index: int):
+    from pdf_craft import OCREvent, OCREventKind
+
+    return OCREvent(OCREventKind.COMPLETE, page_index, 10, input_tokens=100, output_tokens=10)
+
+
+def test_resume_ignores_torn_last_line(tmp_path: Path):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 1)
+    output_path = tmp_path / "book.md"
+
+    checkpoint = Checkpoint(output_path, pdf_path, {"ocr_size": "base"})
+    assert checkpoint.open(resume=False) == 0
+    checkpoint.on_ocr_event(_complete(1))
+    checkpoint.on_ocr_event(_complete(2))
+    checkpoint.close()
+    with open(checkpoint.journal_path, "ab") as f:
+        f.write(b'{"type": "page", "page_in')  # killed mid-write
+
+    resumed = Checkpoint(output_path, pdf_path, {"ocr_size": "base"})
+    assert resumed.open(resume=True) == 2
+    assert resumed.completed_pages == {1, 2}
+    assert resumed.metering().input_tokens == 200
+    resumed.on_ocr_event(_complete(3))
+    resumed.close()
+    assert checkpoint.journal_path.read_text().count("\n") == 4
+
+
+def test_resume_rejects_changed_options(tmp_path: Path):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 1)
+    Checkpoint(tmp_path / "book.md", pdf_path, {"ocr_size": "base"}).open(resume=False)
+
+    with pytest.raises(CheckpointMismatchError):
+        Checkpoint(tmp_path / "book.md", pdf_path, {"ocr_size": "tiny"}).open(resume=True)
+
+
+def test_cli_resume_skips_finished_pages(tmp_path: Path, stub_backend, capsys):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 4)
+    output_path = tmp_path / "book.md"
+    calls = 0
+
+    def fail_on_third_page(kwargs: dict) -> str:
+        nonlocal calls
+        calls += 1
+        if calls == 3:
+            raise RuntimeError("preempted")
+        return STUB_RESPONSE
+
+    stub_backend.response = fail_on_third_page
+    assert cli.main([str(pdf_path), "-o", str(output_path)]) == 1
+    checkpoint_path = tmp_path / "book.md.craftq"
+    assert (checkpoint_path / "journal.jsonl").read_text().count('"type": "page"') == 2
+    assert not output_path.exists()
+
+    assert cli.main([str(pdf_path), "-o", str(output_path), "--resume", "-v"]) == 0
+    assert calls == 5  # pages 3 and 4 only
+    assert "2 page(s) already done" in capsys.readouterr().out
+    assert output_path.read_text(encoding="utf-8").count("Stub page text.") == 4
+    assert not checkpoint_path.exists()
+
+
+@pytest.mark.parametrize("changed", [
+    ["--max-page-tokens", "30"],
+    ["--draft-size", "tiny"],
+    ["--dedup-pages"],
+    ["--model-revision", "v2"],
+    # prefetched pages are downscaled before recognition
+    ["--prefetch", "2"],
+])
+def test_cli_resume_rejects_changed_model_options(tmp_path: Path, stub_backend, capsys, changed):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 2)
+    output_path = tmp_path / "book.md"
+    options = ["--max-page-tokens", "60"]
+
+    stub_backend.response = lambda kwargs: (_ for _ in ()).throw(RuntimeError("preempted"))
+    assert cli.main([str(pdf_path), "-o", str(output_path), *options]) == 1
+    stub_backend.response = STUB_RESPONSE
+
+    assert cli.main([str(pdf_path), "-o", str(output_path), *options, *changed, "--resume"]) == 1
+    assert "different PDF or different options" in capsys.readouterr().err
+    # the same options resume as before
+    assert cli.main([str(pdf_path), "-o", str(output_path), *options, "--resume"]) == 0
@@ -0,0 +1,182 @@
+"""
+pdf-craftq CLI tests, run against the CPU stub model from conftest.py.
+"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+import cli
+from conftest import make_pdf
+
+
+def test_expand_inputs_directory_glob_and_manifest(tmp_path: Path):
+    books = tmp_path / "books"
+    a = make_pdf(books / "a.pdf", 1)
+    b = make_pdf(books / "b.PDF", 1)
+    (books / "notes.txt").write_text("not a pdf")
+    nested = make_pdf(books / "nested" / "c.pdf", 1)
+
+    assert cli.expand_inputs([str(books)]) == [a, b]
+    assert cli.expand_inputs([str(books / "**" / "*.pdf")]) == [a, nested]
+
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# nightly\nbooks/b.PDF\n\nbooks/a.pdf\nbooks/b.PDF\n")
+    assert cli.expand_inputs([f"@{manifest}"]) == [b, tmp_path / "books" / "a.pdf"]
+
+
+def test_batch_output_paths_deduplicate_stems(tmp_path: Path):
+    paths = [Path("x/book.pdf"), Path("y/book.pdf"), Path("z/other.pdf")]
+    assert cli.batch_output_paths(paths, tmp_path, "epub") == [
+        tmp_path / "book.epub",
+        tmp_path / "book-2.epub",
+        tmp_path / "other.epub",
+    ]
+
+
+def test_batch_loads_model_once(tmp_path: Path, stub_backend, capsys):
+    books = tmp_path / "books"
+    make_pdf(books / "one.pdf", 2)
+    make_pdf(books / "two.pdf", 1)
+    out_dir = tmp_path / "out"
+
+    assert cli.main([str(books), "-o", str(out_dir)]) == 0
+
+    assert stub_backend.model_loads == 1
+    assert stub_backend.tokenizer_loads == 1
+    assert stub_backend.infer_calls == 3
+    assert "Stub page text." in (out_dir / "one.md").read_text(encoding="utf-8")
+    assert (out_dir / "two.md").exists()
+    assert "2 succeeded, 0 failed" in capsys.readouterr().out
+
+
+def test_batch_reports_failures_and_continues(tmp_path: Path, stub_backend, capsys):
+    good = make_pdf(tmp_path / "good.pdf", 1)
+    manifest = tmp_path / "list.txt"
+    manifest.write_text("missing.pdf\ngood.pdf\n")
+    out_dir = tmp_path / "out"
+
+    assert cli.main([f"@{manifest}", "-o", str(out_dir)]) == 1
+
+    captured = capsys.readouterr()
+    assert "FAILED" in captured.err and "missing.pdf" in captured.err
+    assert f"OK {good}" in captured.out
+    assert "1 succeeded, 1 failed" in captured.out
+    assert (out_dir / "good.md").exists()
+
+
+def test_batch_jobs_use_every_device(tmp_path: Path, stub_backend, monkeypatch, capsys):
+    import torch
+
+    monkeypatch.setattr(torch.cuda, "device_count", lambda: 2)
+    books = tmp_path / "books"
+    for name in ("a", "b", "c", "d"):
+        make_pdf(books / f"{name}.pdf", 2)
+
+    assert cli.main([str(books), "-o", str(tmp_path / "out"), "--jobs", "2"]) == 0
+
+    assert stub_backend.model_loads == 2
+    assert all(len(m.infer_calls) > 0 for m in stub_backend.models)
+    assert stub_backend.infer_calls == 8
+    assert "4 succeeded, 0 failed" in capsys.readouterr().out
+
+
+def test_batch_assembles_while_next_document_is_recognized(tmp_path: Path, stub_backend, monkeypatch, capsys):
+    import threading
+    import time
+
+    import pdf_craft.transform
+
+    events: list[tuple[str, str]] = []
+    lock = threading.Lock()
+    render_markdown_file = pdf_craft.transform.render_markdown_file
+
+    def slow_render(*args, **kwargs):
+        with lock:
+            events.append(("render-start", kwargs["output_path"].stem))
+        time.sleep(0.3)
+        render_markdown_file(*args, **kwargs)
+        with lock:
+            events.append(("render-end", kwargs["output_path"].stem))
+
+    def infer(kwargs: dict) -> str:
+        with lock:
+            events.append(("infer", threading.current_thread().name))
+        return "<|ref|>text<|/ref|><|det|>[[100, 100, 900, 200]]<|/det|>\nStub page text."
+
+    monkeypatch.setattr(pdf_craft.transform, "render_markdown_file", slow_render)
+    stub_backend.response = infer
+    books = tmp_path / "books"
+    make_pdf(books / "a.pdf", 1)
+    make_pdf(books / "b.pdf", 1)
+    out_dir = tmp_path / "out"
+
+    assert cli.main([str(books), "-o", str(out_dir)]) == 0
+
+    kinds = [kind for kind, _ in events]
+    # b's page is recognized while a is still being rendered
+    assert kinds.index("infer", kinds.index("render-start")) < kinds.index("render-end")
+    assert "Stub page text." in (out_dir / "a.md").read_text(encoding="utf-8")
+    assert "Stub page text." in (out_dir / "b.md").read_text(encoding="utf-8")
+    assert not list(out_dir.glob("*.craftq"))
+    assert "2 succeeded, 0 failed" in capsys.readouterr().out
+
+
+def test_batch_assembly_failure_keeps_checkpoint(tmp_path: Path, stub_backend, monkeypatch, capsys):
+    import pdf_craft.transform
+
+    render_markdown_file = pdf_craft.transform.render_markdown_file
+
+    def broken_render(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(pdf_craft.transform, "render_markdown_file", broken_render)
+    books = tmp_path / "books"
+    make_pdf(books / "a.pdf", 2)
+    out_dir = tmp_path / "out"
+
+    assert cli.main([str(books), "-o", str(out_dir)]) == 1
+    assert "FAILED" in capsys.readouterr().err
+    # every page is journaled; --resume only has to assemble again
+    monkeypatch.setattr(pdf_craft.transform, "render_markdown_file", render_markdown_file)
+    assert cli.main([str(books), "-o", str(out_dir), "--resume"]) == 0
+    assert stub_backend.infer_calls == 2
+    assert "Stub page text." in (out_dir / "a.md").read_text(encoding="utf-8")
+
+
+# Modules that take seconds to import; none of them may load before a conversion starts
+_HEAVY_MODULES = ("torch", "transformers", "huggingface_hub", "doc_page_extractor", "pdf_craft", "readerwriterlock")
+
+
+@pytest.mark.parametrize(("argv", "error"), [
+    (["missing.pdf", "-o", "out.md"], "Input file not found"),
+    # the prefetch handler, which imports pdf_craft and starts a process pool, comes after the checks
+    (["missing.pdf", "-o", "out.md", "--prefetch", "4"], "Input file not found"),
+    (["@missing.txt", "-o", "out", "--prefetch", "4"], "Manifest file not found"),
+])
+def test_startup_does_not_import_the_model_stack(tmp_path: Path, argv: list[str], error: str):
+    root = Path(__file__).parent
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         f"import sys, cli; sys.argv = ['pdf-craftq', *{argv!r}]; sys.exit(cli.main())"],
+        cwd=tmp_path,
+        env={**os.environ, "PYTHONPATH": str(root)},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 1
+    assert error in result.stderr
+
+    imported = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line.removeprefix("import time:").split("|")
+            if cumulative.strip().isdigit():
+                imported[name.strip()] = int(cumulative)
+    assert not [name for name in imported if name.split(".")[0] in _HEAVY_MODULES]
+    # generous bound: the CLI module itself imports in a few tens of milliseconds
+    assert imported["cli"] < 1_000_000
@@ -0,0 +1,121 @@
+"""
+CPU backend: thread planning, model loading without CUDA, and page concurrency.
+"""
+
+import threading
+import time
+from pathlib import Path
+
+import pytest
+import torch
+
+import quantized_model
+from conftest import download_stub_snapshot
+from cpu_backend import CPU_MODEL_NAME, plan_cpu
+from ocr_cache import OCRCache
+from quantized_model import _SIZE_CONFIGS, QuantizedDeepSeekOCRModel
+
+
+@pytest.fixture
+def cpu_host(stub_backend, monkeypatch):
+    """The stub backend on a host without CUDA; records from_pretrained options."""
+    monkeypatch.setattr(torch.cuda, "is_available", lambda: False)
+    monkeypatch.setattr(torch.cuda, "device_count", lambda: 0)
+    # loading in CPU mode redirects Tensor.cuda and sets the intra-op thread count
+    monkeypatch.setattr(torch.Tensor, "cuda", torch.Tensor.cuda)
+    num_threads = torch.get_num_threads()
+    load_options: list[dict] = []
+    load_model = quantized_model.AutoModel.from_pretrained
+
+    def record(*args, **kwargs):
+        load_options.append(kwargs)
+        return load_model(*args, **kwargs)
+
+    monkeypatch.setattr(quantized_model.AutoModel, "from_pretrained", record)
+    stub_backend.load_options = load_options
+    yield stub_backend
+    torch.set_num_threads(num_threads)
+
+
+def test_plan_splits_cores_between_pages():
+    assert plan_cpu(cores=32) == plan_cpu(workers=8, cores=32)
+    assert plan_cpu(cores=32).threads_per_worker == 4
+    assert plan_cpu(workers=2, cores=32).threads_per_worker == 16
+    assert plan_cpu(threads=8, cores=32).workers == 4
+    assert (plan_cpu(cores=2).workers, plan_cpu(cores=2).threads_per_worker) == (1, 2)
+    with pytest.raises(ValueError):
+        plan_cpu(workers=0)
+
+
+def test_auto_device_loads_full_precision_weights_on_cpu(tmp_path: Path, cpu_host):
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None,
+        device="auto", cpu_workers=3, cpu_threads=2,
+    )
+    assert model.device == "cpu"
+    model.load()
+
+    options = cpu_host.load_options[0]
+    assert options["pretrained_model_name_or_path"] == CPU_MODEL_NAME
+    assert options["torch_dtype"] == torch.bfloat16
+    assert options["_attn_implementation"] == "eager"
+    assert "device_map" not in options
+    assert torch.get_num_threads() == 2
+    # DeepSeek-OCR's infer moves its inputs with .cuda(); they stay on the CPU
+    assert torch.ones(2).cuda().dtype == torch.bfloat16
+    assert len(model.replica_stats()) == 1
+
+
+def test_cpu_pages_run_concurrently_up_to_workers(tmp_path: Path, cpu_host):
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None,
+        device="cpu", cpu_workers=2, cpu_threads=1, batch_size=8,
+    )
+    model.load()
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def track(kwargs: dict) -> str:
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.03)
+        with lock:
+            running[0] -= 1
+        return kwargs["prompt"]
+
+    cpu_host.models[0].response = track
+    items = [(f"page-{i}", tmp_path / f"{i}.png", "tiny") for i in range(6)]
+    assert model.generate_batch(items, output_path=tmp_path) == [f"page-{i}" for i in range(6)]
+    assert peak[0] == 2
+
+
+def test_cuda_device_without_gpu_points_to_cpu_mode(cpu_host):
+    model = QuantizedDeepSeekOCRModel(model_path=None, local_only=False, enable_devices_numbers=None)
+    with pytest.raises(RuntimeError, match="device=\"cpu\""):
+        model.load()
+
+
+def test_unload_restores_tensor_cuda(cpu_host):
+    original_cuda = torch.Tensor.cuda
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None, device="cpu", cpu_dtype="float32",
+    )
+    model.load()
+    assert torch.Tensor.cuda is not original_cuda
+    model.unload()
+    assert torch.Tensor.cuda is original_cuda
+
+
+def test_cache_keys_differ_between_cpu_dtypes(tmp_path: Path, cpu_host):
+    image = tmp_path / "page.png"
+    image.write_bytes(b"page")
+    download_stub_snapshot(CPU_MODEL_NAME, None)  # the key includes the snapshot revision
+    keys = {
+        QuantizedDeepSeekOCRModel(
+            model_path=None, local_only=False, enable_devices_numbers=None,
+            device="cpu", cpu_dtype=cpu_dtype, ocr_cache=OCRCache(tmp_path / "cache"),
+        )._cache_key("prompt", image, _SIZE_CONFIGS["base"])
+        for cpu_dtype in ("bfloat16", "float32", "int8")
+    }
+    assert len(keys) == 3
@@ -0,0 +1,132 @@
+"""
+Decode limits: repetition detection, per-page output caps, per-document token
+budgets and the truncation report.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+
+import cli
+import quantized_model
+from conftest import make_pdf
+from decode_limits import find_repetition
+from doc_page_extractor import TokenLimitError
+from metrics import MetricsCollector
+from quantized_model import QuantizedDeepSeekOCRModel
+from scheduler import job
+
+_PROMPT_TOKENS = 5
+_GROUNDING = "<|ref|>text<|/ref|><|det|>[[100, 100, 900, 200]]<|/det|>\n"
+
+
+class DecodingModel:
+    """Like DeepSeek-OCR, ``infer`` decodes through ``generate``; tokens come from a script."""
+
+    def __init__(self, script: list[int]) -> None:
+        self.script = script
+
+    def generate(self, input_ids, stopping_criteria=None, max_new_tokens=8192, **kwargs):
+        ids = input_ids
+        for token in self.script[:max_new_tokens]:
+            ids = torch.cat([ids, torch.tensor([[token]])], dim=1)
+            if any(criteria(ids, None) for criteria in stopping_criteria or []):
+                break
+        return ids
+
+    def infer(self, tokenizer, **kwargs) -> str:
+        output = self.generate(input_ids=torch.zeros((1, _PROMPT_TOKENS), dtype=torch.long))
+        return _GROUNDING + " ".join(str(token) for token in output[0, _PROMPT_TOKENS:].tolist())
+
+
+@pytest.fixture
+def decoding_backend(stub_backend, monkeypatch):
+    """The stub backend with models that decode ``stub_backend.script`` token by token."""
+    stub_backend.script = list(range(100))
+    monkeypatch.setattr(
+        quantized_model.AutoModel, "from_pretrained",
+        lambda *args, **kwargs: DecodingModel(stub_backend.script),
+    )
+    return stub_backend
+
+
+def _tokens(text: str) -> list[str]:
+    return text.removeprefix(_GROUNDING).split()
+
+
+def test_repetition_is_found_at_the_tail_only():
+    loop = [1, 2, 3] + [7, 8, 9, 10] * 30
+    assert find_repetition(np.array(loop), min_repeats=8) == (4, 30)
+    # a short run of the same token, e.g. a dotted leader, is not a loop
+    assert find_repetition(np.array([5] * 20 + [6]), min_repeats=8) is None
+    assert find_repetition(np.array(list(range(300))), min_repeats=8) is None
+    assert find_repetition(np.array([4, 4] * 40 + [1, 2, 3]), min_repeats=8) is None
+
+
+def test_repetition_stops_decoding_and_keeps_one_copy(tmp_path: Path, decoding_backend):
+    decoding_backend.script = [1, 2, 3] + [7, 8, 9, 10] * 2000
+    metrics = MetricsCollector()
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None, repetition_stop=8, metrics=metrics,
+    )
+
+    with job(document="book.pdf"):
+        [text] = model.generate_batch([("prompt", tmp_path / "page.png", "tiny")])
+
+    assert _tokens(text)[:7] == ["1", "2", "3", "7", "8", "9", "10"]
+    assert len(_tokens(text)) < 12
+    [truncation] = metrics.report()["truncated_pages"]
+    assert (truncation["document"], truncation["reason"]) == ("book.pdf", "repetition")
+
+
+def test_document_budget_caps_pages_then_stops(tmp_path: Path, decoding_backend):
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None, max_new_tokens=80,
+    )
+    page = [("prompt", tmp_path / "page.png", "tiny")]
+
+    with job(document="book.pdf", max_output_tokens=130):
+        assert len(_tokens(model.generate_batch(page)[0])) == 80
+        # the budget, not the page cap, ends the second page
+        assert len(_tokens(model.generate_batch(page)[0])) == 50
+        with pytest.raises(TokenLimitError):
+            model.generate_batch(page)
+    # every job starts with a fresh budget
+    with job(document="book.pdf", max_output_tokens=130):
+        assert len(_tokens(model.generate_batch(page)[0])) == 80
+
+
+def test_cli_reports_truncated_pages(tmp_path: Path, decoding_backend, capsys):
+    decoding_backend.script = list(range(40)) * 10
+    pdf = make_pdf(tmp_path / "book.pdf", 2)
+    metrics_path = tmp_path / "metrics.json"
+
+    assert cli.main([
+        str(pdf), "-o", str(tmp_path / "book.md"), "--ocr-size", "tiny",
+        "--max-page-tokens", "60", "--metrics-out", str(metrics_path),
+    ]) == 0
+    assert "2 truncated" in capsys.readouterr().out
+    report = json.loads(metrics_path.read_text(encoding="utf-8"))
+    assert [(t["page"], t["reason"], t["output_tokens"]) for t in report["truncated_pages"]] == [
+        (1, "max_tokens", 60), (2, "max_tokens", 60),
+    ]
+
+    assert cli.main([
+        str(pdf), "-o", str(tmp_path / "capped.md"), "--ocr-size", "tiny", "--max-document-tokens", "90",
+    ]) == 1
+    assert "Output token budget exhausted" in capsys.readouterr().err
+
+
+def test_resume_redoes_the_page_cut_by_the_budget(tmp_path: Path, decoding_backend):
+    pdf = make_pdf(tmp_path / "book.pdf", 3)
+    output = tmp_path / "book.md"
+    args = [str(pdf), "-o", str(output), "--ocr-size", "tiny", "--max-page-tokens", "60"]
+
+    # page 2 gets the last 30 tokens of the budget, page 3 stops the conversion
+    assert cli.main(args + ["--max-document-tokens", "90"]) == 1
+    assert cli.main(args + ["--resume", "--max-document-tokens", "100000"]) == 0
+    pages = output.read_text(encoding="utf-8").split("\n\n")
+    assert [len(page.split()) for page in pages] == [60, 60, 60]
@@ -0,0 +1,138 @@
+"""
+Shared mmap checkpoint loading and snapshot materialization, on small dummy checkpoints.
+"""
+
+import json
+import os
+import time
+from pathlib import Path
+
+import pytest
+import torch
+
+from fast_load import (
+    MATERIALIZED_MARKER,
+    SharedCheckpoint,
+    load_safetensors_mmap,
+    materialize_snapshot,
+    materialized_revision,
+    read_safetensors_header,
+    save_safetensors,
+)
+from quantized_model import QuantizedDeepSeekOCRModel
+
+COMMIT = "c" * 40
+
+
+def _rss_anon_bytes() -> int:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+    raise RuntimeError("RssAnon not reported")
+
+
+def _dummy_shards(snapshot: Path) -> dict[str, torch.Tensor]:
+    tensors = {
+        "embed.weight": torch.randn(64, 32, dtype=torch.bfloat16),
+        "layer.0.weight": torch.randint(0, 255, (128, 16), dtype=torch.uint8),
+        "layer.0.absmax": torch.rand(32),
+        "layer.0.step": torch.tensor(7, dtype=torch.int64),
+    }
+    snapshot.mkdir(parents=True)
+    save_safetensors({k: tensors[k] for k in ("embed.weight", "layer.0.weight")}, snapshot / "model-1.safetensors")
+    save_safetensors({k: tensors[k] for k in ("layer.0.absmax", "layer.0.step")}, snapshot / "model-2.safetensors")
+    weight_map = {"embed.weight": "model-1.safetensors", "layer.0.weight": "model-1.safetensors",
+                  "layer.0.absmax": "model-2.safetensors", "layer.0.step": "model-2.safetensors"}
+    (snapshot / "model.safetensors.index.json").write_text(json.dumps({"weight_map": weight_map}))
+    (snapshot / "config.json").write_text('{"model_type": "dummy"}')
+    return tensors
+
+
+def test_replicas_share_one_mapping_per_shard(tmp_path: Path):
+    from transformers import modeling_utils
+
+    tensors = _dummy_shards(tmp_path / "snapshot")
+    shard = str(tmp_path / "snapshot" / "model-1.safetensors")
+    original = modeling_utils.load_state_dict
+
+    with SharedCheckpoint().patch_transformers() as shared:
+        first = modeling_utils.load_state_dict(shard, is_quantized=True)
+        second = modeling_utils.load_state_dict(shard)
+        assert shared.files_mapped == 1
+        assert first is not second
+        assert first["embed.weight"].data_ptr() == second["embed.weight"].data_ptr()
+        assert torch.equal(first["layer.0.weight"], tensors["layer.0.weight"])
+    assert modeling_utils.load_state_dict is original
+
+
+@pytest.mark.skipif(not Path("/proc/self/status").exists(), reason="needs /proc to read RssAnon")
+def test_mmap_load_time_and_host_ram_for_two_replicas(tmp_path: Path):
+    checkpoint = tmp_path / "model.safetensors"
+    save_safetensors({f"w{i}": torch.ones(1024, 1024, dtype=torch.float32) for i in range(8)}, checkpoint)
+    size = checkpoint.stat().st_size  # 32 MB
+
+    before = _rss_anon_bytes()
+    started_at = time.perf_counter()
+    shared = SharedCheckpoint()
+    replicas = [shared.load_state_dict(checkpoint) for _ in range(2)]
+    total = sum(float(t.sum()) for replica in replicas for t in replica.values())
+    elapsed = time.perf_counter() - started_at
+    shared_growth = _rss_anon_bytes() - before
+
+    assert total == 2 * 8 * 1024 * 1024
+    # weights stay in the page cache: touching them from two replicas adds no private copies
+    assert shared_growth < size / 4, f"{shared_growth / 1024**2:.1f} MB anonymous memory"
+    assert elapsed < 5
+
+    del replicas
+    before = _rss_anon_bytes()
+    copies = [{k: v.clone() for k, v in load_safetensors_mmap(checkpoint).items()} for _ in range(2)]
+    assert _rss_anon_bytes() - before >= size  # what one copy per replica costs
+    del copies
+
+
+def test_materialize_merges_shards_into_aligned_single_file(tmp_path: Path):
+    snapshot = tmp_path / "cache" / "snapshots" / COMMIT
+    tensors = _dummy_shards(snapshot)
+    target = tmp_path / "local-model"
+
+    materialize_snapshot(snapshot, target, COMMIT)
+
+    assert sorted(p.name for p in target.iterdir()) == ["config.json", MATERIALIZED_MARKER, "model.safetensors"]
+    assert materialized_revision(target) == COMMIT
+    data_start, header = read_safetensors_header(target / "model.safetensors")
+    assert data_start % 8 == 0
+    for name, info in header.items():
+        if name != "__metadata__":
+            assert info["data_offsets"][0] % tensors[name].element_size() == 0
+    loaded = load_safetensors_mmap(target / "model.safetensors")
+    assert loaded.keys() == tensors.keys()
+    assert all(torch.equal(loaded[name], tensor) for name, tensor in tensors.items())
+
+
+def test_model_loads_from_materialized_directory(tmp_path: Path, stub_backend, monkeypatch):
+    import quantized_model
+
+    cache_model_dir = tmp_path / f"models--{QuantizedDeepSeekOCRModel.QUANTIZED_MODEL_NAME.replace('/', '--')}"
+    _dummy_shards(cache_model_dir / "snapshots" / COMMIT)
+    (cache_model_dir / "refs").mkdir()
+    (cache_model_dir / "refs" / "main").write_text(COMMIT)
+    target = tmp_path / "local-model"
+
+    loaded_from = []
+    load_model = quantized_model.AutoModel.from_pretrained
+
+    def record_load(*args, **kwargs):
+        loaded_from.append(kwargs["pretrained_model_name_or_path"])
+        return load_model(*args, **kwargs)
+
+    monkeypatch.setattr(quantized_model.AutoModel, "from_pretrained", record_load)
+    model = QuantizedDeepSeekOCRModel(
+        model_path=tmp_path, local_only=True, enable_devices_numbers=None, materialized_path=target,
+    )
+    model.load()
+
+    assert loaded_from == [str(target)]
+    assert materialized_revision(target) == COMMIT
+    assert not os.path.islink(target / "config.json")
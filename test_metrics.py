@@ -0,0 +1,60 @@
+"""
+MetricsCollector tests: OCR event accounting and the --metrics-out report.
+"""
+
+import json
+from pathlib import Path
+
+import cli
+from conftest import make_pdf
+from metrics import MetricEvent, MetricKind, MetricsCollector, _percentile
+
+
+def test_percentile_uses_nearest_rank():
+    values = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0]
+    assert _percentile(values, 50) == 0.5
+    assert _percentile(values, 90) == 0.9
+    assert _percentile(values, 99) == 1.0
+    assert _percentile([], 50) == 0.0
+
+
+def test_document_splits_render_and_inference_time():
+    from pdf_craft import OCREvent, OCREventKind
+
+    events: list[MetricEvent] = []
+    collector = MetricsCollector(on_event=events.append)
+    with collector.document() as document:
+        for page_index, (rendered_ms, complete_ms) in enumerate([(100, 400), (50, 250)], start=1):
+            document.on_ocr_event(OCREvent(OCREventKind.START, page_index, 3))
+            document.on_ocr_event(OCREvent(OCREventKind.RENDERED, page_index, 3, cost_time_ms=rendered_ms))
+            document.on_ocr_event(OCREvent(
+                OCREventKind.COMPLETE, page_index, 3, cost_time_ms=complete_ms, input_tokens=10, output_tokens=5,
+            ))
+        document.on_ocr_event(OCREvent(OCREventKind.SKIP, 3, 3))
+
+    report = collector.report()
+    assert report["stages"]["render"] == 0.15
+    assert report["stages"]["inference"] == 0.5
+    assert report["pages"]["recognized"] == 2 and report["pages"]["skipped"] == 1
+    assert report["pages"]["latency_ms"]["max"] == 300.0
+    assert report["tokens"] == {"input": 20, "output": 10}
+    assert [e.value for e in events if e.kind == MetricKind.PAGE] == [0.3, 0.2]
+    assert events[-1].kind == MetricKind.STAGE and events[-1].name == "assembly"
+
+
+def test_metrics_out_reports_model_stages(tmp_path: Path, stub_backend, monkeypatch, capsys):
+    import torch
+
+    monkeypatch.setattr(torch.cuda, "max_memory_allocated", lambda device=None: 3 * 1024**2)
+    pdf_path = make_pdf(tmp_path / "book.pdf", 3)
+    metrics_path = tmp_path / "metrics.json"
+
+    assert cli.main([str(pdf_path), "-o", str(tmp_path / "book.md"), "--metrics-out", str(metrics_path)]) == 0
+
+    report = json.loads(metrics_path.read_text(encoding="utf-8"))
+    assert report["documents"] == 1
+    assert report["pages"]["recognized"] == 3
+    assert set(report["stages"]) == {"model_load", "render", "inference", "assembly"}
+    assert report["lock_wait"]["count"] == 3
+    assert report["devices"] == {"0": {"peak_memory_bytes": 3 * 1024**2}}
+    assert "3 pages in" in capsys.readouterr().out
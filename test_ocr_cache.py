@@ -0,0 +1,101 @@
+"""
+OCR cache tests: LRU eviction and counters, plus a CLI re-run served from cache.
+"""
+
+from pathlib import Path
+
+from huggingface_hub import constants
+
+import cli
+import quantized_model
+from conftest import make_pdf
+from ocr_cache import CachedResult, OCRCache
+from quantized_model import QuantizedDeepSeekOCRModel
+
+
+def test_hit_miss_counters_and_persistence(tmp_path: Path):
+    cache = OCRCache(tmp_path)
+    key = OCRCache.make_key("model", "rev", "digest", "prompt", 1024, 1024, False)
+
+    assert cache.get(key) is None
+    cache.put(key, CachedResult(text="hello", input_tokens=10, output_tokens=2))
+    assert cache.get(key) == CachedResult(text="hello", input_tokens=10, output_tokens=2)
+    cache.close()
+
+    reopened = OCRCache(tmp_path)
+    assert reopened.get(key) is not None
+    stats = reopened.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (1, 0, 1)
+
+
+def test_key_depends_on_every_part():
+    base = OCRCache.make_key("model", "rev", "digest", "prompt", 1024, 1024, False)
+    assert base == OCRCache.make_key("model", "rev", "digest", "prompt", 1024, 1024, False)
+    assert base != OCRCache.make_key("model", "rev2", "digest", "prompt", 1024, 1024, False)
+    assert base != OCRCache.make_key("model", "rev", "digest", "prompt", 1024, 640, True)
+
+
+def test_lru_eviction_respects_size_cap(tmp_path: Path):
+    cache = OCRCache(tmp_path, max_size_bytes=10)
+    cache.put("a", CachedResult(text="aaaa", input_tokens=0, output_tokens=0))
+    cache.put("b", CachedResult(text="bbbb", input_tokens=0, output_tokens=0))
+    assert cache.get("a") is not None  # "a" becomes most recently used
+
+    cache.put("c", CachedResult(text="cccc", input_tokens=0, output_tokens=0))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert stats.evictions == 1 and stats.size_bytes == 8
+
+
+def test_rerun_is_served_from_cache(tmp_path: Path, stub_backend, capsys):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 3)
+    cache_dir = tmp_path / "cache"
+    args = ["--cache-dir", str(cache_dir), "-v"]
+
+    assert cli.main([str(pdf_path), "-o", str(tmp_path / "first.md"), *args]) == 0
+    assert stub_backend.infer_calls == 3
+
+    assert cli.main([str(pdf_path), "-o", str(tmp_path / "second.epub"), *args]) == 0
+    assert stub_backend.infer_calls == 3
+    assert "OCR cache: 3 hits, 0 misses" in capsys.readouterr().out
+
+
+def test_results_are_keyed_by_the_downloaded_revision(tmp_path: Path, stub_backend):
+    image = tmp_path / "page.png"
+    image.write_bytes(b"page")
+
+    def run() -> None:
+        model = QuantizedDeepSeekOCRModel(
+            model_path=None, local_only=False, enable_devices_numbers=None, ocr_cache=OCRCache(tmp_path / "cache"),
+        )
+        model.generate_batch([("prompt", image, "tiny")], output_path=tmp_path)
+
+    # nothing cached yet: the first run downloads the model, then caches under its commit
+    run()
+    run()
+    assert stub_backend.infer_calls == 1
+
+    # a newer snapshot does not reuse results of the old one
+    repo_dir = f"models--{QuantizedDeepSeekOCRModel.QUANTIZED_MODEL_NAME.replace('/', '--')}"
+    model_dir = Path(constants.HF_HUB_CACHE) / repo_dir
+    (model_dir / "snapshots" / ("6" * 40)).mkdir()
+    (model_dir / "refs" / "main").write_text("6" * 40)
+    run()
+    assert stub_backend.infer_calls == 2
+
+
+def test_cache_is_skipped_while_the_revision_is_unknown(tmp_path: Path, stub_backend, monkeypatch):
+    # a model loaded without leaving a snapshot in the cache, e.g. from a custom location
+    monkeypatch.setattr(quantized_model.AutoTokenizer, "from_pretrained", lambda *args, **kwargs: object())
+    image = tmp_path / "page.png"
+    image.write_bytes(b"page")
+    cache = OCRCache(tmp_path / "cache")
+    model = QuantizedDeepSeekOCRModel(model_path=None, local_only=False, enable_devices_numbers=None, ocr_cache=cache)
+
+    model.generate_batch([("prompt", image, "tiny")], output_path=tmp_path)
+    model.generate_batch([("prompt", image, "tiny")], output_path=tmp_path)
+    assert stub_backend.infer_calls == 2
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.entries) == (0, 0, 0)
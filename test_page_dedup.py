@@ -0,0 +1,125 @@
+"""
+Blank and duplicate page detection before inference: the fingerprint, reuse
+through generate_batch and the counts in the metrics report.
+"""
+
+import io
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import cli
+from conftest import STUB_RESPONSE, make_pdf
+from metrics import MetricsCollector
+from page_dedup import PageDeduplicator, difference, fingerprint
+from quantized_model import QuantizedDeepSeekOCRModel
+from scheduler import job
+
+
+def _word_page(seed: int, offset: tuple[int, int] = (0, 0)) -> Image.Image:
+    """A page of text lines made of random-width dark words; same seed, same words."""
+    rng = np.random.default_rng(seed)
+    pixels = np.full((1754, 1240), 250, dtype=np.uint8)
+    for top in range(150, 1550, 36):
+        left = 120
+        while left < 1080:
+            width = int(rng.integers(20, 90))
+            pixels[top:top + 16, left:min(left + width, 1120)] = 30
+            left += width + int(rng.integers(10, 16))
+    # the same sheet placed slightly differently on the scanner
+    pixels = np.roll(pixels, offset, axis=(1, 0))
+    return Image.fromarray(pixels).convert("RGB")
+
+
+def _blank_page(seed: int = 0) -> Image.Image:
+    rng = np.random.default_rng(seed)
+    pixels = np.clip(rng.normal(245, 6, (1754, 1240)), 0, 255).astype(np.uint8)
+    # scanner dust
+    pixels[rng.random(pixels.shape) < 0.0002] = 40
+    return Image.fromarray(pixels).convert("RGB")
+
+
+def _title_page(text: str, size: int) -> Image.Image:
+    """A 300 DPI page with one short centred line, like a part title or dedication."""
+    image = Image.new("RGB", (2480, 3508), (250, 250, 250))
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=size)
+    draw.text(((2480 - draw.textlength(text, font=font)) / 2, 1700), text, fill=(30, 30, 30), font=font)
+    return image
+
+
+def _jpeg(image: Image.Image) -> Image.Image:
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=40)
+    return Image.open(io.BytesIO(buffer.getvalue())).convert("RGB")
+
+
+def test_fingerprint_tells_blank_duplicate_and_distinct_pages():
+    page = fingerprint(_word_page(1))
+    assert fingerprint(_blank_page()).blank
+    assert fingerprint(_jpeg(_blank_page())).blank
+    assert not page.blank
+    assert not fingerprint(_title_page("Part II", 40)).blank
+
+    assert difference(page, fingerprint(_jpeg(_word_page(1)))) < 0.15
+    assert difference(page, fingerprint(_word_page(1, offset=(9, 6)))) < 0.15
+    for seed in range(2, 6):
+        assert difference(page, fingerprint(_word_page(seed))) > 0.25
+
+
+def test_duplicates_reuse_results_within_a_document(stub_backend):
+    metrics = MetricsCollector()
+    dedup = PageDeduplicator()
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None, page_dedup=dedup, metrics=metrics,
+    )
+    prompt = "<image>\nConvert the document to markdown."
+
+    with job(document="a.pdf"):
+        first = model.generate_batch([(prompt, _word_page(1), "tiny"), (prompt, _blank_page(), "tiny")])
+        again = model.generate_batch([(prompt, _jpeg(_word_page(1)), "tiny"), (prompt, _word_page(2), "tiny")])
+        # a different size is recognized on its own
+        model.generate_batch([(prompt, _word_page(1), "small")])
+    with job(document="b.pdf"):
+        model.generate_batch([(prompt, _word_page(1), "tiny")])
+
+    assert first == [STUB_RESPONSE, ""]
+    assert again[0] == first[0]
+    assert stub_backend.infer_calls == 4
+    stats = dedup.stats()
+    assert (stats.blank, stats.reused, stats.unique) == (1, 1, 4)
+    pages = metrics.report()["pages"]
+    assert (pages["blank"], pages["reused"]) == (1, 1)
+
+
+def test_threshold_zero_only_skips_blank_pages(stub_backend):
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None,
+        page_dedup=PageDeduplicator(max_difference=0),
+    )
+    items = [("prompt", _word_page(1), "tiny")] * 2 + [("prompt", _blank_page(), "tiny")]
+    model.generate_batch(items[:1])
+    assert model.generate_batch(items[1:]) == [STUB_RESPONSE, ""]
+    assert stub_backend.infer_calls == 2
+
+
+def test_cli_reports_skipped_blank_pages(tmp_path: Path, stub_backend, monkeypatch, capsys):
+    from pdf_craft.pdf.handler import DefaultPDFDocument
+
+    def render(self, page_index: int, dpi: int) -> Image.Image:
+        return _blank_page() if page_index == 2 else _word_page(page_index % 2)
+
+    monkeypatch.setattr(DefaultPDFDocument, "render_page", render)
+    pdf = make_pdf(tmp_path / "book.pdf", 4)
+    metrics_path = tmp_path / "metrics.json"
+
+    assert cli.main([
+        str(pdf), "-o", str(tmp_path / "book.md"), "--ocr-size", "tiny",
+        "--dedup-pages", "--metrics-out", str(metrics_path),
+    ]) == 0
+
+    # page 2 is blank and page 3 repeats page 1
+    assert stub_backend.infer_calls == 2
+    assert "1 blank skipped, 1 duplicates reused" in capsys.readouterr().out
+    assert '"reused": 1' in metrics_path.read_text(encoding="utf-8")
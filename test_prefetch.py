@@ -0,0 +1,78 @@
+"""
+PrefetchPDFHandler tests with a picklable fake renderer and a sleeping fake model.
+"""
+
+import time
+from pathlib import Path
+
+import cli
+from conftest import SlowRenderHandler, make_pdf
+from prefetch import PrefetchPDFHandler, _render_page, prefetch_max_side
+
+
+def test_prefetch_is_bounded_and_downscales(tmp_path: Path):
+    handler = PrefetchPDFHandler(prefetch=2, max_side=prefetch_max_side("base"), inner=SlowRenderHandler(6))
+    try:
+        document = handler.open(tmp_path / "book.pdf")
+        assert max(document.render_page(1, 300).size) == 2048
+        assert document.pending_pages == [2, 3]
+        document.render_page(2, 300)
+        assert document.pending_pages == [3, 4]
+        # pages 3 and 4 already have results and are skipped, e.g. on --resume
+        document.render_page(5, 300)
+        assert document.pending_pages == [6]
+        document.close()
+    finally:
+        handler.close()
+
+
+def test_rendering_overlaps_inference(tmp_path: Path):
+    render_delay, infer_delay, pages = 0.2, 0.2, 5
+    # small pages: only the sleeps should count, not pickling on a busy CI box
+    handler = PrefetchPDFHandler(prefetch=2, workers=2, inner=SlowRenderHandler(pages, render_delay, (620, 877)))
+    try:
+        # start both workers up front so process start-up is not timed
+        warm_up = SlowRenderHandler(1, size=(10, 10))
+        for future in [handler.executor().submit(time.sleep, 0.2) for _ in range(2)]:
+            future.result()
+        for future in [handler.executor().submit(_render_page, warm_up, tmp_path, 1, 300, None) for _ in range(2)]:
+            future.result()
+        document = handler.open(tmp_path / "book.pdf")
+        started_at = time.perf_counter()
+        inferred_at: list[float] = []
+        rendered_at: list[float] = []
+        for page_index in range(1, pages + 1):
+            image = document.render_page(page_index, 300)
+            rendered_at.append(image.info["rendered_at"])
+            time.sleep(infer_delay)  # the fake model
+            inferred_at.append(time.time())
+        elapsed = time.perf_counter() - started_at
+        document.close()
+    finally:
+        handler.close()
+
+    # every next page was ready before the fake model finished the current one
+    assert all(rendered_at[i + 1] <= inferred_at[i] for i in range(pages - 1))
+    # serial rendering would take pages * (render + infer); pipelined is ~render + pages * infer
+    assert elapsed < 0.85 * pages * (render_delay + infer_delay)
+
+
+def test_convert_with_prefetch_handler(tmp_path: Path, stub_backend):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 3)
+    handler = PrefetchPDFHandler(prefetch=2, max_side=prefetch_max_side("gundam"), inner=SlowRenderHandler(3))
+    try:
+        cli.convert_to_markdown(
+            pdf_path=pdf_path,
+            output_path=tmp_path / "book.md",
+            assets_path=None,
+            ocr_size="gundam",
+            local_only=False,
+            includes_footnotes=False,
+            ignore_pdf_errors=False,
+            verbose=False,
+            transform=cli.create_transform(False, handler),
+        )
+    finally:
+        handler.close()
+    assert stub_backend.infer_calls == 3
+    assert (tmp_path / "book.md").read_text(encoding="utf-8").count("Stub page text.") == 3
@@ -0,0 +1,92 @@
+"""
+Model residency policy with a fake clock, and transparent reload through generate.
+"""
+
+from pathlib import Path
+
+from quantized_model import QuantizedDeepSeekOCRModel
+from residency import ResidencyEventKind, ResidencyManager
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeModel:
+    def __init__(self) -> None:
+        self.unloads = 0
+
+    def unload(self) -> None:
+        self.unloads += 1
+
+
+def _manager(**options) -> tuple[ResidencyManager, FakeModel, FakeClock, list]:
+    model, clock, events = FakeModel(), FakeClock(), []
+    manager = ResidencyManager(unload=model.unload, clock=clock, on_event=events.append, **options)
+    return manager, model, clock, events
+
+
+def test_idle_timeout_unloads_after_last_use():
+    manager, model, clock, events = _manager(idle_timeout=60)
+    manager.record_load()
+    clock.now += 50
+    with manager.active():
+        clock.now += 30  # a long request does not count as idle time
+    clock.now += 59
+    assert manager.poll() is False
+
+    clock.now += 1
+    assert manager.poll() is True
+    assert model.unloads == 1
+    assert [(e.kind, e.reason) for e in events] == [
+        (ResidencyEventKind.LOAD, "demand"),
+        (ResidencyEventKind.UNLOAD, "idle"),
+    ]
+    assert events[-1].resident_seconds == 140
+    stats = manager.stats()
+    assert (stats.resident, stats.loads, stats.unloads, stats.resident_seconds) == (False, 1, 1, 140)
+    assert manager.poll() is False  # nothing left to unload
+
+
+def test_memory_pressure_waits_for_running_requests():
+    pressure = [False]
+    manager, model, clock, events = _manager(pressure_check=lambda: pressure[0])
+    manager.record_load()
+
+    with manager.active():
+        pressure[0] = True
+        assert manager.poll() is False
+        assert model.unloads == 0
+        clock.now += 5
+    assert model.unloads == 1
+    assert (events[-1].reason, events[-1].resident_seconds) == ("pressure", 5)
+
+    manager.record_load()
+    assert manager.memory_pressure() is True
+    assert model.unloads == 2
+
+
+def test_generate_reloads_transparently_after_unload(tmp_path: Path, stub_backend):
+    pressure = [False]
+    events = []
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None,
+        local_only=False,
+        enable_devices_numbers=None,
+        memory_pressure=lambda: pressure[0],
+        on_residency_event=events.append,
+    )
+    model.generate("<image>", tmp_path / "a.png", tmp_path, "tiny", None, None)
+    pressure[0] = True
+    assert model.residency.poll() is True
+    assert model.replica_stats() == []
+
+    pressure[0] = False
+    model.generate("<image>", tmp_path / "b.png", tmp_path, "tiny", None, None)
+    assert stub_backend.model_loads == 2
+    assert [e.kind for e in events] == [ResidencyEventKind.LOAD, ResidencyEventKind.UNLOAD, ResidencyEventKind.LOAD]
+    model.residency.close()
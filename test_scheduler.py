@@ -0,0 +1,207 @@
+"""
+Replica scheduler tests with fake replicas, plus multi-device dispatch through generate.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from scheduler import JobInfo, Priority, ReplicaScheduler, job
+
+
+def _run_fake_pages(scheduler: ReplicaScheduler, pages: int, page_seconds: float) -> tuple[float, list[int]]:
+    used: list[int] = []
+    peak = [0] * scheduler.replica_count
+    lock = threading.Lock()
+    busy = [0] * scheduler.replica_count
+
+    def fake_generate() -> None:
+        with scheduler.acquire() as index:
+            with lock:
+                used.append(index)
+                busy[index] += 1
+                peak[index] = max(peak[index], busy[index])
+            time.sleep(page_seconds)
+            with lock:
+                busy[index] -= 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        for future in [pool.submit(fake_generate) for _ in range(pages)]:
+            future.result()
+    assert max(peak) == 1
+    return time.perf_counter() - start, used
+
+
+def test_dispatches_to_least_busy_replica():
+    scheduler = ReplicaScheduler(replica_count=3)
+    with scheduler.acquire() as first, scheduler.acquire() as second:
+        with scheduler.acquire() as third:
+            assert {first, second, third} == {0, 1, 2}
+        assert [s.inflight for s in scheduler.stats()] == [1, 1, 0]
+    assert [s.dispatched for s in scheduler.stats()] == [1, 1, 1]
+
+
+def test_throughput_scales_with_replicas():
+    serial, _ = _run_fake_pages(ReplicaScheduler(replica_count=1), pages=8, page_seconds=0.05)
+    parallel, used = _run_fake_pages(ReplicaScheduler(replica_count=4), pages=8, page_seconds=0.05)
+
+    assert sorted(used.count(i) for i in range(4)) == [2, 2, 2, 2]
+    assert parallel < serial / 2.5
+
+
+def test_pinned_requests_wait_for_their_replica():
+    scheduler = ReplicaScheduler(replica_count=2)
+    order: list[str] = []
+
+    with scheduler.acquire(1):
+        def pinned() -> None:
+            with scheduler.acquire(1):
+                order.append("pinned")
+
+        thread = threading.Thread(target=pinned)
+        thread.start()
+        time.sleep(0.05)
+        # Replica 0 is idle, so an unpinned request is not held up by the queued pinned one
+        with scheduler.acquire() as index:
+            order.append(f"auto-{index}")
+    thread.join()
+    assert order == ["auto-0", "pinned"]
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _grant_order(
+    scheduler: ReplicaScheduler,
+    jobs: list[tuple[str, JobInfo]],
+    holder: JobInfo | None = None,
+) -> list[str]:
+    """Queue one simulated page per job behind a busy replica, then record the grant order."""
+    order: list[str] = []
+    threads = []
+
+    def page(label: str, info: JobInfo) -> None:
+        with scheduler.acquire(job=info):
+            order.append(label)
+
+    with scheduler.acquire(job=holder):
+        for depth, (label, info) in enumerate(jobs, start=1):
+            thread = threading.Thread(target=page, args=(label, info))
+            thread.start()
+            threads.append(thread)
+            while scheduler.queue_depth() < depth:
+                time.sleep(0.001)
+    for thread in threads:
+        thread.join()
+    return order
+
+
+def test_interactive_pages_jump_ahead_of_bulk_pages():
+    bulk = JobInfo(document="book.pdf", priority=Priority.BULK)
+    interactive = JobInfo(document="memo.pdf", priority=Priority.INTERACTIVE)
+    jobs = [(f"book-{i}", bulk) for i in range(4)] + [(f"memo-{i}", interactive) for i in range(2)]
+
+    scheduler = ReplicaScheduler(replica_count=1)
+    assert _grant_order(scheduler, jobs) == ["memo-0", "memo-1", "book-0", "book-1", "book-2", "book-3"]
+
+    stats = {s.priority: s for s in scheduler.monitor.stats()}
+    assert (stats[Priority.BULK].granted, stats[Priority.INTERACTIVE].granted) == (4, 2)
+    assert all(s.waiting == 0 for s in stats.values())
+    assert stats[Priority.BULK].wait_seconds_max >= stats[Priority.INTERACTIVE].wait_seconds_max
+
+
+def test_documents_share_the_replica_fairly():
+    scheduler = ReplicaScheduler(replica_count=1)
+    book = JobInfo(document="book.pdf")
+    memo = JobInfo(document="memo.pdf")
+    # The book is already being recognized; the short memo arrives behind 6 of its pages
+    jobs = [(f"book-{i}", book) for i in range(6)] + [(f"memo-{i}", memo) for i in range(3)]
+    order = _grant_order(scheduler, jobs, holder=book)
+    assert order == ["book-0", "memo-0", "book-1", "memo-1", "book-2", "memo-2", "book-3", "book-4", "book-5"]
+
+
+def test_overdue_deadline_is_served_first_and_counted():
+    clock = FakeClock()
+    scheduler = ReplicaScheduler(replica_count=1, clock=clock)
+    late = JobInfo(document="late.pdf", priority=Priority.BULK, deadline=clock.now + 10)
+    soon = JobInfo(document="soon.pdf", deadline=clock.now + 60)
+    plain = JobInfo(document="plain.pdf")
+
+    clock.now += 30  # late's deadline passes while the replica is busy
+    order = _grant_order(scheduler, [("plain", plain), ("soon", soon), ("late", late)])
+
+    assert order == ["late", "soon", "plain"]
+    misses = {s.priority: s.deadline_misses for s in scheduler.monitor.stats()}
+    assert misses == {Priority.INTERACTIVE: 0, Priority.NORMAL: 0, Priority.BULK: 1}
+
+
+def test_job_context_is_inherited_by_nested_jobs():
+    with job(priority="bulk", timeout=5) as outer:
+        with job(document="a.pdf") as inner:
+            assert (inner.document, inner.priority, inner.deadline) == ("a.pdf", Priority.BULK, outer.deadline)
+    with pytest.raises(ValueError):
+        with job(priority="urgent"):
+            pass
+
+
+def test_rejects_invalid_replica():
+    with pytest.raises(ValueError):
+        with ReplicaScheduler(replica_count=2).acquire(2):
+            pass
+
+
+def test_generate_spreads_pages_over_devices(tmp_path: Path, stub_backend, monkeypatch):
+    import torch
+    from quantized_model import QuantizedDeepSeekOCRModel
+
+    monkeypatch.setattr(torch.cuda, "device_count", lambda: 2)
+    model = QuantizedDeepSeekOCRModel(model_path=None, local_only=False, enable_devices_numbers=None)
+    model.load()
+    for stub in stub_backend.models:
+        stub.delay = 0.05
+
+    image_path = tmp_path / "page.png"
+    image_path.write_bytes(b"")
+
+    def generate() -> str:
+        return model.generate(
+            prompt="<image>",
+            image_path=image_path,
+            output_path=tmp_path,
+            size="tiny",
+            context=None,
+            device_number=None,
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(lambda _: generate(), range(4)))
+
+    assert len(results) == 4
+    assert [len(m.infer_calls) for m in stub_backend.models] == [2, 2]
+    assert [s.dispatched for s in model.replica_stats()] == [2, 2]
+
+
+def test_generate_queues_under_the_callers_job(tmp_path: Path, stub_backend):
+    from quantized_model import QuantizedDeepSeekOCRModel
+    from scheduler import QueueMonitor
+
+    monitor = QueueMonitor()
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None, batch_size=1, queue_monitor=monitor,
+    )
+    items = [("<image>", tmp_path / f"{i}.png", "tiny") for i in range(3)]
+    with job(document="memo.pdf", priority="interactive"):
+        model.generate_batch(items, output_path=tmp_path)
+
+    granted = {s.priority: s.granted for s in model.queue_stats()}
+    assert granted == {Priority.INTERACTIVE: 3, Priority.NORMAL: 0, Priority.BULK: 0}
+    assert monitor.report()["interactive"]["waiting"] == 0
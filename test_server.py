@@ -0,0 +1,115 @@
+"""
+Conversion server tests: a real HTTP server on an ephemeral port, CPU stub model.
+"""
+
+import argparse
+import threading
+from pathlib import Path
+
+import pytest
+
+import cli
+from conftest import make_pdf
+from server import (
+    ConversionServer,
+    ConversionService,
+    _ocr_model,
+    request_conversion,
+    request_model_action,
+)
+
+
+@pytest.fixture
+def server_url(stub_backend):
+    server = ConversionServer(('127.0.0.1', 0), ConversionService(local_only=False))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    try:
+        yield f"http://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_convert_streams_progress_and_keeps_model_loaded(tmp_path: Path, server_url, stub_backend):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 2)
+    events: list[dict] = []
+
+    for name in ("first.md", "second.md"):
+        done = request_conversion(
+            server_url,
+            {'pdf_path': str(pdf_path), 'output_path': str(tmp_path / name)},
+            on_event=events.append,
+        )
+        assert done['output_path'] == str(tmp_path / name)
+
+    assert stub_backend.model_loads == 1
+    completed = [e for e in events if e['kind'] == 'COMPLETE']
+    assert [e['page_index'] for e in completed] == [1, 2, 1, 2]
+    assert all(e['total_pages'] == 2 for e in completed)
+    assert "Stub page text." in (tmp_path / "second.md").read_text(encoding="utf-8")
+
+
+def test_load_and_unload(tmp_path: Path, server_url, stub_backend):
+    assert request_model_action(server_url, 'status')['loaded'] is False
+    assert request_model_action(server_url, 'load')['loaded'] is True
+    assert request_model_action(server_url, 'unload')['loaded'] is False
+
+    pdf_path = make_pdf(tmp_path / "book.pdf", 1)
+    request_conversion(server_url, {'pdf_path': str(pdf_path), 'output_path': str(tmp_path / "out.epub")})
+    assert (tmp_path / "out.epub").exists()
+    assert stub_backend.model_loads == 2
+
+
+def test_job_errors_are_reported(tmp_path: Path, server_url):
+    with pytest.raises(RuntimeError, match="Input file not found"):
+        request_conversion(server_url, {
+            'pdf_path': str(tmp_path / "missing.pdf"),
+            'output_path': str(tmp_path / "out.md"),
+        })
+    with pytest.raises(RuntimeError, match="pdf_path and output_path are required"):
+        request_conversion(server_url, {'pdf_path': str(tmp_path / "missing.pdf")})
+
+
+def test_cli_client_uses_server(tmp_path: Path, server_url, stub_backend, capsys):
+    pdf_path = make_pdf(tmp_path / "book.pdf", 1)
+    output_path = tmp_path / "book.md"
+
+    assert cli.main([str(pdf_path), "-o", str(output_path), "--server", server_url, "-v"]) == 0
+
+    assert output_path.exists()
+    assert "Page 1/1: complete" in capsys.readouterr().out
+
+
+def test_residency_events_during_load_and_unload(stub_backend, monkeypatch):
+    # configure_model_patch replaces these module globals; restore them afterwards
+    monkeypatch.setattr(cli, "_patch_options", {})
+    monkeypatch.setattr(cli, "_patch_installed", False)
+    service = ConversionService(local_only=False)
+    parser = argparse.ArgumentParser()
+    cli.add_model_arguments(parser)
+    cli.configure_model_patch(
+        parser.parse_args([]),
+        queue_monitor=service.queue_monitor,
+        idle_unload_seconds=60,
+        on_residency_event=service.on_residency_event,
+    )
+
+    loader = threading.Thread(target=service.load, daemon=True)
+    loader.start()
+    loader.join(timeout=30)
+    assert not loader.is_alive()
+    assert service.status()['residency']['loads'] == 1
+    model = _ocr_model(service._transform)
+    assert model.residency.resident
+    timer = model.residency._thread
+    assert timer is not None and timer.is_alive()
+
+    service.unload()
+    status = service.status()
+    assert status['loaded'] is False
+    assert (status['residency']['resident'], status['residency']['unloads']) == (False, 1)
+    # the weights are released at once and the idle timer thread is gone
+    assert model._models is None
+    assert not timer.is_alive()
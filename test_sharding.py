@@ -0,0 +1,89 @@
+"""
+Page range / shard selection and the shard -> merge round trip.
+"""
+
+from pathlib import Path
+
+import pytest
+
+import cli
+from conftest import STUB_RESPONSE, make_pdf
+from scheduler import Priority, current_job
+from sharding import PartManifest, parse_page_ranges, parse_shard, select_pages
+
+
+def test_parse_page_ranges():
+    assert parse_page_ranges("1-200,350-") == [(1, 200), (350, None)]
+    assert parse_page_ranges("7, 9-9") == [(7, 7), (9, 9)]
+    for bad in ("", "0-3", "5-2", "a-b"):
+        with pytest.raises(ValueError):
+            parse_page_ranges(bad)
+
+
+def test_parse_shard():
+    assert parse_shard("2/4") == (2, 4)
+    for bad in ("0/4", "5/4", "2", "x/y"):
+        with pytest.raises(ValueError):
+            parse_shard(bad)
+
+
+def test_shards_are_contiguous_and_cover_the_selection():
+    ranges = parse_page_ranges("1-5,8-")
+    shards = [select_pages(12, ranges, (i, 3)) for i in range(1, 4)]
+    assert shards == [[1, 2, 3, 4], [5, 8, 9], [10, 11, 12]]
+    assert select_pages(2, None, (3, 3)) == []
+
+
+def test_shard_and_merge_round_trip(tmp_path: Path, stub_backend, capsys):
+    pdf_path = make_pdf(tmp_path / "big.pdf", 5)
+    parts = [tmp_path / "parts" / str(i) for i in (1, 2)]
+
+    for i, part in enumerate(parts, start=1):
+        assert cli.main([str(pdf_path), "--shard", f"{i}/2", "-o", str(part)]) == 0
+    assert PartManifest.load(parts[0]).pages == [1, 2, 3]
+    assert PartManifest.load(parts[1]).pages == [4, 5]
+    assert stub_backend.infer_calls == 5
+
+    output_path = tmp_path / "big.md"
+    assert cli.main(["merge", str(parts[1]), str(parts[0]), "-o", str(output_path)]) == 0
+    assert output_path.read_text(encoding="utf-8").count("Stub page text.") == 5
+    assert "Merged 5 page(s) from 2 shard(s)" in capsys.readouterr().out
+
+
+def test_merge_refuses_missing_pages(tmp_path: Path, stub_backend, capsys):
+    pdf_path = make_pdf(tmp_path / "big.pdf", 4)
+    part = tmp_path / "part"
+    assert cli.main([str(pdf_path), "--pages", "2-3", "-o", str(part)]) == 0
+
+    output_path = tmp_path / "big.md"
+    assert cli.main(["merge", str(part), "-o", str(output_path)]) == 1
+    assert "first missing page: 1" in capsys.readouterr().err
+
+    assert cli.main(["merge", str(part), "-o", str(output_path), "--allow-gaps"]) == 0
+    assert output_path.read_text(encoding="utf-8").count("Stub page text.") == 2
+
+
+def test_merge_refuses_shards_with_different_model_options(tmp_path: Path, stub_backend, capsys):
+    pdf_path = make_pdf(tmp_path / "big.pdf", 2)
+    parts = [tmp_path / "parts" / str(i) for i in (1, 2)]
+    assert cli.main([str(pdf_path), "--shard", "1/2", "-o", str(parts[0])]) == 0
+    assert cli.main([str(pdf_path), "--shard", "2/2", "-o", str(parts[1]), "--max-page-tokens", "100"]) == 0
+    assert PartManifest.load(parts[1]).options == {"max_new_tokens": 100}
+
+    assert cli.main(["merge", *map(str, parts), "-o", str(tmp_path / "big.md")]) == 1
+    assert "used different options" in capsys.readouterr().err
+    assert not (tmp_path / "big.md").exists()
+
+
+def test_partial_run_queues_pages_as_one_document_job(tmp_path: Path, stub_backend):
+    pdf_path = make_pdf(tmp_path / "big.pdf", 2)
+    jobs = []
+    stub_backend.response = lambda kwargs: jobs.append(current_job()) or STUB_RESPONSE
+    assert cli.main([
+        str(pdf_path), "--pages", "1", "-o", str(tmp_path / "part"),
+        "--priority", "bulk", "--max-document-tokens", "1000",
+    ]) == 0
+
+    [info] = jobs
+    assert (info.document, info.priority) == (str(pdf_path.resolve()), Priority.BULK)
+    assert info.budget is not None and info.budget.max_output_tokens == 1000
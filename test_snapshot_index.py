@@ -0,0 +1,92 @@
+"""
+Snapshot resolution index over a fake Hugging Face cache directory.
+"""
+
+import os
+from pathlib import Path
+
+import pytest
+
+import snapshot_index
+from quantized_model import QuantizedDeepSeekOCRModel
+from snapshot_index import MANIFEST_NAME, SnapshotIndex
+
+COMMIT_A = "a" * 40
+COMMIT_B = "b" * 40
+
+
+@pytest.fixture(autouse=True)
+def _fresh_memory(monkeypatch):
+    monkeypatch.setattr(snapshot_index, "_memory", {})
+
+
+def _make_cache(root: Path, *commits: str, main: str | None = None) -> Path:
+    model_dir = root / f"models--{QuantizedDeepSeekOCRModel.QUANTIZED_MODEL_NAME.replace('/', '--')}"
+    blobs = model_dir / "blobs"
+    blobs.mkdir(parents=True, exist_ok=True)
+    for commit in commits:
+        snapshot = model_dir / "snapshots" / commit
+        snapshot.mkdir(parents=True)
+        blob = blobs / f"{commit[:8]}-weights"
+        blob.write_bytes(b"weights")
+        os.symlink(os.path.relpath(blob, snapshot), snapshot / "model.safetensors")
+        (snapshot / "config.json").write_text("{}")
+    if main is not None:
+        _set_ref(model_dir, main)
+    return model_dir
+
+
+def _set_ref(model_dir: Path, commit: str) -> None:
+    (model_dir / "refs").mkdir(exist_ok=True)
+    ref = model_dir / "refs" / "main"
+    ref.write_text(commit)
+    # make the change visible even on filesystems with coarse mtimes
+    stat = ref.stat()
+    os.utime(ref, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_resolve_writes_manifest_and_reuses_it_until_refs_change(tmp_path: Path, monkeypatch):
+    model_dir = _make_cache(tmp_path, COMMIT_A, COMMIT_B, main=COMMIT_A)
+
+    snapshot = SnapshotIndex(model_dir).resolve()
+    assert snapshot.revision == COMMIT_A
+    assert snapshot.files == {"config.json": "size:2", "model.safetensors": "aaaaaaaa-weights"}
+    assert (model_dir / MANIFEST_NAME).exists()
+
+    # a fresh process (empty memory cache) is served from the manifest without scanning
+    file_checksums = snapshot_index._file_checksums
+    monkeypatch.setattr(snapshot_index, "_memory", {})
+    monkeypatch.setattr(snapshot_index, "_file_checksums", lambda path: pytest.fail("rescanned"))
+    assert SnapshotIndex(model_dir).resolve() == snapshot
+
+    monkeypatch.setattr(snapshot_index, "_file_checksums", file_checksums)
+    _set_ref(model_dir, COMMIT_B)
+    assert SnapshotIndex(model_dir).resolve().revision == COMMIT_B
+
+
+def test_pinned_commit_ignores_refs(tmp_path: Path):
+    model_dir = _make_cache(tmp_path, COMMIT_A, COMMIT_B, main=COMMIT_B)
+    index = SnapshotIndex(model_dir)
+
+    assert index.resolve(COMMIT_A).path == model_dir / "snapshots" / COMMIT_A
+    assert index.resolve("c" * 40) is None
+    assert index.resolve("v2") is None
+
+
+def test_pinned_revision_loads_the_cached_snapshot_offline(tmp_path: Path, stub_backend, monkeypatch):
+    import quantized_model
+
+    model_dir = _make_cache(tmp_path, COMMIT_A, COMMIT_B, main=COMMIT_B)
+    loaded_from = []
+    load_model = quantized_model.AutoModel.from_pretrained
+
+    def record_load(*args, **kwargs):
+        loaded_from.append((kwargs["pretrained_model_name_or_path"], kwargs["local_files_only"]))
+        return load_model(*args, **kwargs)
+
+    monkeypatch.setattr(quantized_model.AutoModel, "from_pretrained", record_load)
+    model = QuantizedDeepSeekOCRModel(
+        model_path=tmp_path, local_only=False, enable_devices_numbers=None, revision=COMMIT_A,
+    )
+    model.load()
+    assert loaded_from == [(str(model_dir / "snapshots" / COMMIT_A), True)]
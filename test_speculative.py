@@ -0,0 +1,150 @@
+"""
+Speculative two-tier OCR: the page confidence score, the draft pass with
+re-runs of low-confidence pages, caching of both results and the report.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+
+import cli
+import quantized_model
+from auto_size import PageFeatures
+from confidence import score_page
+from conftest import make_pdf
+from metrics import MetricsCollector
+from ocr_cache import OCRCache
+from quantized_model import QuantizedDeepSeekOCRModel
+from scheduler import job
+
+_PROMPT_TOKENS = 5
+_VOCABULARY = 50
+_GROUNDING = "<|ref|>text<|/ref|><|det|>[[100, 100, 900, 200]]<|/det|>\n"
+_FEATURES = PageFeatures(width=600, height=800, ink_ratio=0.01, text_lines=3, columns=1)
+
+
+class ScoringModel:
+    """Decodes through ``generate`` with real logits; sizes in ``backend.blurry`` decode unsure."""
+
+    def __init__(self, backend) -> None:
+        self.backend = backend
+
+    def generate(self, input_ids, logits_processor=None, sharpness=12.0, **kwargs):
+        ids = input_ids
+        for token in range(1, 21):
+            scores = torch.zeros((1, _VOCABULARY))
+            scores[0, token] = sharpness
+            for processor in logits_processor or []:
+                scores = processor(ids, scores)
+            ids = torch.cat([ids, scores.argmax(dim=-1, keepdim=True)], dim=1)
+        return ids
+
+    def infer(self, tokenizer, base_size, **kwargs) -> str:
+        self.backend.sizes.append(base_size)
+        sharpness = 1.0 if base_size in self.backend.blurry else 12.0
+        output = self.generate(input_ids=torch.zeros((1, _PROMPT_TOKENS), dtype=torch.long), sharpness=sharpness)
+        words = " ".join(f"w{token}" for token in output[0, _PROMPT_TOKENS:].tolist())
+        return f"{_GROUNDING}Read at {base_size}\n{words}"
+
+
+@pytest.fixture
+def scoring_backend(stub_backend, monkeypatch):
+    """The stub backend with models whose confidence depends on the recognition size."""
+    stub_backend.sizes = []
+    stub_backend.blurry = set()
+    monkeypatch.setattr(
+        quantized_model.AutoModel, "from_pretrained", lambda *args, **kwargs: ScoringModel(stub_backend),
+    )
+    return stub_backend
+
+
+def _page() -> Image.Image:
+    return Image.new("RGB", (600, 800), "white")
+
+
+def test_score_combines_token_probabilities_repetition_and_characters():
+    text = _GROUNDING + "A clean line of text.\nAnother clean line."
+    confident = score_page(text, np.full(20, -0.01), _FEATURES)
+    assert confident.score > 0.95 and not confident.degenerate
+
+    assert score_page(text, np.full(20, -2.0), _FEATURES).score < 0.2
+    # a few unsure tokens on an otherwise confident page
+    assert score_page(text, np.array([-0.01] * 16 + [-3.0] * 4), _FEATURES).score < 0.85
+    garbled = score_page(text + "\ufffd\ue000\x07", np.full(20, -0.01), _FEATURES)
+    assert garbled.score < 0.5 and garbled.garbled_ratio > 0.05
+    looping = score_page("\n".join(["the same line"] * 12), np.full(20, -0.01), _FEATURES)
+    assert looping.degenerate and looping.score == 0.0
+    # without recorded decoding only the text is judged
+    assert score_page(text, None, _FEATURES).score == 1.0
+
+
+def test_draft_is_kept_when_confident_and_rerun_when_not(scoring_backend):
+    metrics = MetricsCollector()
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None,
+        draft_size="tiny", metrics=metrics,
+    )
+
+    with job(document="book.pdf"):
+        [kept] = model.generate_batch([("prompt", _page(), "base")])
+        assert scoring_backend.sizes == [512]
+        scoring_backend.blurry = {512}
+        [rerun] = model.generate_batch([("prompt", _page(), "base")])
+        assert scoring_backend.sizes == [512, 512, 1024]
+        # pages already at or below the draft size are recognized once
+        model.generate_batch([("prompt", _page(), "tiny")])
+        assert scoring_backend.sizes == [512, 512, 1024, 512]
+
+    assert "Read at 512" in kept
+    assert "Read at 1024" in rerun
+    report = metrics.report()
+    assert (report["pages"]["drafted"], report["pages"]["escalated"]) == (2, 1)
+    [escalation] = report["escalated_pages"]
+    assert (escalation["document"], escalation["draft_size"], escalation["size"]) == ("book.pdf", "tiny", "base")
+    assert escalation["confidence"] < 0.85
+
+
+def test_both_results_are_cached(tmp_path: Path, scoring_backend):
+    scoring_backend.blurry = {512}
+    model = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None,
+        ocr_cache=OCRCache(tmp_path / "cache"), draft_size="tiny",
+    )
+    [rerun] = model.generate_batch([("prompt", _page(), "base")])
+    assert scoring_backend.sizes == [512, 1024]
+
+    assert model.generate_batch([("prompt", _page(), "base")]) == [rerun]
+    [draft] = model.generate_batch([("prompt", _page(), "tiny")])
+    assert "Read at 512" in draft
+    # the direct base result is not mixed up with the speculative one
+    plain = QuantizedDeepSeekOCRModel(
+        model_path=None, local_only=False, enable_devices_numbers=None, ocr_cache=OCRCache(tmp_path / "cache"),
+    )
+    plain.generate_batch([("prompt", _page(), "base")])
+    assert scoring_backend.sizes == [512, 1024, 1024]
+
+
+def test_cli_reports_escalated_pages(tmp_path: Path, scoring_backend, capsys):
+    scoring_backend.blurry = {512}
+    pdf = make_pdf(tmp_path / "book.pdf", 2)
+    metrics_path = tmp_path / "metrics.json"
+
+    assert cli.main([
+        str(pdf), "-o", str(tmp_path / "book.md"), "--ocr-size", "base",
+        "--draft-size", "tiny", "--metrics-out", str(metrics_path),
+    ]) == 0
+    assert "2/2 drafts escalated" in capsys.readouterr().out
+    report = json.loads(metrics_path.read_text(encoding="utf-8"))
+    assert [(page["page"], page["size"]) for page in report["escalated_pages"]] == [(1, "base"), (2, "base")]
+    assert "Read at 1024" in (tmp_path / "book.md").read_text(encoding="utf-8")
+
+    # a low enough threshold keeps every draft
+    assert cli.main([
+        str(pdf), "-o", str(tmp_path / "draft.md"), "--ocr-size", "base",
+        "--draft-size", "tiny", "--min-confidence", "0",
+    ]) == 0
+    assert scoring_backend.sizes[-2:] == [512, 512]
@@ -0,0 +1,118 @@
+"""
+Streaming Markdown: per-page chunks, paragraphs joined across pages, footnotes, stdout output.
+"""
+
+import importlib
+import itertools
+import sys
+from pathlib import Path
+
+import pytest
+
+import cli
+from conftest import make_pdf
+from streaming import _StreamRenderer, stream_markdown
+
+PAGES = [
+    "<|ref|>title<|/ref|><|det|>[[100, 50, 900, 90]]<|/det|>\nChapter One\n\n"
+    "<|ref|>text<|/ref|><|det|>[[100, 100, 900, 200]]<|/det|>\nFirst page text.",
+    "<|ref|>text<|/ref|><|det|>[[100, 100, 900, 200]]<|/det|>\nA sentence that runs on",
+    "<|ref|>text<|/ref|><|det|>[[100, 100, 900, 200]]<|/det|>\nonto the third page.\n\n"
+    "<|ref|>sub_title<|/ref|><|det|>[[100, 300, 900, 340]]<|/det|>\nSection\n\n"
+    "<|ref|>text<|/ref|><|det|>[[100, 400, 900, 500]]<|/det|>\nLast words.",
+]
+
+
+def _cycle_pages(stub_backend) -> None:
+    responses = itertools.cycle(PAGES)
+    stub_backend.response = lambda kwargs: next(responses)
+
+
+def test_stream_matches_full_conversion(tmp_path: Path, stub_backend):
+    _cycle_pages(stub_backend)
+    pdf = make_pdf(tmp_path / "book.pdf", len(PAGES))
+
+    cli.convert_to_markdown(pdf, tmp_path / "full.md", None, "tiny", False, False, False, False)
+    cli.convert_to_markdown_stream(pdf, tmp_path / "stream.md", None, "tiny", False, False, False, False)
+
+    expected = (tmp_path / "full.md").read_text(encoding="utf-8")
+    assert "onto the third page." in expected
+    assert (tmp_path / "stream.md").read_text(encoding="utf-8") == expected
+
+
+def test_chunks_are_yielded_per_page(tmp_path: Path, stub_backend):
+    from pdf_craft.pdf import OCR
+
+    _cycle_pages(stub_backend)
+    cli.install_model_patch()
+    pdf = make_pdf(tmp_path / "book.pdf", len(PAGES))
+    ocr = OCR(model_path=None, pdf_handler=None, local_only=False)
+
+    chunks = []
+    for chunk in stream_markdown(ocr, pdf, assets_path=tmp_path / "assets", ocr_size="tiny"):
+        # later pages are not recognized before the consumer takes the chunk
+        assert stub_backend.infer_calls == (chunk.page_index if not chunk.final else len(PAGES))
+        chunks.append(chunk)
+
+    assert [(c.page_index, c.final) for c in chunks] == [(1, False), (2, False), (3, False), (3, True)]
+    assert chunks[0].text == "## Chapter One\n\n"
+    # the paragraph continuing onto page 3 is held back until that page is in
+    assert chunks[1].text == "First page text."
+    assert "onto the third page." in chunks[2].text
+    assert chunks[2].text.endswith("## Section\n\n")
+    assert chunks[3].text == "Last words."
+
+
+def test_cli_streams_to_stdout(tmp_path: Path, stub_backend, capsys, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    pdf = make_pdf(tmp_path / "book.pdf", 2)
+
+    assert cli.main([str(pdf), "-o", "-", "--ocr-size", "tiny", "-v"]) == 0
+
+    captured = capsys.readouterr()
+    assert captured.out == "Stub page text.\n\nStub page text."
+    assert "Page 1/2 written" in captured.err
+    assert not list(tmp_path.glob("*.md"))
+
+
+def _footnoted_page(index: int, text: str):
+    from pdf_craft.pdf import Page, PageLayout
+
+    return Page(
+        index=index,
+        image=None,
+        body_layouts=[PageLayout(ref="text", det=(100, 100, 900, 200), text=text, hash=None)],
+        footnotes_layouts=[
+            PageLayout(ref="text", det=(100, 800, 900, 900), text=f"\u2460 Note on page {index}.", hash=None),
+        ],
+        input_tokens=0,
+        output_tokens=0,
+    )
+
+
+def test_footnotes_are_dropped_once_their_page_is_rendered(tmp_path: Path, stub_backend):
+    cli.install_model_patch()
+    renderer = _StreamRenderer(tmp_path / "work", tmp_path / "assets", Path("assets"))
+    texts = ["First page.\u2460", "runs on\u2460", "Third page.\u2460", "Fourth page.\u2460"]
+
+    held = []
+    output = ""
+    for index, text in enumerate(texts, 1):
+        output += renderer.feed(_footnoted_page(index, text))
+        held.append(sorted(renderer._footnote_layouts))
+    output += renderer.finish()
+
+    # the paragraph of page 1 runs onto page 2, so page 1's notes stay until it is rendered
+    assert held == [[], [1], [], []]
+    assert output.startswith("First page.[^1]runs on[^2]\n\nThird page.[^3]\n\nFourth page.[^4]")
+    assert "[^4]:  Note on page 4." in output
+
+
+def test_missing_pdf_craft_internals_fail_at_import(monkeypatch, stub_backend):
+    cli.install_model_patch()
+    from pdf_craft.sequence import jointer
+
+    monkeypatch.delattr(jointer, "_normalize_paragraph_content")
+    monkeypatch.delitem(sys.modules, "pdf_craft_compat", raising=False)
+    with pytest.raises(ImportError, match=r"_normalize_paragraph_content.*tested with pdf-craft 1\.0\.3"):
+        importlib.import_module("pdf_craft_compat")